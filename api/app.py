@@ -1,9 +1,11 @@
+import logging
 import os
 import secrets
-from pprint import pprint
+import time
+from uuid import uuid4
 
 from dotenv import load_dotenv
-from quart import Quart, Response
+from quart import Quart, Response, g, request
 from quart_cors import cors
 from quart_schema import (
     QuartSchema,
@@ -12,9 +14,14 @@ from quart_schema import (
 )
 
 from models.base import BaseResponse
-from routes import misc, ussd, waitlist
+from routes import export, misc, ussd, waitlist
+from services.log import request_id, setup_logging, shutdown_logging
 
 load_dotenv()
+setup_logging()
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("access")
 
 
 app = Quart("YouSSD")
@@ -23,11 +30,12 @@ QuartSchema(app, convert_casing=True)
 
 secret_key = str(os.getenv(key="SECRET_KEY")).strip()
 if len(secret_key) < 10:
-    print("Generating a random secret key...")
-    # Generate a random secret key if one is not provided
+    if os.getenv("env") != "dev":
+        raise ValueError("SECRET_KEY (at least 10 characters) is required")
+    # Every worker would generate its own, so this one lives only as long as
+    # the process; set SECRET_KEY to keep sessions across restarts
+    logger.warning("SECRET_KEY is not set; using a random one for this process")
     secret_key = secrets.token_hex(nbytes=20)
-    with open(".env", "a+") as f:
-        f.write(f"\nSECRET_KEY={secret_key}\n")
 
 
 app.config["SECRET_KEY"] = secret_key
@@ -35,19 +43,112 @@ app.config["SECRET_KEY"] = secret_key
 
 @app.before_serving
 async def before_serving():
-    print("before serving")
-    from services.database import init_db
-
-    await init_db()
+    logger.info("before serving")
+    from services.database import check_schema
+
+    await check_schema()
+
+    from services.user_cache import UserCacheInvalidations, user_cache
+
+    invalidations = UserCacheInvalidations.from_env(user_cache)
+    if invalidations is not None:
+        app.extensions["user_cache"] = invalidations
+        invalidations.start()
+
+    wallet_pool_high = int(os.getenv("WALLET_POOL_HIGH", 1000))
+    if wallet_pool_high > 0:
+        from services.keys import key_service
+        from services.wallet_pool import WalletPoolRefiller
+
+        app.extensions["wallet_pool"] = WalletPoolRefiller(
+            key_service,
+            low=int(os.getenv("WALLET_POOL_LOW", 200)),
+            high=wallet_pool_high,
+        )
+        app.extensions["wallet_pool"].start()
+
+    if float(os.getenv("BLOCKHASH_REFRESH_INTERVAL", 5)) > 0:
+        from services.ussd import sol_transfer
+
+        app.extensions["blockhash"] = sol_transfer.blockhashes
+        sol_transfer.blockhashes.start()
+
+    refresh_interval = float(os.getenv("BALANCE_REFRESH_INTERVAL", 0))
+    if refresh_interval > 0:
+        from services.balance_refresher import BalanceRefresher
+        from services.ussd import balance_cache, sol_transfer
+
+        app.extensions["balance_refresher"] = BalanceRefresher(
+            sol_transfer, interval=refresh_interval, balance_cache=balance_cache
+        )
+        app.extensions["balance_refresher"].start()
+
+    from services.ussd import balance_subscriptions
+
+    if balance_subscriptions is not None:
+        app.extensions["balance_subscriptions"] = balance_subscriptions
+        balance_subscriptions.start()
+
+    transfer_workers = int(os.getenv("TRANSFER_WORKERS", 2))
+    if transfer_workers > 0:
+        from services.transfer_queue import TransferWorker
+        from services.ussd import balance_cache, sol_transfer
+
+        app.extensions["transfer_worker"] = TransferWorker(
+            sol_transfer, workers=transfer_workers, balance_cache=balance_cache
+        )
+        app.extensions["transfer_worker"].start()
+
+    from services.token_accounts import TokenAccountProvisioner
+    from services.ussd import sol_transfer
+
+    provisioner = TokenAccountProvisioner.from_env(sol_transfer)
+    if provisioner is not None:
+        app.extensions["token_accounts"] = provisioner
+        provisioner.start()
+
+
+@app.after_serving
+async def after_serving():
+    from services.database import close_db
+    from services.keys import key_service
+    from services.ussd import session_store, sol_transfer
+
+    for name in (
+        "balance_refresher",
+        "balance_subscriptions",
+        "transfer_worker",
+        "token_accounts",
+        "blockhash",
+        "wallet_pool",
+        "user_cache",
+    ):
+        if name in app.extensions:
+            await app.extensions[name].stop()
+    await session_store.close()
+    await sol_transfer.close()
+    await key_service.close()
+    await close_db()
+    shutdown_logging()
+
+
+@app.before_request
+async def bef_request():
+    g.started_at = time.perf_counter()
+    request_id.set(request.headers.get("X-Request-ID") or uuid4().hex)
 
 
 @app.after_request
 async def aft_request(response: Response):
-    print("after request")
-    from services.ussd import session_cache
-
-    print("Current session")
-    pprint(session_cache, indent=2)
+    response.headers["X-Request-ID"] = request_id.get() or ""
+    if access_logger.isEnabledFor(logging.INFO):
+        access_logger.info(
+            "%s %s %s %.1fms",
+            request.method,
+            request.path,
+            response.status_code,
+            (time.perf_counter() - g.get("started_at", time.perf_counter())) * 1000,
+        )
     return response
 
 
@@ -56,16 +157,17 @@ async def aft_request(response: Response):
 async def handle_validation_error(
     error: RequestSchemaValidationError | ResponseSchemaValidationError,
 ):
-    print(error)
+    logger.info("Request validation failed: %s", error)
     return BaseResponse(message=f"END An error occurred {str(error)}"), int(error.code)
 
 
 @app.errorhandler(Exception)
 async def handle_error(error: Exception):
-    print(error)
+    logger.exception("Unhandled error", exc_info=error)
     return f"END An error occurred {str(error)}", 500
 
 
+app.register_blueprint(export.bp)
 app.register_blueprint(misc.bp)
 app.register_blueprint(ussd.bp)
 app.register_blueprint(waitlist.bp)
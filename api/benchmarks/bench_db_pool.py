@@ -0,0 +1,92 @@
+"""
+Connection reuse benchmark for the pooled engine in `services.database`.
+
+Simulates USSD hops that each open a session and run a query, once through a
+process-wide engine and once through the old per-call "build, query, dispose"
+pattern, and reports physical connects vs pool checkouts.
+
+Usage (from the api directory):
+    python -m benchmarks.bench_db_pool --requests 500 --url sqlite+aiosqlite:////tmp/bench.db
+"""
+
+import argparse
+import asyncio
+import time
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from services.database import get_engine
+
+
+def _count_connections(engine) -> dict:
+    counts = {"connect": 0, "checkout": 0}
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def on_connect(*_):
+        counts["connect"] += 1
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def on_checkout(*_):
+        counts["checkout"] += 1
+
+    return counts
+
+
+async def pooled(url: str, requests: int, concurrency: int) -> dict:
+    engine = get_engine(url)
+    engine.echo = False
+    counts = _count_connections(engine)
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def hop():
+        async with semaphore, factory() as session:
+            await session.execute(text("SELECT 1"))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(hop() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    await engine.dispose()
+    return {**counts, "elapsed": elapsed}
+
+
+async def dispose_per_call(url: str, requests: int, concurrency: int) -> dict:
+    counts = {"connect": 0, "checkout": 0}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def hop():
+        async with semaphore:
+            engine = get_engine(url)
+            engine.echo = False
+            hop_counts = _count_connections(engine)
+            async with async_sessionmaker(engine)() as session:
+                await session.execute(text("SELECT 1"))
+            await engine.dispose()
+            for key in counts:
+                counts[key] += hop_counts[key]
+
+    start = time.perf_counter()
+    await asyncio.gather(*(hop() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    return {**counts, "elapsed": elapsed}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite+aiosqlite:////tmp/youssd_bench.db")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    args = parser.parse_args()
+
+    for name, run in (("pooled", pooled), ("dispose-per-call", dispose_per_call)):
+        result = await run(args.url, args.requests, args.concurrency)
+        print(
+            f"{name:>18}: {args.requests} hops, {result['connect']} connects, "
+            f"{result['checkout']} checkouts, "
+            f"{args.requests / result['elapsed']:.0f} hops/s"
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,103 @@
+"""
+Export memory benchmark for `services.export`.
+
+Seeds the configured database ($DATABASE_URL) with synthetic users, then reads
+the whole table twice: once with `UserService.get_all_users()` and once through
+the streaming NDJSON export, recording peak Python memory (tracemalloc) and
+time for each. The export's peak should stay flat as --users grows, and it
+must produce exactly one line per user.
+
+Usage (from the api directory):
+    env=dev DATABASE_URL=sqlite+aiosqlite:////tmp/youssd_export.db \
+        python -m benchmarks.bench_export --users 200000
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from solders.pubkey import Pubkey
+from sqlalchemy import insert
+
+from models.base import Base
+from models.user import Users
+from services.database import engine, get_session
+from services.export import ndjson_export
+from services.user import UserService
+
+BATCH = 20_000
+
+
+def _rows(count: int):
+    start = datetime.now(tz=timezone.utc)
+    for i in range(count):
+        yield {
+            "id": uuid.uuid4(),
+            "full_name": f"User {i}",
+            "phone_number": f"+234{8000000000 + i}",
+            "username": f"user{i}",
+            "public_key": str(Pubkey(os.urandom(32))),
+            "wallet_alias": f"wallet{i}",
+            "balance_lamports": i,
+            # Runs of equal timestamps exercise the id tie-break
+            "created_at": start + timedelta(milliseconds=i // 3),
+        }
+
+
+async def seed(count: int):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all, tables=[Users.__table__])
+        await conn.run_sync(Base.metadata.create_all, tables=[Users.__table__])
+        rows = _rows(count)
+        while batch := [row for _, row in zip(range(BATCH), rows)]:
+            await conn.execute(insert(Users), batch)
+
+
+async def load_all() -> int:
+    async with get_session() as sess:
+        return len(await UserService(sess).get_all_users())
+
+
+async def stream_all(page_size: int) -> int:
+    lines = 0
+    async for chunk in ndjson_export("users", page_size=page_size):
+        lines += chunk.count(b"\n")
+    return lines
+
+
+async def measure(name: str, coro) -> int:
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = await coro
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:>14}: {rows} rows in {elapsed:.2f}s, "
+        f"peak {peak / 1024 / 1024:.1f} MiB"
+    )
+    return rows
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--page-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    await seed(args.users)
+    print(f"seeded {args.users} users in {time.perf_counter() - start:.1f}s")
+
+    await measure("get_all_users", load_all())
+    exported = await measure("ndjson export", stream_all(args.page_size))
+    assert exported == args.users, f"exported {exported} of {args.users} users"
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,60 @@
+"""
+Deep-session benchmark for USSD input parsing.
+
+Gateways resend the whole `text` history on every hop, so re-splitting it costs
+O(depth) per hop and O(depth^2) per session. `services.misc.parse_input` only
+looks at the segment after the stored offset.
+
+Usage (from the api directory):
+    python -m benchmarks.bench_input_parsing --depths 10 100 1000
+"""
+
+import argparse
+import time
+
+from services.misc import parse_input
+
+
+def session_texts(depth: int) -> list:
+    """Cumulative texts a gateway would send over a session `depth` hops deep"""
+    texts, text = [""], ""
+    for hop in range(1, depth):
+        text = f"{text}*{hop % 10}" if text else "1"
+        texts.append(text)
+    return texts
+
+
+def full_split(texts: list) -> float:
+    start = time.perf_counter()
+    for text in texts:
+        text.split("*")[-1]
+    return time.perf_counter() - start
+
+
+def incremental(texts: list) -> float:
+    start = time.perf_counter()
+    offset = 0
+    for text in texts:
+        offset = parse_input(text, offset).offset
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--depths", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--sessions", type=int, default=200)
+    args = parser.parse_args()
+
+    for depth in args.depths:
+        texts = session_texts(depth)
+        split_time = sum(full_split(texts) for _ in range(args.sessions))
+        parse_time = sum(incremental(texts) for _ in range(args.sessions))
+        per_hop = 1e6 / (depth * args.sessions)
+        print(
+            f"depth {depth:>5}: full split {split_time * per_hop:7.2f} us/hop, "
+            f"incremental {parse_time * per_hop:7.2f} us/hop"
+        )
+
+
+if __name__ == "__main__":
+    main()
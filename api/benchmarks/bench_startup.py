@@ -0,0 +1,105 @@
+"""
+Cold start benchmark: importing the app and running its startup hooks.
+
+Each run is a fresh interpreter against a migrated throwaway SQLite database
+and the stub RPC, as a new worker on an autoscaled instance would be. It
+reports the median time to `import app` and to run `before_serving`, and
+fails (exit status 1) when either is over budget or when a module that is
+meant to load on first use (the SPL stack, solana-py's RPC client, httpx)
+was imported eagerly.
+
+Usage (from the api directory):
+    python -m benchmarks.bench_startup --runs 5 --import-budget 1500 --startup-budget 500
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# Only needed once a transfer or RPC call happens, never at import
+LAZY_MODULES = ("spl.token.instructions", "solana.rpc.async_api", "httpx")
+
+
+def child():
+    """Runs in the fresh interpreter; prints its timings as JSON"""
+    start = time.perf_counter()
+    from app import app
+
+    imported = time.perf_counter() - start
+    eager = [module for module in LAZY_MODULES if module in sys.modules]
+
+    async def boot() -> float:
+        start = time.perf_counter()
+        await app.startup()
+        started = time.perf_counter() - start
+        await app.shutdown()
+        return started
+
+    started = asyncio.run(boot())
+    print(json.dumps({"import": imported, "startup": started, "eager": eager}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-budget", type=float, default=1500, help="ms")
+    parser.add_argument("--startup-budget", type=float, default=500, help="ms")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return child()
+
+    from benchmarks.bench_ussd_load import (
+        configure_environment,
+        migrate,
+        start_stub_rpc,
+    )
+
+    stub, rpc_url = start_stub_rpc()
+    configure_environment(
+        f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/youssd_startup.db", rpc_url
+    )
+    try:
+        migrate()
+        runs = []
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, "-m", "benchmarks.bench_startup", "--child"],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+    finally:
+        stub.terminate()
+
+    failures = []
+    for key, budget in (
+        ("import", args.import_budget),
+        ("startup", args.startup_budget),
+    ):
+        samples = [run[key] * 1000 for run in runs]
+        median = statistics.median(samples)
+        print(
+            f"{key:>8}: median {median:7.1f}ms  "
+            f"min {min(samples):7.1f}ms  max {max(samples):7.1f}ms  "
+            f"(budget {budget:.0f}ms)"
+        )
+        if median > budget:
+            failures.append(f"{key} median {median:.1f}ms > budget {budget:.0f}ms")
+    eager = sorted({module for run in runs for module in run["eager"]})
+    if eager:
+        failures.append(f"imported at startup: {', '.join(eager)}")
+
+    for failure in failures:
+        print(f"OVER BUDGET: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Counts the SQL statements issued per USSD state transition.
+
+Drives `services.ussd.process_request` directly (no Quart) against a throwaway
+SQLite database and prints the statement count for every hop, so regressions
+in the per-request unit of work are easy to spot.
+
+Usage (from the api directory):
+    python -m benchmarks.bench_statements
+"""
+
+import asyncio
+import os
+import tempfile
+
+os.environ["env"] = "dev"
+os.environ.setdefault(
+    "DATABASE_URL",
+    f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/youssd_statements.db",
+)
+
+from sqlalchemy import event  # noqa: E402
+
+from models.ussd import UssdRequest  # noqa: E402
+from services.database import engine, init_db  # noqa: E402
+from services.ussd import process_request  # noqa: E402
+
+PHONE_NUMBER = "+2348000000001"
+
+# (session id, cumulative text) pairs, in the order a gateway would send them
+FLOW = [
+    ("signup", ""),
+    ("signup", "1"),
+    ("signup", "1*alice1, Alice Doe"),
+    ("send", ""),
+    ("send", "1"),
+    ("send", "1*2"),
+    ("send", "1*2*alice1"),
+    ("send", "1*2*alice1*0.5"),
+    ("send", "1*2*alice1*0.5*2"),
+    ("details", ""),
+    ("details", "3"),
+]
+
+
+async def main():
+    engine.echo = False
+    await init_db()
+
+    statements = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def count(conn, cursor, statement, *_):
+        statements.append(statement)
+
+    total = 0
+    for session_id, text in FLOW:
+        statements.clear()
+        response = await process_request(
+            UssdRequest(
+                phone_number=PHONE_NUMBER,
+                service_code="*384#",
+                text=text,
+                session_id=session_id,
+                network_code="99999",
+            )
+        )
+        total += len(statements)
+        print(f"{len(statements):>3} statements  {text!r:<24} -> {response[:40]!r}")
+    print(f"{total:>3} statements total over {len(FLOW)} hops")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,158 @@
+"""
+Transfer throughput benchmark for `SolanaTransfer`.
+
+Signs and sends SOL transfers against the stub RPC in `benchmarks.stub_rpc`
+(started on a free port unless --rpc-url is given) two ways:
+
+- per-transfer: a getLatestBlockhash call and a solana-py `Transaction` built
+  and signed for every transfer, as `send_sol` used to do;
+- cached: `build_sol_transfer`, with the shared blockhash cache and the
+  per-pair message templates, then one sendTransaction.
+
+Reports transfers per second and RPC calls per transfer for each. Use
+--latency to make the stub behave like a remote node, which is where the
+saved round trip shows. With --confirm each transfer is also waited on,
+per signature with `AsyncClient.confirm_transaction` on the first path and
+through the shared `SignatureConfirmer` on the second.
+
+Usage (from the api directory):
+    python -m benchmarks.bench_transfers --transfers 2000 --concurrency 32 --latency 0.02
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import httpx
+from solana.transaction import Transaction
+from solders.keypair import Keypair
+from solders.system_program import TransferParams, transfer
+
+from benchmarks.bench_ussd_load import _free_port, _wait_until_up
+from services.rpc import RpcManager
+from services.transfer import SolanaTransfer
+
+# Set by --confirm
+CONFIRM = False
+
+
+async def per_transfer(sol_transfer: SolanaTransfer, sender: Keypair, recipient):
+    latest = await sol_transfer.rpc.call("get_latest_blockhash")
+    transaction = Transaction(
+        recent_blockhash=latest.value.blockhash, fee_payer=sender.pubkey()
+    ).add(
+        transfer(
+            TransferParams(
+                from_pubkey=sender.pubkey(), to_pubkey=recipient, lamports=1000
+            )
+        )
+    )
+    transaction.sign(sender)
+    signature = await sol_transfer.send_raw(transaction.serialize())
+    if CONFIRM:
+        await sol_transfer.rpc.call(
+            "confirm_transaction",
+            signature,
+            last_valid_block_height=latest.value.last_valid_block_height,
+        )
+
+
+async def cached(sol_transfer: SolanaTransfer, sender: Keypair, recipient):
+    transaction = await sol_transfer.build_sol_transfer(sender, recipient, 1e-6)
+    signature = await sol_transfer.send_raw(transaction.raw)
+    if CONFIRM:
+        await sol_transfer.check_transaction(
+            signature, transaction.last_valid_block_height
+        )
+
+
+async def rpc_calls(rpc_url: str) -> Counter:
+    async with httpx.AsyncClient() as client:
+        return Counter((await client.get(f"{rpc_url}/calls")).json())
+
+
+async def measure(name, send, rpc_url, transfers, concurrency, wallets):
+    sol_transfer = SolanaTransfer(rpc=RpcManager([rpc_url]))
+    sol_transfer.blockhashes.start()
+    await sol_transfer.blockhashes.get()
+    pairs = [(Keypair(), Keypair().pubkey()) for _ in range(wallets)]
+    queue = asyncio.Queue()
+    for i in range(transfers):
+        queue.put_nowait(pairs[i % wallets])
+
+    async def worker():
+        while not queue.empty():
+            await send(sol_transfer, *queue.get_nowait())
+
+    before = await rpc_calls(rpc_url)
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    calls = await rpc_calls(rpc_url)
+    calls.subtract(before)
+    await sol_transfer.blockhashes.stop()
+    await sol_transfer.close()
+
+    per = ", ".join(
+        f"{method} {count / transfers:.2f}"
+        for method, count in sorted(calls.items())
+        if count
+    )
+    print(
+        f"{name:>13}: {transfers / elapsed:8.0f} transfers/s "
+        f"({elapsed:.2f}s), rpc calls per transfer: {per}"
+    )
+    return transfers / elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--transfers", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument(
+        "--wallets", type=int, default=50, help="Sender/recipient pairs"
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Stub RPC latency")
+    parser.add_argument("--rpc-url", help="Defaults to a local stub RPC")
+    parser.add_argument(
+        "--confirm", action="store_true", help="Also wait for each confirmation"
+    )
+    args = parser.parse_args()
+    global CONFIRM
+    CONFIRM = args.confirm
+
+    stub = None
+    rpc_url = args.rpc_url
+    if rpc_url is None:
+        port = _free_port()
+        stub = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "benchmarks.stub_rpc",
+                "--port",
+                str(port),
+                "--latency",
+                str(args.latency),
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        rpc_url = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=rpc_url) as client:
+            await _wait_until_up(client, "/calls")
+        options = (rpc_url, args.transfers, args.concurrency, args.wallets)
+        before = await measure("per-transfer", per_transfer, *options)
+        after = await measure("cached", cached, *options)
+        print(f"speedup: {after / before:.2f}x")
+    finally:
+        if stub is not None:
+            stub.terminate()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
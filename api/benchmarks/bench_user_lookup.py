@@ -0,0 +1,159 @@
+"""
+User lookup benchmark for `UserService.get_user`.
+
+Seeds a SQLite database with synthetic users, then times lookups by phone
+number, username, public key and id: once with the old five-way OR query on a
+table without lookup indexes, and once through `get_user` on the indexed table.
+Prints the SQLite query plan for each so the index use is visible.
+
+Usage (from the api directory):
+    python -m benchmarks.bench_user_lookup --users 1000000 --lookups 2000
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timezone
+
+from solders.pubkey import Pubkey
+from sqlalchemy import insert, or_, select, text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from models.base import Base
+from models.user import Users
+from services.database import get_engine
+from services.user import UserService
+
+BATCH = 20_000
+
+
+def _rows(count: int):
+    now = datetime.now(tz=timezone.utc)
+    for i in range(count):
+        yield {
+            "id": uuid.uuid4(),
+            "full_name": f"User {i}",
+            "phone_number": f"+234{8000000000 + i}",
+            "username": f"user{i}",
+            "public_key": str(Pubkey(os.urandom(32))),
+            "private_key": "[]",
+            "wallet_alias": f"wallet{i}",
+            "balance_lamports": 0,
+            "created_at": now,
+        }
+
+
+async def seed(engine, count: int, indexed: bool):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all, tables=[Users.__table__])
+        await conn.run_sync(Base.metadata.create_all, tables=[Users.__table__])
+        if not indexed:
+            for index in Users.__table__.indexes:
+                await conn.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+        rows = _rows(count)
+        while batch := [row for _, row in zip(range(BATCH), rows)]:
+            await conn.execute(insert(Users), batch)
+
+
+def _or_query(identifier):
+    # The original bound strings straight to the Uuid column, which raises;
+    # only compare ids when the identifier is one
+    user_id = identifier if isinstance(identifier, uuid.UUID) else None
+    return select(Users).where(
+        or_(
+            Users.id == user_id,
+            Users.phone_number == identifier,
+            Users.username == identifier,
+            Users.public_key == identifier,
+            Users.wallet_alias == identifier,
+        )
+    )
+
+
+async def sample(engine, lookups: int) -> dict:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            select(Users.id, Users.phone_number, Users.username, Users.public_key)
+            .order_by(text("random()"))
+            .limit(lookups)
+        )
+        rows = result.all()
+    return {
+        "phone_number": [row.phone_number for row in rows],
+        "username": [row.username for row in rows],
+        "public_key": [row.public_key for row in rows],
+        # The old OR query needs the id as a UUID; get_user accepts either
+        "id": [row.id for row in rows],
+    }
+
+
+async def time_lookups(factory, identifiers, lookup) -> float:
+    async with factory() as session:
+        start = time.perf_counter()
+        for identifier in identifiers:
+            assert await lookup(session, identifier) is not None
+        return time.perf_counter() - start
+
+
+async def plan(engine, stmt) -> str:
+    async with engine.connect() as conn:
+        compiled = stmt.compile(engine.sync_engine)
+        result = await conn.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {compiled}", tuple(compiled.params.values())
+        )
+        return "; ".join(row[-1] for row in result)
+
+
+async def old_lookup(session, identifier):
+    result = await session.execute(_or_query(identifier))
+    return result.scalar_one_or_none()
+
+
+async def new_lookup(session, identifier):
+    return await UserService(session).get_user(identifier)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="sqlite+aiosqlite:////tmp/youssd_users.db")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    args = parser.parse_args()
+
+    engine = get_engine(args.url)
+    engine.echo = False
+    factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    for name, indexed, lookup in (
+        ("or-query", False, old_lookup),
+        ("indexed", True, new_lookup),
+    ):
+        start = time.perf_counter()
+        await seed(engine, args.users, indexed)
+        print(
+            f"{name}: seeded {args.users} users in {time.perf_counter() - start:.1f}s"
+        )
+        samples = await sample(engine, args.lookups)
+        for kind, identifiers in samples.items():
+            # The unindexed OR query scans the table; keep its run short
+            identifiers = identifiers if indexed else identifiers[:50]
+            elapsed = await time_lookups(factory, identifiers, lookup)
+            print(
+                f"  {kind:>12}: {len(identifiers) / elapsed:10.0f} lookups/s, "
+                f"{elapsed / len(identifiers) * 1000:8.3f} ms each"
+            )
+        stmt = (
+            _or_query(samples["phone_number"][0])
+            if not indexed
+            else select(Users).where(Users.phone_number == samples["phone_number"][0])
+        )
+        print(f"  plan: {await plan(engine, stmt)}")
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,395 @@
+"""
+Load test that replays whole USSD sessions as Africa's Talking form posts.
+
+Each virtual session follows one flow (signup, view balance, or a full send
+tokens flow ending in the PIN) hop by hop, with many sessions in flight at
+once. The app runs either in-process through Quart's test client or as a
+Hypercorn server, against a throwaway SQLite database and the stub Solana RPC
+in `benchmarks.stub_rpc`, so no network or docker is needed.
+
+Reports p50/p95/p99 latency per step and overall throughput, and compares them
+with the stored baseline in `benchmarks/baseline.json`, exiting non-zero on a
+regression.
+
+Usage (from the api directory):
+    python -m benchmarks.bench_ussd_load --mode inprocess --sessions 400 --concurrency 20
+    python -m benchmarks.bench_ussd_load --mode hypercorn --save-baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+PIN = 1234
+SERVICE_CODE = "*384#"
+NETWORK_CODE = "62120"
+
+# Relative frequency of each flow in the generated traffic
+FLOW_WEIGHTS = {"signup": 2, "balance": 5, "send": 3}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def configure_environment(database_url: str, rpc_url: str):
+    """Point the app at the stand-ins; must run before the app is imported"""
+    os.environ.update(
+        env="dev",
+        DATABASE_URL=database_url,
+        RPC_URL=rpc_url,
+        SECRET_KEY=os.getenv("SECRET_KEY", "benchmark-secret-key"),
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+    )
+
+
+def flow_steps(flow: str, username: str, recipient: str) -> List[Tuple[str, str]]:
+    """(step name, user input) pairs for one session of `flow`"""
+    if flow == "signup":
+        return [
+            ("main_menu", ""),
+            ("signup_prompt", "1"),
+            ("signup_submit", f"{username}, Bench User"),
+        ]
+    if flow == "balance":
+        return [("welcome_back", ""), ("wallet_access", "1"), ("view_balance", "1")]
+    return [
+        ("welcome_back", ""),
+        ("wallet_access", "1"),
+        ("recipient_prompt", "2"),
+        ("amount_prompt", recipient),
+        ("confirm_send", "0.001"),
+        ("pin_prompt", "1"),
+        ("finalize_transaction", str(PIN)),
+    ]
+
+
+class Traffic:
+    """Generates sessions: new phone numbers for signups, seeded wallets otherwise"""
+
+    def __init__(self, wallets: List[Tuple[str, str]], seed: int = 7):
+        self.wallets = wallets
+        self.random = random.Random(seed)
+        self.count = 0
+
+    def next_session(self) -> Tuple[str, str, List[Tuple[str, str]]]:
+        self.count += 1
+        flow = self.random.choices(
+            list(FLOW_WEIGHTS), weights=list(FLOW_WEIGHTS.values())
+        )[0]
+        if flow == "signup":
+            phone_number = f"+2347{self.count:09d}"
+            steps = flow_steps(flow, f"bench{self.count}", "")
+        else:
+            (phone_number, _), (_, recipient) = self.random.sample(self.wallets, 2)
+            steps = flow_steps(flow, "", recipient)
+        return f"bench-{self.count}", phone_number, steps
+
+
+def migrate():
+    """Bring the database to the latest migration, as a deploy would"""
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=Path(__file__).resolve().parent.parent,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+
+
+async def seed_wallets(count: int) -> List[Tuple[str, str]]:
+    """Create users with a PIN directly in the database; returns (phone, username)"""
+    from uuid import uuid4
+
+    from models.user import Users
+    from services.database import close_db, get_session
+    from services.keys import key_service
+
+    migrate()
+    wallets = []
+    async with get_session() as sess:
+        for i in range(count):
+            public_key, sealed_key = await key_service.generate()
+            user = Users(
+                username=f"wallet{i}",
+                phone_number=f"+2348{i:09d}",
+                full_name=f"Wallet {i}",
+                public_key=public_key,
+                private_key=None,
+            )
+            user.id = uuid4()
+            user.transaction_pin = PIN
+            sess.add_all([user, key_service.new_key(user, sealed_key)])
+            wallets.append((user.phone_number, user.username))
+        await sess.commit()
+    await close_db()
+    return wallets
+
+
+class InProcessDriver:
+    """Posts through Quart's test client, skipping HTTP entirely"""
+
+    async def __aenter__(self):
+        from app import app
+
+        self._app = app.test_app()
+        await self._app.__aenter__()
+        self._client = self._app.test_client()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._app.__aexit__(*exc)
+
+    async def post(self, form: Dict[str, str]) -> Tuple[int, str]:
+        response = await self._client.post("/ussd", form=form)
+        return response.status_code, await response.get_data(as_text=True)
+
+
+class HypercornDriver:
+    """Runs the app under Hypercorn in a subprocess and posts over HTTP"""
+
+    def __init__(self, workers: int = 1):
+        self.workers = workers
+        self.port = _free_port()
+
+    async def __aenter__(self):
+        import httpx
+
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "hypercorn",
+                "app:app",
+                "--bind",
+                f"127.0.0.1:{self.port}",
+                "--workers",
+                str(self.workers),
+            ],
+            env=os.environ.copy(),
+        )
+        self._client = httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{self.port}",
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=200),
+            timeout=30,
+        )
+        await _wait_until_up(self._client, "/health")
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._process.terminate()
+        self._process.wait(timeout=10)
+
+    async def post(self, form: Dict[str, str]) -> Tuple[int, str]:
+        response = await self._client.post("/ussd", data=form)
+        return response.status_code, response.text
+
+
+async def _wait_until_up(client, path: str, method: str = "GET", json_body=None):
+    for _ in range(100):
+        try:
+            await client.request(method, path, json=json_body)
+            return
+        except Exception:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"{client.base_url} did not come up")
+
+
+def start_stub_rpc() -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.stub_rpc", "--port", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def run_session(driver, session_id: str, phone_number: str, steps, results):
+    text = []
+    for step, value in steps:
+        if value:
+            text.append(value)
+        form = {
+            "sessionId": session_id,
+            "serviceCode": SERVICE_CODE,
+            "phoneNumber": phone_number,
+            "networkCode": NETWORK_CODE,
+            "text": "*".join(text),
+        }
+        start = time.perf_counter()
+        status, body = await driver.post(form)
+        results[step].append(time.perf_counter() - start)
+        if status != 200 or body[:4] not in ("CON ", "END "):
+            results["errors"].append(f"{step}: {status} {body[:80]!r}")
+            return
+        if body.startswith("END"):
+            return
+
+
+async def run_load(driver, traffic: Traffic, sessions: int, concurrency: int):
+    results = defaultdict(list)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def worker(session):
+        async with semaphore:
+            await run_session(driver, *session, results)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(traffic.next_session()) for _ in range(sessions)))
+    return results, time.perf_counter() - start
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(results, elapsed: float, sessions: int) -> Dict:
+    steps = {}
+    hops = 0
+    for step, samples in sorted(results.items()):
+        if step == "errors":
+            continue
+        hops += len(samples)
+        steps[step] = {
+            "count": len(samples),
+            **{
+                f"p{pct}": round(percentile(samples, pct) * 1000, 2)
+                for pct in (50, 95, 99)
+            },
+        }
+    return {
+        "steps": steps,
+        "hops_per_second": round(hops / elapsed, 1),
+        "sessions_per_second": round(sessions / elapsed, 1),
+        "errors": len(results["errors"]),
+    }
+
+
+def report(summary: Dict):
+    print(f"{'step':>22} {'count':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for step, stats in summary["steps"].items():
+        print(
+            f"{step:>22} {stats['count']:>6} {stats['p50']:>8} "
+            f"{stats['p95']:>8} {stats['p99']:>8}"
+        )
+    print(
+        f"throughput: {summary['hops_per_second']} hops/s, "
+        f"{summary['sessions_per_second']} sessions/s, {summary['errors']} errors"
+    )
+
+
+def compare(summary: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Regressions relative to the baseline. Medians may drift by `tolerance` (a
+    fraction) and p95 by twice that, since tails are noisier on a shared box.
+    """
+    regressions = []
+    for step, stats in summary["steps"].items():
+        expected = baseline.get("steps", {}).get(step)
+        if not expected:
+            continue
+        for key, allowed in (("p50", tolerance), ("p95", 2 * tolerance)):
+            if stats[key] > expected[key] * (1 + allowed):
+                regressions.append(
+                    f"{step} {key} {stats[key]}ms > baseline {expected[key]}ms"
+                )
+    expected = baseline.get("hops_per_second")
+    if expected and summary["hops_per_second"] < expected * (1 - tolerance):
+        regressions.append(
+            f"throughput {summary['hops_per_second']} hops/s < baseline {expected}"
+        )
+    if summary["errors"] > baseline.get("errors", 0):
+        regressions.append(f"{summary['errors']} errors")
+    return regressions
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument(
+        "--mode", choices=("inprocess", "hypercorn"), default="inprocess"
+    )
+    parser.add_argument("--sessions", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--wallets", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=1, help="Hypercorn workers")
+    parser.add_argument("--database-url", help="Defaults to a temporary SQLite file")
+    parser.add_argument("--rpc-url", help="Defaults to a local stub RPC")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5)
+    parser.add_argument("--output", type=Path, help="Also write the summary as JSON")
+    args = parser.parse_args()
+
+    stub = None
+    rpc_url = args.rpc_url
+    if rpc_url is None:
+        stub, rpc_url = start_stub_rpc()
+    database_url = (
+        args.database_url or f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/youssd_load.db"
+    )
+    configure_environment(database_url, rpc_url)
+
+    try:
+        import httpx
+
+        async with httpx.AsyncClient(base_url=rpc_url) as client:
+            await _wait_until_up(
+                client, "/", "POST", {"jsonrpc": "2.0", "id": 1, "method": "getHealth"}
+            )
+        wallets = await seed_wallets(args.wallets)
+        driver = (
+            InProcessDriver()
+            if args.mode == "inprocess"
+            else HypercornDriver(workers=args.workers)
+        )
+        async with driver:
+            results, elapsed = await run_load(
+                driver, Traffic(wallets), args.sessions, args.concurrency
+            )
+    finally:
+        if stub is not None:
+            stub.terminate()
+
+    summary = summarize(results, elapsed, args.sessions)
+    report(summary)
+    for error in results["errors"][:10]:
+        print(f"  error: {error}")
+    if args.output:
+        args.output.write_text(json.dumps(summary, indent=2))
+
+    baselines = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if args.save_baseline:
+        baselines[args.mode] = summary
+        args.baseline.write_text(json.dumps(baselines, indent=2) + "\n")
+        print(f"Saved {args.mode} baseline to {args.baseline}")
+        return
+    if args.mode not in baselines:
+        print(f"No {args.mode} baseline in {args.baseline}; run with --save-baseline")
+        return
+    regressions = compare(summary, baselines[args.mode], args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    if regressions:
+        sys.exit(1)
+    print(f"Within {args.tolerance:.0%} of the {args.mode} baseline")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,238 @@
+"""
+Local stand-in for a Solana JSON-RPC node, for benchmarks and manual testing.
+
+Balances are derived deterministically from each pubkey, every request is
+counted per method in `CALLS`, and an optional `--latency` simulates a
+remote node.
+
+The same port serves the websocket API (accountSubscribe/accountUnsubscribe)
+at `/`. POST {"pubkey": ..., "lamports": ...} to `/balance` to change a
+balance and notify its subscribers, and POST to `/disconnect` to drop every
+websocket, as a node restart would.
+
+Usage (from the api directory):
+    python -m benchmarks.stub_rpc --port 8899 --latency 0.05
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import itertools
+import json
+from collections import Counter
+from typing import Dict, Set
+
+from quart import Quart, request, websocket
+from solders.hash import Hash
+from solders.transaction import Transaction
+
+app = Quart("stub-rpc")
+app.config["LATENCY"] = 0.0
+
+CALLS = Counter()
+SLOT = 1000
+BLOCK_HEIGHT = 1000
+BLOCKHASH = str(Hash.new_unique())
+
+# Signatures of every transaction sent, all treated as finalized
+SENT = set()
+
+# Balances set through /balance, overriding the derived ones
+BALANCES: Dict[str, int] = {}
+
+# Websocket subscriptions: id -> pubkey, and the queues of live connections
+SUBSCRIPTION_IDS = itertools.count(1)
+SUBSCRIPTIONS: Dict[int, str] = {}
+CONNECTIONS: Set[asyncio.Queue] = set()
+
+
+def lamports_for(pubkey: str) -> int:
+    """Deterministic balance between 0 and ~4.3 SOL for a pubkey"""
+    if pubkey in BALANCES:
+        return BALANCES[pubkey]
+    return int.from_bytes(hashlib.sha256(pubkey.encode()).digest()[:4], "big")
+
+
+def _context(value):
+    return {"context": {"slot": SLOT}, "value": value}
+
+
+def _account(pubkey: str) -> dict:
+    return {
+        "lamports": lamports_for(pubkey),
+        "data": ["", "base64"],
+        "owner": "11111111111111111111111111111111",
+        "executable": False,
+        "rentEpoch": 0,
+        "space": 0,
+    }
+
+
+def get_health(params):
+    return "ok"
+
+
+def get_balance(params):
+    return _context(lamports_for(params[0]))
+
+
+def get_multiple_accounts(params):
+    return _context([_account(pubkey) for pubkey in params[0]])
+
+
+def get_latest_blockhash(params):
+    return _context(
+        {"blockhash": BLOCKHASH, "lastValidBlockHeight": BLOCK_HEIGHT + 150}
+    )
+
+
+def get_block_height(params):
+    return BLOCK_HEIGHT
+
+
+def send_transaction(params):
+    transaction = Transaction.from_bytes(base64.b64decode(params[0]))
+    signature = str(transaction.signatures[0])
+    SENT.add(signature)
+    return signature
+
+
+def get_signature_statuses(params):
+    return _context(
+        [
+            (
+                {
+                    "slot": SLOT,
+                    "confirmations": None,
+                    "err": None,
+                    "status": {"Ok": None},
+                    "confirmationStatus": "finalized",
+                }
+                if signature in SENT
+                else None
+            )
+            for signature in params[0]
+        ]
+    )
+
+
+METHODS = {
+    "getHealth": get_health,
+    "getBalance": get_balance,
+    "getMultipleAccounts": get_multiple_accounts,
+    "getLatestBlockhash": get_latest_blockhash,
+    "getBlockHeight": get_block_height,
+    "sendTransaction": send_transaction,
+    "getSignatureStatuses": get_signature_statuses,
+}
+
+
+async def _handle(body: dict) -> dict:
+    method = body.get("method")
+    CALLS[method] += 1
+    handler = METHODS.get(method)
+    if handler is None:
+        return {
+            "jsonrpc": "2.0",
+            "id": body.get("id"),
+            "error": {"code": -32601, "message": f"Method not found: {method}"},
+        }
+    return {"jsonrpc": "2.0", "id": body.get("id"), "result": handler(body["params"])}
+
+
+@app.route("/", methods=["POST"])
+async def rpc():
+    body = await request.get_json()
+    if app.config["LATENCY"]:
+        await asyncio.sleep(app.config["LATENCY"])
+    if isinstance(body, list):
+        return [await _handle(item) for item in body]
+    return await _handle(body)
+
+
+@app.route("/calls")
+async def calls():
+    return dict(CALLS)
+
+
+@app.route("/balance", methods=["POST"])
+async def set_balance():
+    body = await request.get_json()
+    BALANCES[body["pubkey"]] = body["lamports"]
+    for queue in CONNECTIONS:
+        queue.put_nowait(body["pubkey"])
+    return {"subscriptions": list(SUBSCRIPTIONS.values()).count(body["pubkey"])}
+
+
+@app.route("/disconnect", methods=["POST"])
+async def disconnect():
+    for queue in CONNECTIONS:
+        queue.put_nowait(None)
+    return {"connections": len(CONNECTIONS)}
+
+
+@app.websocket("/")
+async def ws():
+    changes = asyncio.Queue()
+    subscriptions: Dict[int, str] = {}
+    CONNECTIONS.add(changes)
+
+    async def notify():
+        while (pubkey := await changes.get()) is not None:
+            for subscription, subscribed in subscriptions.items():
+                if subscribed != pubkey:
+                    continue
+                notification = {
+                    "jsonrpc": "2.0",
+                    "method": "accountNotification",
+                    "params": {
+                        "result": _context(_account(pubkey)),
+                        "subscription": subscription,
+                    },
+                }
+                await websocket.send(json.dumps(notification))
+
+    notifier = asyncio.create_task(notify())
+    try:
+        while not notifier.done():
+            receive = asyncio.ensure_future(websocket.receive())
+            await asyncio.wait({receive, notifier}, return_when=asyncio.FIRST_COMPLETED)
+            if not receive.done():
+                receive.cancel()
+                break
+            body = json.loads(receive.result())
+            CALLS[body["method"]] += 1
+            if body["method"] == "accountSubscribe":
+                subscription = next(SUBSCRIPTION_IDS)
+                subscriptions[subscription] = SUBSCRIPTIONS[subscription] = body[
+                    "params"
+                ][0]
+                result = subscription
+            elif body["method"] == "accountUnsubscribe":
+                SUBSCRIPTIONS.pop(body["params"][0], None)
+                result = subscriptions.pop(body["params"][0], None) is not None
+            else:
+                result = None
+            await websocket.send(
+                json.dumps({"jsonrpc": "2.0", "id": body["id"], "result": result})
+            )
+    finally:
+        notifier.cancel()
+        CONNECTIONS.discard(changes)
+        for subscription in subscriptions:
+            SUBSCRIPTIONS.pop(subscription, None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8899)
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+    app.config["LATENCY"] = args.latency
+    app.run(host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
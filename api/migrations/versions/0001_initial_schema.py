@@ -0,0 +1,70 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2024-10-09 00:00:00
+
+Tables as created by the original Base.metadata.create_all() boot path.
+Databases that boot path already created have no alembic_version; upgrading
+one adopts its tables as this revision instead of failing to create them.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode() and sa.inspect(op.get_bind()).has_table("users"):
+        # Pre-migration database: only record the revision
+        return
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("full_name", sa.String(length=100), nullable=False),
+        sa.Column("email_address", sa.String(length=100), nullable=True),
+        sa.Column("phone_number", sa.String(length=15), nullable=False),
+        sa.Column("username", sa.String(length=30), nullable=True),
+        sa.Column("password", sa.String(), nullable=True),
+        sa.Column("public_key", sa.String(length=100), nullable=False),
+        sa.Column("private_key", sa.String(length=300), nullable=False),
+        sa.Column("wallet_alias", sa.String(length=100), nullable=True),
+        sa.Column("transaction_pin", sa.Integer(), nullable=True),
+        sa.Column("sol_balance", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_balance_update", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "waitlist",
+        sa.Column("id", sa.Uuid(), nullable=False),
+        sa.Column("user_id", sa.Uuid(), nullable=True),
+        sa.Column("phone_number", sa.String(length=20), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_table(
+        "keys",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("mnemonic", sa.String(), nullable=False),
+        sa.Column("private_key", sa.String(), nullable=False),
+        sa.Column("date_created", sa.DateTime(), nullable=False),
+        sa.Column("last_updated", sa.DateTime(), nullable=False),
+        sa.Column("is_current", sa.Boolean(), nullable=False),
+        sa.Column("is_expired", sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("keys")
+    op.drop_table("waitlist")
+    op.drop_table("users")
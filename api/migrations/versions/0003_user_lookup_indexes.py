@@ -0,0 +1,57 @@
+"""unique indexes for user lookups
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 00:00:00
+
+UserService.get_user routes each identifier to one of these columns. Every
+duplicate is a user with a wallet of its own, so none are removed here: the
+upgrade stops before creating any index, naming the duplicated values, and
+they have to be resolved by hand first.
+On a large Postgres table, consider building them CONCURRENTLY by hand and
+stamping this revision.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = ("phone_number", "username", "public_key", "wallet_alias")
+
+
+def check_duplicates() -> None:
+    duplicates = []
+    for column in COLUMNS:
+        rows = op.get_bind().execute(sa.text(f"""
+                SELECT {column}, COUNT(*) FROM users
+                WHERE {column} IS NOT NULL
+                GROUP BY {column}
+                HAVING COUNT(*) > 1
+                ORDER BY {column}
+                LIMIT 5
+                """))
+        duplicates += [f"{column}={value!r} ({count} users)" for value, count in rows]
+    if duplicates:
+        raise RuntimeError(
+            "Cannot create the unique user lookup indexes; resolve these "
+            "duplicates first: " + ", ".join(duplicates)
+        )
+
+
+def upgrade() -> None:
+    if not context.is_offline_mode():
+        check_duplicates()
+    for column in COLUMNS:
+        op.create_index(f"ix_users_{column}", "users", [column], unique=True)
+
+
+def downgrade() -> None:
+    for column in COLUMNS:
+        op.drop_index(f"ix_users_{column}", table_name="users")
@@ -0,0 +1,40 @@
+"""encrypted wallet keys
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 00:00:00
+
+New wallets keep their secret key sealed in `keys` instead of plaintext in
+`users.private_key`, which becomes nullable and is only read for older wallets.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.alter_column(
+            "private_key", existing_type=sa.String(length=300), nullable=True
+        )
+    with op.batch_alter_table("keys") as batch_op:
+        batch_op.alter_column("mnemonic", existing_type=sa.String(), nullable=True)
+        batch_op.create_index("ix_keys_user_id", ["user_id"])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("keys") as batch_op:
+        batch_op.drop_index("ix_keys_user_id")
+        batch_op.alter_column("mnemonic", existing_type=sa.String(), nullable=False)
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.alter_column(
+            "private_key", existing_type=sa.String(length=300), nullable=False
+        )
@@ -0,0 +1,42 @@
+"""unique waitlist phone numbers
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18 00:00:00
+
+Bulk waitlist imports upsert with ON CONFLICT (phone_number) DO NOTHING, which
+needs a unique index. Duplicate rows are removed first, keeping the earliest.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0006"
+down_revision: Union[str, None] = "0005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute(sa.text("""
+            DELETE FROM waitlist
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY phone_number ORDER BY created_at, id
+                    ) AS position
+                    FROM waitlist
+                ) ranked
+                WHERE position > 1
+            )
+            """))
+    op.create_index(
+        "ix_waitlist_phone_number", "waitlist", ["phone_number"], unique=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_waitlist_phone_number", table_name="waitlist")
@@ -0,0 +1,40 @@
+"""E.164 phone numbers
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18 00:00:00
+
+Fits "+" and up to 15 digits in users.phone_number. Existing rows are
+rewritten by `python -m services.phone_backfill`, run after this upgrade.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0008"
+down_revision: Union[str, None] = "0007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.alter_column(
+            "phone_number",
+            existing_type=sa.String(length=15),
+            type_=sa.String(length=16),
+            existing_nullable=False,
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.alter_column(
+            "phone_number",
+            existing_type=sa.String(length=16),
+            type_=sa.String(length=15),
+            existing_nullable=False,
+        )
@@ -0,0 +1,37 @@
+"""token accounts
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 00:00:00
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0009"
+down_revision: Union[str, None] = "0008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "token_accounts",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("owner", sa.String(length=44), nullable=False),
+        sa.Column("mint", sa.String(length=44), nullable=False),
+        sa.Column("address", sa.String(length=44), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("address"),
+        sa.UniqueConstraint("owner", "mint", name="uq_token_accounts_owner_mint"),
+    )
+    op.create_index("ix_token_accounts_mint", "token_accounts", ["mint"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_token_accounts_mint", table_name="token_accounts")
+    op.drop_table("token_accounts")
@@ -0,0 +1,55 @@
+"""balances in lamports
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 00:00:00
+
+`users.sol_balance` was an INTEGER column written with fractional SOL, which
+Postgres rejects. Balances are now whole lamports in a BIGINT column,
+`users.balance_lamports`; existing values are carried over.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0010"
+down_revision: Union[str, None] = "0009"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(
+            sa.Column(
+                "balance_lamports",
+                sa.BigInteger(),
+                nullable=False,
+                server_default="0",
+            )
+        )
+    op.execute(
+        "UPDATE users SET balance_lamports = "
+        "CAST(ROUND(sol_balance * 1000000000.0) AS BIGINT)"
+    )
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.alter_column(
+            "balance_lamports", existing_type=sa.BigInteger(), server_default=None
+        )
+        batch_op.drop_column("sol_balance")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(
+            sa.Column("sol_balance", sa.Integer(), nullable=False, server_default="0")
+        )
+    op.execute("UPDATE users SET sol_balance = balance_lamports / 1000000000")
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.alter_column(
+            "sol_balance", existing_type=sa.Integer(), server_default=None
+        )
+        batch_op.drop_column("balance_lamports")
@@ -0,0 +1,36 @@
+"""transfer job lease version
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-18 00:00:00
+
+Bumped by every claim and every write to a job, so a worker whose lease was
+taken over can no longer change (or re-sign) it.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0011"
+down_revision: Union[str, None] = "0010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("transfer_jobs") as batch_op:
+        batch_op.add_column(
+            sa.Column("version", sa.Integer(), nullable=False, server_default="0")
+        )
+    with op.batch_alter_table("transfer_jobs") as batch_op:
+        batch_op.alter_column(
+            "version", existing_type=sa.Integer(), server_default=None
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("transfer_jobs") as batch_op:
+        batch_op.drop_column("version")
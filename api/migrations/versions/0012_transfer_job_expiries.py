@@ -0,0 +1,36 @@
+"""transfer job expiries
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-18 00:00:00
+
+A job whose transaction expires unseen is signed again with its attempts
+reset, so the expiries are counted on their own to bound the re-signs.
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0012"
+down_revision: Union[str, None] = "0011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("transfer_jobs") as batch_op:
+        batch_op.add_column(
+            sa.Column("expiries", sa.Integer(), nullable=False, server_default="0")
+        )
+    with op.batch_alter_table("transfer_jobs") as batch_op:
+        batch_op.alter_column(
+            "expiries", existing_type=sa.Integer(), server_default=None
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("transfer_jobs") as batch_op:
+        batch_op.drop_column("expiries")
@@ -12,10 +12,8 @@ class Keys(Base):
     __tablename__ = "keys"
 
     id: Mapped[UUID] = mapped_column(UUID, primary_key=True, default=uuid4)
-    user_id: Mapped[UUID] = mapped_column(
-        UUID,
-    )
-    mnemonic: Mapped[String] = mapped_column(String)
+    user_id: Mapped[UUID] = mapped_column(UUID, index=True)
+    mnemonic: Mapped[String] = mapped_column(String, nullable=True)
     private_key: Mapped[String] = mapped_column(String)
     date_created: Mapped[DateTime] = mapped_column(DateTime, default=datetime.utcnow)
     last_updated: Mapped[DateTime] = mapped_column(
@@ -0,0 +1,43 @@
+from datetime import datetime
+
+from sqlalchemy import DateTime, String, UniqueConstraint
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models.base import Base
+from models.transfer import utcnow
+
+
+class TokenAccount(Base):
+    """
+    An associated token account known to exist on-chain.
+
+    The address is derived from owner and mint, so a row only records that
+    the account has been created; `services.token_accounts` keeps the hot
+    entries in memory in front of this table.
+    """
+
+    __tablename__ = "token_accounts"
+    __table_args__ = (
+        UniqueConstraint("owner", "mint", name="uq_token_accounts_owner_mint"),
+    )
+
+    id: Mapped[int] = mapped_column(primary_key=True, autoincrement=True)
+    owner: Mapped[str] = mapped_column(String(44), nullable=False)
+    mint: Mapped[str] = mapped_column(String(44), nullable=False, index=True)
+    address: Mapped[str] = mapped_column(String(44), nullable=False, unique=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=utcnow
+    )
+
+    def __init__(self, owner: str, mint: str, address: str):
+        self.owner = owner
+        self.mint = mint
+        self.address = address
+
+    def to_dict(self) -> dict[str, str]:
+        return {
+            "owner": self.owner,
+            "mint": self.mint,
+            "address": self.address,
+            "created_at": str(self.created_at),
+        }
@@ -0,0 +1,92 @@
+from datetime import datetime, timezone
+from uuid import uuid4
+
+from pydantic import UUID4
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, Text, Uuid
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models.base import Base
+
+
+def utcnow() -> datetime:
+    return datetime.now(tz=timezone.utc)
+
+
+class TransferJob(Base):
+    """
+    A SOL transfer queued from a USSD session and processed by the transfer workers.
+
+    Status moves pending -> submitted -> confirmed | failed.
+    The signed transaction is stored before it is sent, so a crashed worker can
+    resend the exact same bytes instead of signing a second transfer.
+    `attempts` counts claims since the job was last signed from scratch, and
+    `expiries` how often its transaction expired without landing.
+    `version` is checked and bumped by every UPDATE (claims included), so a
+    worker that lost its lease gets a StaleDataError instead of overwriting
+    the new holder's work.
+    """
+
+    __tablename__ = "transfer_jobs"
+    __table_args__ = (
+        Index("ix_transfer_jobs_status_next_attempt", "status", "next_attempt_at"),
+    )
+
+    id: Mapped[UUID4] = mapped_column(Uuid, primary_key=True, default=uuid4)
+    idempotency_key: Mapped[str] = mapped_column(
+        String(64), nullable=False, unique=True
+    )
+    sender_id: Mapped[UUID4] = mapped_column(Uuid, nullable=False)
+    recipient_id: Mapped[UUID4] = mapped_column(Uuid, nullable=False)
+    lamports: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="pending")
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    expiries: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    version: Mapped[int] = mapped_column(Integer, nullable=False)
+    signature: Mapped[str] = mapped_column(String(100), nullable=True)
+    raw_transaction: Mapped[str] = mapped_column(Text, nullable=True)
+    last_valid_block_height: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    error: Mapped[str] = mapped_column(Text, nullable=True)
+    next_attempt_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=utcnow
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=utcnow
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=utcnow, onupdate=utcnow
+    )
+
+    __mapper_args__ = {"version_id_col": version}
+
+    def __init__(
+        self,
+        idempotency_key: str,
+        sender_id: UUID4,
+        recipient_id: UUID4,
+        lamports: int,
+    ):
+        self.idempotency_key = idempotency_key
+        self.sender_id = sender_id
+        self.recipient_id = recipient_id
+        self.lamports = lamports
+        self.status = "pending"
+        self.attempts = 0
+        self.expiries = 0
+
+    @property
+    def amount(self) -> float:
+        return self.lamports / 1e9
+
+    def to_dict(self) -> dict[str, str | int | float]:
+        return {
+            "id": str(self.id),
+            "sender_id": str(self.sender_id),
+            "recipient_id": str(self.recipient_id),
+            "amount": self.amount,
+            "status": self.status,
+            "attempts": self.attempts,
+            "signature": self.signature,
+            "error": self.error,
+            "created_at": str(self.created_at),
+            "updated_at": str(self.updated_at),
+        }
@@ -2,7 +2,7 @@ from datetime import datetime, timezone
 from uuid import uuid4
 
 from pydantic import UUID4
-from sqlalchemy import DateTime, Integer, String, Uuid
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, Uuid
 from sqlalchemy.orm import Mapped, mapped_column
 
 from models.base import Base
@@ -10,20 +10,34 @@ from models.base import Base
 
 class Users(Base):
     __tablename__ = "users"
+    # Keyset pagination for exports
+    __table_args__ = (Index("ix_users_created_at_id", "created_at", "id"),)
 
     id: Mapped[UUID4] = mapped_column(Uuid, primary_key=True, default=uuid4)
     full_name: Mapped[str] = mapped_column(String(100), nullable=False)
     email_address: Mapped[str] = mapped_column(String(100), nullable=True)
-    phone_number: Mapped[str] = mapped_column(String(15), nullable=False)
-    username: Mapped[str] = mapped_column(String(30), nullable=True)
+    # E.164, e.g. +2348078807660
+    phone_number: Mapped[str] = mapped_column(
+        String(16), nullable=False, unique=True, index=True
+    )
+    username: Mapped[str] = mapped_column(
+        String(30), nullable=True, unique=True, index=True
+    )
     password: Mapped[str] = mapped_column(String, nullable=True)
-    public_key: Mapped[str] = mapped_column(String(100), nullable=False)
-    private_key: Mapped[str] = mapped_column(String(300), nullable=False)
-    wallet_alias: Mapped[str] = mapped_column(String(100), nullable=True)
+    public_key: Mapped[str] = mapped_column(
+        String(100), nullable=False, unique=True, index=True
+    )
+    # Legacy plaintext keys only; new wallets keep a sealed key in `keys`
+    private_key: Mapped[str] = mapped_column(String(300), nullable=True)
+    wallet_alias: Mapped[str] = mapped_column(
+        String(100), nullable=True, unique=True, index=True
+    )
     transaction_pin: Mapped[int] = mapped_column(Integer, nullable=True)
-    sol_balance: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    balance_lamports: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), nullable=False, default=datetime.now(tz=timezone.utc)
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(tz=timezone.utc),
     )
     last_balance_update: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), nullable=True
@@ -50,6 +64,11 @@ class Users(Base):
         self.wallet_alias = wallet_alias
         self.transaction_pin = transaction_pin
         self.email_address = email_address
+        self.balance_lamports = 0
+
+    @property
+    def sol_balance(self) -> float:
+        return self.balance_lamports / 1e9
 
     def to_dict(self) -> dict[str, str | int]:
         return {
@@ -1,21 +1,29 @@
 from datetime import datetime, timezone
+from typing import List, Optional
 from uuid import uuid4
 
 from pydantic import UUID4, BaseModel, Field
-from sqlalchemy import DateTime, String, Uuid
+from sqlalchemy import DateTime, Index, String, Uuid
 from sqlalchemy.orm import Mapped, mapped_column
 
 from models.base import Base
+from services.phone import PhoneNumber
 
 
 class Waitlist(Base):
     __tablename__ = "waitlist"
+    # Keyset pagination for exports
+    __table_args__ = (Index("ix_waitlist_created_at_id", "created_at", "id"),)
 
     id: Mapped[UUID4] = mapped_column(Uuid, primary_key=True, default=uuid4)
     user_id: Mapped[UUID4] = mapped_column(Uuid, nullable=True)
-    phone_number: Mapped[str] = mapped_column(String(20), nullable=False)
+    phone_number: Mapped[str] = mapped_column(
+        String(20), nullable=False, unique=True, index=True
+    )
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), nullable=False, default=datetime.now(tz=timezone.utc)
+        DateTime(timezone=True),
+        nullable=False,
+        default=lambda: datetime.now(tz=timezone.utc),
     )
 
     def __init__(self, phone_number: str, user_id=None):
@@ -31,10 +39,30 @@ class Waitlist(Base):
 
 
 class WaitlistJoinRequest(BaseModel):
-    phone_number: str = Field(
+    phone_number: PhoneNumber = Field(
         ..., description="Phone number", examples=["+2348078807660"]
     )
 
 
 class WaitlistJoinResponse(BaseModel):
     message: str = Field(..., description="Response message")
+
+
+class WaitlistBatchResult(BaseModel):
+    input: str = Field(..., description="Phone number as submitted")
+    phone_number: Optional[str] = Field(
+        None, description="Normalized phone number", examples=["+2348078807660"]
+    )
+    status: str = Field(
+        ...,
+        description="added, exists, duplicate (repeated in this batch) or invalid",
+        examples=["added"],
+    )
+
+
+class WaitlistBatchResponse(BaseModel):
+    added: int = Field(..., description="Numbers newly added")
+    exists: int = Field(..., description="Numbers already on the waitlist")
+    duplicate: int = Field(..., description="Repeats within this batch")
+    invalid: int = Field(..., description="Entries that aren't phone numbers")
+    results: List[WaitlistBatchResult] = Field(..., description="One per input")
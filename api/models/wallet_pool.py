@@ -0,0 +1,41 @@
+from datetime import datetime
+from uuid import uuid4
+
+from pydantic import UUID4
+from sqlalchemy import DateTime, String, Text, Uuid
+from sqlalchemy.orm import Mapped, mapped_column
+
+from models.base import Base
+from models.transfer import utcnow
+
+
+class WalletPool(Base):
+    """
+    A pre-generated wallet waiting for a user.
+
+    Rows hold the public key and the sealed secret key produced by
+    `services.keys.KeyService`; signup deletes one row and copies it onto the
+    new user in the same transaction.
+    """
+
+    __tablename__ = "wallet_pool"
+
+    id: Mapped[UUID4] = mapped_column(Uuid, primary_key=True, default=uuid4)
+    public_key: Mapped[str] = mapped_column(String(100), nullable=False, unique=True)
+    sealed_key: Mapped[str] = mapped_column(Text, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, default=utcnow
+    )
+
+    def __init__(self, public_key: str, sealed_key: str):
+        self.id = uuid4()
+        self.public_key = public_key
+        self.sealed_key = sealed_key
+        self.created_at = utcnow()
+
+    def to_dict(self) -> dict[str, str]:
+        return {
+            "id": str(self.id),
+            "public_key": self.public_key,
+            "created_at": str(self.created_at),
+        }
@@ -0,0 +1,46 @@
+import hmac
+import logging
+import os
+
+from quart import Blueprint, Response, request
+
+from services.export import EXPORTS, FORMATS, csv_export, ndjson_export
+
+logger = logging.getLogger(__name__)
+
+bp = Blueprint("export", __name__, url_prefix="/export")
+
+
+def authorized() -> bool:
+    """Whether the request has `Authorization: Bearer $ADMIN_TOKEN`; exports require it"""
+    token = os.getenv("ADMIN_TOKEN")
+    if not token:
+        return False
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ")
+    return hmac.compare_digest(supplied.encode(), token.encode())
+
+
+@bp.route("/<name>")
+async def export(name: str):
+    """
+    Stream every user or waitlist entry as NDJSON (default) or CSV
+
+    Query params:
+        format: ndjson or csv
+    """
+
+    if not authorized():
+        return "Forbidden", 403
+    export_format = request.args.get("format", "ndjson")
+    if name not in EXPORTS or export_format not in FORMATS:
+        return "Not found", 404
+
+    logger.info("Exporting %s as %s", name, export_format)
+    body = ndjson_export(name) if export_format == "ndjson" else csv_export(name)
+    response = Response(body, content_type=FORMATS[export_format])
+    response.headers["Content-Disposition"] = (
+        f'attachment; filename="{name}.{export_format}"'
+    )
+    # Large exports outlive the default response timeout
+    response.timeout = None
+    return response
@@ -1,4 +1,8 @@
-from quart import Blueprint, request
+import logging
+
+from quart import Blueprint, Response, request
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint("misc", __name__, url_prefix="")
 
@@ -6,12 +10,18 @@ bp = Blueprint("misc", __name__, url_prefix="")
 @bp.route("/logs", methods=["POST"])
 async def logs():
     data = await request.get_json()
-    print(f"data: {data}")
     logs = await request.values
-    print(f"logs: {logs}")
+    logger.info("Gateway log data=%s values=%s", data, logs)
     return "pong"
 
 
 @bp.route("/health")
 async def health():
     return "OK"
+
+
+@bp.route("/metrics")
+async def metrics():
+    from services.metrics import REGISTRY
+
+    return Response(await REGISTRY.render(), content_type="text/plain; version=0.0.4")
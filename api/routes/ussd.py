@@ -1,8 +1,12 @@
+import logging
+
 from quart import Blueprint
 from quart_schema import DataSource, validate_request
 
 from models.ussd import UssdRequest
-from services.ussd import process_request
+from services.ussd import respond
+
+logger = logging.getLogger(__name__)
 
 bp = Blueprint("ussd", __name__, url_prefix="")
 
@@ -17,13 +21,15 @@ async def ussd_callback(data: UssdRequest):
         str: response message
     """
 
-    # Log request data
-    print(f"{data=}")
-    print(
-        f"session_id='{data.session_id}' service_code='{data.service_code}' phone_number='{data.phone_number}' text='{data.text}'"
+    # The text is left out: it carries PINs
+    logger.debug(
+        "USSD hop service_code=%s network_code=%s depth=%d",
+        data.service_code,
+        data.network_code,
+        data.text.count("*") + 1 if data.text else 0,
     )
 
-    # Process the USSD request
-    response = await process_request(data)
+    # Process the USSD request within the gateway's timeout
+    response = await respond(data)
 
     return response
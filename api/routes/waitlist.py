@@ -1,10 +1,19 @@
-from quart import Blueprint
+import logging
+
+from quart import Blueprint, request
 from quart_schema import DataSource, validate_request, validate_response
 
-from models.waitlist import WaitlistJoinRequest, WaitlistJoinResponse
+from models.waitlist import (
+    WaitlistBatchResponse,
+    WaitlistJoinRequest,
+    WaitlistJoinResponse,
+)
+from routes.export import authorized
 from services.database import get_session
 from services.user import UserService
+from services.waitlist import WaitlistImporter, csv_phone_numbers
 
+logger = logging.getLogger(__name__)
 
 bp = Blueprint("waitlist", __name__)
 
@@ -20,9 +29,52 @@ async def waitlist(data: WaitlistJoinRequest):
         str: response message
     """
 
-    print(f"phone_number='{data.phone_number}'")
     async with get_session() as sess:
         user_service = UserService(sess)
         status, message = await user_service.add_to_waitlist(data)
-    print(f"status='{status}' message='{message}'")
+    logger.info("Waitlist join status=%s message=%s", status, message)
     return WaitlistJoinResponse(message=message), int(status)
+
+
+async def _json_phone_numbers(numbers):
+    for number in numbers:
+        yield str(number)
+
+
+@bp.route("/waitlist/batch", methods=["POST"])
+@validate_response(WaitlistBatchResponse)
+async def waitlist_batch():
+    """
+    Add many phone numbers to the waitlist at once
+
+    Accepts a JSON array of phone numbers (or {"phoneNumbers": [...]}), or a
+    text/csv body with the numbers in the first column, which is read as it
+    streams in. Numbers already on the waitlist are reported, not re-added.
+    Requires `Authorization: Bearer $ADMIN_TOKEN`, since the results tell
+    which numbers were already on the waitlist.
+
+    Returns:
+        WaitlistBatchResponse: counts and a result for every input
+    """
+
+    if not authorized():
+        return WaitlistJoinResponse(message="Forbidden"), 403
+
+    if request.mimetype == "text/csv":
+        numbers = csv_phone_numbers(
+            request.body, request.mimetype_params.get("charset", "utf-8")
+        )
+    else:
+        payload = await request.get_json(silent=True)
+        if isinstance(payload, dict):
+            payload = payload.get("phoneNumbers", payload.get("phone_numbers"))
+        if not isinstance(payload, list):
+            return WaitlistJoinResponse(message="Expected a list of phone numbers"), 400
+        numbers = _json_phone_numbers(payload)
+
+    async with get_session() as sess:
+        importer = WaitlistImporter(sess)
+        await importer.add_all(numbers)
+    summary = importer.summary()
+    logger.info("Waitlist batch import %s", summary)
+    return WaitlistBatchResponse(**summary, results=importer.results), 200
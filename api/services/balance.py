@@ -0,0 +1,88 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from services.cache import TTLCache
+
+
+class BalanceCache:
+    """
+    Read-through cache of wallet balances keyed by public key.
+
+    - Values younger than `ttl` are served straight from memory.
+    - Values older than `ttl` but younger than `stale_ttl` are served immediately
+      while a single background refresh runs (stale-while-revalidate).
+    - Concurrent misses for the same key share one RPC call (single-flight).
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[str], Awaitable[float]],
+        ttl: float = 10.0,
+        stale_ttl: float = 60.0,
+        maxsize: int = 100_000,
+    ):
+        """
+        Args:
+            fetch (Callable): Coroutine function returning the balance for a public key.
+            ttl (float, optional): Seconds a balance is considered fresh. Defaults to 10.
+            stale_ttl (float, optional): Seconds a stale balance may still be served. Defaults to 60.
+            maxsize (int, optional): Maximum number of cached wallets. Defaults to 100_000.
+        """
+        self.fetch = fetch
+        self.ttl = ttl
+        self.cache = TTLCache(maxsize=maxsize, ttl=max(ttl, stale_ttl))
+        self.fetches = 0
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    async def get(self, public_key: str) -> float:
+        """Return the balance for `public_key`, hitting the RPC at most once per key at a time"""
+        entry = self.cache.get(public_key)
+        if entry is None:
+            return await asyncio.shield(self._refresh(public_key))
+
+        balance, fetched_at = entry
+        if time.monotonic() - fetched_at >= self.ttl:
+            self._refresh(public_key)
+        return balance
+
+    def prime(self, public_key: str, balance: float, updated_at: Optional[datetime]):
+        """Seed the cache from a persisted balance if it is still fresh"""
+        if updated_at is None:
+            return
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        age = (datetime.now(tz=timezone.utc) - updated_at).total_seconds()
+        if 0 <= age < self.ttl and public_key not in self.cache:
+            self.cache.set(public_key, (balance, time.monotonic() - age))
+
+    def set(self, public_key: str, balance: float):
+        """Store a balance learned elsewhere (e.g. after a transfer)"""
+        self.cache.set(public_key, (balance, time.monotonic()))
+
+    def update(self, public_key: str, balance: float):
+        """Overwrite a balance only if it is already cached, keeping the LRU order"""
+        if public_key in self.cache:
+            self.cache.set(public_key, (balance, time.monotonic()))
+
+    def invalidate(self, public_key: str):
+        self.cache.pop(public_key)
+
+    def _refresh(self, public_key: str) -> asyncio.Task:
+        task = self._inflight.get(public_key)
+        if task is None:
+            task = asyncio.ensure_future(self._fetch(public_key))
+            self._inflight[public_key] = task
+            # Background revalidations may have no awaiter to collect errors
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _fetch(self, public_key: str) -> float:
+        try:
+            self.fetches += 1
+            balance = await self.fetch(public_key)
+            self.cache.set(public_key, (balance, time.monotonic()))
+            return balance
+        finally:
+            self._inflight.pop(public_key, None)
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Optional
+
+from solders.pubkey import Pubkey
+from sqlalchemy import update
+
+from models.user import Users
+from services.balance import BalanceCache
+from services.database import get_session, run_as_leader
+from services.transfer import SolanaTransfer
+from services.user import UserService
+from services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceRefresher:
+    """
+    Background task that keeps `Users.balance_lamports` warm for every wallet.
+
+    Users are walked in pages; each page costs one getMultipleAccounts call per
+    100 wallets and a single bulk UPDATE for the balances that changed, so the
+    welcome screen never needs a per-user RPC.
+
+    Every worker starts one, but only the holder of the `balance_refresher`
+    advisory lock sweeps; the others try again every `interval` seconds and
+    take over if it goes away.
+    """
+
+    def __init__(
+        self,
+        sol_transfer: SolanaTransfer,
+        interval: float = 60.0,
+        page_size: int = 500,
+        balance_cache: Optional[BalanceCache] = None,
+    ):
+        """
+        Args:
+            sol_transfer (SolanaTransfer): Client used for the batched balance lookups.
+            interval (float, optional): Seconds between full sweeps. Defaults to 60.
+            page_size (int, optional): Users loaded per page. Defaults to 500.
+            balance_cache (BalanceCache, optional): In-process cache to keep in sync.
+        """
+        self.sol_transfer = sol_transfer
+        self.interval = interval
+        self.page_size = page_size
+        self.balance_cache = balance_cache
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh_page(self, after_id=None):
+        """
+        Refresh one page of users.
+
+        Returns:
+            tuple: The id to continue after (None when done) and the number of rows updated.
+        """
+        # No connection is held across the RPC call
+        async with get_session() as sess:
+            users = await UserService(sess).get_all_users(
+                limit=self.page_size, after_id=after_id
+            )
+        if not users:
+            return None, 0
+
+        balances = await self.sol_transfer.get_multiple_balances(
+            [Pubkey.from_string(user.public_key) for user in users]
+        )
+        now = datetime.now(tz=timezone.utc)
+        changes = []
+        for user in users:
+            balance = balances[Pubkey.from_string(user.public_key)]
+            if self.balance_cache is not None:
+                # Only wallets already cached; a sweep mustn't evict the hot ones
+                self.balance_cache.update(user.public_key, balance)
+            lamports = round(balance * 1e9)
+            if lamports != user.balance_lamports:
+                changes.append(
+                    {
+                        "id": user.id,
+                        "balance_lamports": lamports,
+                        "last_balance_update": now,
+                    }
+                )
+
+        if changes:
+            async with get_session() as sess:
+                # ORM bulk UPDATE by primary key: one executemany for the page
+                await sess.execute(update(Users), changes)
+                await sess.commit()
+            for change in changes:
+                user_cache.invalidate(user_id=change["id"])
+
+        last_id = users[-1].id if len(users) == self.page_size else None
+        return last_id, len(changes)
+
+    async def refresh_all(self) -> int:
+        """Walk every user once and return the number of balances updated"""
+        updated, after_id = 0, None
+        while True:
+            after_id, count = await self.refresh_page(after_id)
+            updated += count
+            if after_id is None:
+                return updated
+
+    async def run(self):
+        await run_as_leader("balance_refresher", self.sweep, self.interval)
+
+    async def sweep(self):
+        updated = await self.refresh_all()
+        logger.info("Balance refresh updated %d wallets", updated)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
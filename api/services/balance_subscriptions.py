@@ -0,0 +1,281 @@
+import asyncio
+import itertools
+import json
+import logging
+import os
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+import websockets
+from solders.pubkey import Pubkey
+from sqlalchemy import update
+
+from models.user import Users
+from services.balance import BalanceCache
+from services.database import get_session
+from services.reconnect import Reconnector
+from services.transfer import SolanaTransfer
+from services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+
+class BalanceSubscriptions:
+    """
+    Websocket `accountSubscribe` subscriptions for recently active wallets.
+
+    Wallets are tracked as users reach the USSD menu; all of them share one
+    websocket connection, and the least recently active one is unsubscribed
+    once more than `max_subscriptions` are tracked. Every account
+    notification updates the in-process balance cache at once, and is
+    written to `Users.balance_lamports` in a bulk UPDATE every `flush_interval`
+    seconds. A wallet's balance is only served from here while its
+    subscription is live, so `current` never returns a value that might
+    have missed a change.
+
+    After a dropped connection it reconnects with exponential backoff and
+    resubscribes every tracked wallet.
+    """
+
+    def __init__(
+        self,
+        ws_url: str,
+        sol_transfer: SolanaTransfer,
+        max_subscriptions: int = 1000,
+        flush_interval: float = 1.0,
+        commitment: str = "confirmed",
+        balance_cache: Optional[BalanceCache] = None,
+    ):
+        """
+        Args:
+            ws_url (str): The RPC node's websocket endpoint.
+            sol_transfer (SolanaTransfer): Fetches each wallet's balance once its subscription starts.
+            max_subscriptions (int, optional): Wallets subscribed at most. Defaults to 1000.
+            flush_interval (float, optional): Seconds between database writes. Defaults to 1.
+            commitment (str, optional): Commitment of the notifications. Defaults to "confirmed".
+            balance_cache (BalanceCache, optional): In-process cache to keep in sync.
+        """
+        self.ws_url = ws_url
+        self.sol_transfer = sol_transfer
+        self.max_subscriptions = max_subscriptions
+        self.flush_interval = flush_interval
+        self.commitment = commitment
+        self.balance_cache = balance_cache
+        self.notifications = 0
+        self.evictions = 0
+        self.connection = Reconnector(
+            self._connect,
+            f"Balance websocket to {ws_url}",
+            expected=(OSError, asyncio.TimeoutError, websockets.WebSocketException),
+            on_disconnect=self._disconnected,
+        )
+        # Public key -> user id, least recently active first
+        self._wallets: OrderedDict[str, object] = OrderedDict()
+        # State of the current connection, reset when it drops
+        self._outbox: Optional[asyncio.Queue] = None
+        self._requests: Dict[int, str] = {}
+        self._subscriptions: Dict[str, int] = {}
+        self._public_keys: Dict[int, str] = {}
+        self._balances: Dict[str, float] = {}
+        self._unseeded: Set[str] = set()
+        # User id -> balance, waiting for the next flush
+        self._changes: Dict[object, float] = {}
+        self._ids = itertools.count(1)
+        self._tasks = []
+
+    @classmethod
+    def from_env(
+        cls, sol_transfer: SolanaTransfer, balance_cache: Optional[BalanceCache] = None
+    ) -> Optional["BalanceSubscriptions"]:
+        """Configured by $SOLANA_WS_URL, or None if unset"""
+        ws_url = os.getenv("SOLANA_WS_URL")
+        if not ws_url:
+            return None
+        return cls(
+            ws_url,
+            sol_transfer,
+            max_subscriptions=int(os.getenv("BALANCE_SUBSCRIPTIONS", 1000)),
+            flush_interval=float(os.getenv("BALANCE_FLUSH_INTERVAL", 1)),
+            balance_cache=balance_cache,
+        )
+
+    def track(self, user: Users):
+        """Mark a user's wallet as active, subscribing to it if it's new"""
+        public_key = user.public_key
+        if public_key in self._wallets:
+            self._wallets.move_to_end(public_key)
+            return
+        self._wallets[public_key] = user.id
+        self._subscribe(public_key)
+        while len(self._wallets) > self.max_subscriptions:
+            evicted, _ = self._wallets.popitem(last=False)
+            self.evictions += 1
+            self._forget(evicted)
+
+    def current(self, public_key: str) -> Optional[float]:
+        """The wallet's balance if its subscription is live, else None"""
+        return self._balances.get(public_key)
+
+    def _send(self, method: str, params: list) -> Optional[int]:
+        if self._outbox is None:
+            return None
+        request_id = next(self._ids)
+        self._outbox.put_nowait(
+            {"jsonrpc": "2.0", "id": request_id, "method": method, "params": params}
+        )
+        return request_id
+
+    def _subscribe(self, public_key: str):
+        request_id = self._send(
+            "accountSubscribe",
+            [public_key, {"encoding": "base64", "commitment": self.commitment}],
+        )
+        if request_id is not None:
+            self._requests[request_id] = public_key
+
+    def _forget(self, public_key: str):
+        self._balances.pop(public_key, None)
+        self._unseeded.discard(public_key)
+        subscription = self._subscriptions.pop(public_key, None)
+        if subscription is not None:
+            del self._public_keys[subscription]
+            self._send("accountUnsubscribe", [subscription])
+
+    def _receive(self, message: Dict):
+        if message.get("method") == "accountNotification":
+            params = message["params"]
+            public_key = self._public_keys.get(params["subscription"])
+            if public_key is not None:
+                lamports = params["result"]["value"]["lamports"]
+                self._update(public_key, float(lamports) / 1e9)
+            return
+
+        public_key = self._requests.pop(message.get("id"), None)
+        if public_key is None:
+            return
+        if "error" in message:
+            logger.warning("Subscribing to %s failed: %s", public_key, message["error"])
+            return
+        subscription = message["result"]
+        if public_key not in self._wallets:
+            # Evicted while the request was in flight
+            self._send("accountUnsubscribe", [subscription])
+            return
+        self._subscriptions[public_key] = subscription
+        self._public_keys[subscription] = public_key
+        self._unseeded.add(public_key)
+
+    def _update(self, public_key: str, balance: float):
+        self.notifications += 1
+        self._unseeded.discard(public_key)
+        self._balances[public_key] = balance
+        if self.balance_cache is not None:
+            self.balance_cache.set(public_key, balance)
+        self._changes[self._wallets[public_key]] = balance
+
+    async def _seed(self):
+        """One balance fetch per new subscription, since notifications only carry changes"""
+        public_keys = list(self._unseeded)
+        if not public_keys:
+            return
+        balances = await self.sol_transfer.get_multiple_balances(
+            [Pubkey.from_string(public_key) for public_key in public_keys]
+        )
+        for public_key in public_keys:
+            # A notification that arrived meanwhile is newer than the fetch
+            if public_key in self._unseeded:
+                self._unseeded.discard(public_key)
+                balance = balances[Pubkey.from_string(public_key)]
+                self._balances[public_key] = balance
+                if self.balance_cache is not None:
+                    self.balance_cache.set(public_key, balance)
+
+    async def flush(self) -> int:
+        """Write balances changed since the last flush; returns rows updated"""
+        changes, self._changes = self._changes, {}
+        if not changes:
+            return 0
+        now = datetime.now(tz=timezone.utc)
+        try:
+            async with get_session() as sess:
+                # ORM bulk UPDATE by primary key: one executemany for all of them
+                await sess.execute(
+                    update(Users),
+                    [
+                        {
+                            "id": user_id,
+                            "balance_lamports": round(balance * 1e9),
+                            "last_balance_update": now,
+                        }
+                        for user_id, balance in changes.items()
+                    ],
+                )
+                await sess.commit()
+        except Exception:
+            # Keep them for the next flush, unless a newer balance came in
+            self._changes = {**changes, **self._changes}
+            raise
+        for user_id in changes:
+            user_cache.invalidate(user_id=user_id)
+        return len(changes)
+
+    async def _connect(self):
+        async with websockets.connect(self.ws_url) as ws:
+            outbox = self._outbox = asyncio.Queue()
+            for public_key in self._wallets:
+                self._subscribe(public_key)
+            writer = asyncio.create_task(self._write(ws, outbox))
+            try:
+                async for message in ws:
+                    self._receive(json.loads(message))
+            finally:
+                writer.cancel()
+                await asyncio.gather(writer, return_exceptions=True)
+
+    @staticmethod
+    async def _write(ws, outbox: asyncio.Queue):
+        while True:
+            await ws.send(json.dumps(await outbox.get()))
+
+    def _disconnected(self):
+        self._outbox = None
+        self._requests.clear()
+        self._subscriptions.clear()
+        self._public_keys.clear()
+        self._balances.clear()
+        self._unseeded.clear()
+
+    async def run(self):
+        await self.connection.run()
+
+    async def run_writes(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self._seed()
+                await self.flush()
+            except Exception:
+                logger.exception("Writing subscribed balances failed")
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [
+                asyncio.create_task(self.run()),
+                asyncio.create_task(self.run_writes()),
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._subscriptions),
+            "notifications": self.notifications,
+            "evictions": self.evictions,
+            "reconnects": self.connection.reconnects,
+        }
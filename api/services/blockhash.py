@@ -0,0 +1,124 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Dict, NamedTuple, Optional
+
+from solders.hash import Hash
+
+from services.rpc import RpcManager
+
+logger = logging.getLogger(__name__)
+
+# A blockhash is accepted for 150 blocks (about 60 seconds at 400ms slots).
+# Handing out only young ones leaves a signed transaction most of that window
+# to land, even after a retry or two.
+DEFAULT_MAX_AGE = 20.0
+DEFAULT_REFRESH_INTERVAL = 5.0
+
+
+class RecentBlockhash(NamedTuple):
+    blockhash: Hash
+    last_valid_block_height: int
+    fetched_at: float
+
+
+class BlockhashCache:
+    """
+    The latest blockhash, shared by every transaction this process signs.
+
+    A background task refreshes it every `refresh_interval` seconds, so
+    signing a transfer costs no RPC call. Without the task (or if it falls
+    behind) `get` fetches inline once the value is older than `max_age`, and
+    concurrent callers share that one getLatestBlockhash call.
+    """
+
+    def __init__(
+        self,
+        rpc: RpcManager,
+        max_age: float = DEFAULT_MAX_AGE,
+        refresh_interval: float = DEFAULT_REFRESH_INTERVAL,
+    ):
+        """
+        Args:
+            rpc (RpcManager): Client used for getLatestBlockhash.
+            max_age (float, optional): Seconds a blockhash is handed out for. Defaults to DEFAULT_MAX_AGE.
+            refresh_interval (float, optional): Seconds between background refreshes. Defaults to DEFAULT_REFRESH_INTERVAL.
+        """
+        self.rpc = rpc
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.hits = 0
+        self.fetches = 0
+        self._latest: Optional[RecentBlockhash] = None
+        self._inflight: Optional[asyncio.Task] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, rpc: RpcManager) -> "BlockhashCache":
+        """Tuned by $BLOCKHASH_MAX_AGE and $BLOCKHASH_REFRESH_INTERVAL"""
+        return cls(
+            rpc,
+            max_age=float(os.getenv("BLOCKHASH_MAX_AGE", DEFAULT_MAX_AGE)),
+            refresh_interval=float(
+                os.getenv("BLOCKHASH_REFRESH_INTERVAL", DEFAULT_REFRESH_INTERVAL)
+            ),
+        )
+
+    async def get(self) -> RecentBlockhash:
+        """A blockhash younger than `max_age`, fetching one only if needed"""
+        latest = self._latest
+        if latest is not None and time.monotonic() - latest.fetched_at < self.max_age:
+            self.hits += 1
+            return latest
+        return await asyncio.shield(self.refresh())
+
+    def refresh(self) -> asyncio.Task:
+        """Fetch a new blockhash, joining a fetch already in flight"""
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+            # A refresh nobody awaits may still fail; don't leave it unretrieved
+            self._inflight.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return self._inflight
+
+    def invalidate(self):
+        """Stop handing out the current blockhash, e.g. after the cluster rejected it"""
+        self._latest = None
+
+    async def _fetch(self) -> RecentBlockhash:
+        try:
+            self.fetches += 1
+            started = time.monotonic()
+            result = await self.rpc.call("get_latest_blockhash")
+            # Age from when the request went out, the conservative end
+            self._latest = RecentBlockhash(
+                result.value.blockhash, result.value.last_valid_block_height, started
+            )
+            return self._latest
+        finally:
+            self._inflight = None
+
+    async def run(self):
+        while True:
+            try:
+                await asyncio.shield(self.refresh())
+            except Exception:
+                logger.exception("Blockhash refresh failed")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": int(self._latest is not None),
+            "hits": self.hits,
+            "fetches": self.fetches,
+        }
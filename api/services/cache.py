@@ -0,0 +1,82 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterator, Optional
+
+
+class TTLCache:
+    """
+    A bounded in-process cache with per-entry TTL and LRU eviction.
+
+    Expired entries are dropped lazily on access and opportunistically from the
+    cold end of the LRU order on insert, so no background sweeper is needed.
+    """
+
+    def __init__(self, maxsize: int = 10_000, ttl: float = 180.0):
+        """
+        Initializes the cache.
+
+        Args:
+            maxsize (int, optional): Maximum number of live entries. Defaults to 10_000.
+            ttl (float, optional): Default time-to-live in seconds. Defaults to 180.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the live value for `key`, refreshing its LRU position"""
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Store `value` under `key`, evicting expired then least-recently-used entries"""
+        now = time.monotonic()
+        self._data[key] = (now + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        self._evict(now)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove `key` and return its value if it was still live"""
+        item = self._data.pop(key, None)
+        if item is None or item[0] <= time.monotonic():
+            return default
+        return item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def keys(self) -> Iterator[Hashable]:
+        return iter(list(self._data.keys()))
+
+    def _evict(self, now: float):
+        # Sweep a handful of expired entries from the cold end first
+        for _ in range(8):
+            if not self._data:
+                break
+            key, (expires_at, _) = next(iter(self._data.items()))
+            if expires_at > now:
+                break
+            del self._data[key]
+            self.expirations += 1
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+_MISSING = object()
@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Callable, Dict, NamedTuple, Optional
+
+from solana.rpc.core import (
+    TransactionExpiredBlockheightExceededError,
+    UnconfirmedTxError,
+)
+from solders.signature import Signature
+from solders.transaction_status import (
+    TransactionConfirmationStatus,
+    TransactionStatus,
+)
+
+from services import deadline
+from services.rpc import RpcManager
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on signatures per getSignatureStatuses request
+MAX_SIGNATURES = 256
+
+# How long to wait for a signature with no last valid block height to go by
+DEFAULT_CONFIRM_TIMEOUT = 90.0
+
+COMMITMENTS = {
+    "processed": TransactionConfirmationStatus.Processed,
+    "confirmed": TransactionConfirmationStatus.Confirmed,
+    "finalized": TransactionConfirmationStatus.Finalized,
+}
+
+
+class _Pending(NamedTuple):
+    future: asyncio.Future
+    last_valid_block_height: Optional[int]
+    give_up_at: float
+
+
+class SignatureConfirmer:
+    """
+    Confirms every in-flight transaction with shared getSignatureStatuses calls.
+
+    Callers hand in a signature and get a future for its status; a single
+    loop polls all pending signatures together, MAX_SIGNATURES per call.
+    The loop ticks every `min_interval` seconds while signatures are being
+    added or resolved and backs off towards `max_interval` while nothing
+    changes, then exits once nothing is pending.
+
+    A signature the cluster has never seen fails with
+    `TransactionExpiredBlockheightExceededError` once the chain passes its
+    last valid block height; one getBlockHeight call per tick covers all of
+    them. Signatures without a height fail with `UnconfirmedTxError` after
+    `timeout` seconds, as `AsyncClient.confirm_transaction` does.
+    """
+
+    def __init__(
+        self,
+        rpc: RpcManager,
+        commitment: str = "finalized",
+        min_interval: float = 0.4,
+        max_interval: float = 2.0,
+        timeout: float = DEFAULT_CONFIRM_TIMEOUT,
+    ):
+        """
+        Args:
+            rpc (RpcManager): Client used for the status and block height lookups.
+            commitment (str, optional): "processed", "confirmed" or "finalized". Defaults to "finalized".
+            min_interval (float, optional): Shortest time between polls in seconds. Defaults to 0.4.
+            max_interval (float, optional): Longest time between polls in seconds. Defaults to 2.
+            timeout (float, optional): Seconds to wait on signatures without a block height. Defaults to DEFAULT_CONFIRM_TIMEOUT.
+        """
+        self.rpc = rpc
+        self.commitment = int(COMMITMENTS[commitment])
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.polls = 0
+        self.confirmed = 0
+        self.expired = 0
+        self._interval = min_interval
+        self._pending: Dict[Signature, _Pending] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, rpc: RpcManager) -> "SignatureConfirmer":
+        """Tuned by $CONFIRM_COMMITMENT, $CONFIRM_MIN_INTERVAL and $CONFIRM_MAX_INTERVAL"""
+        return cls(
+            rpc,
+            commitment=os.getenv("CONFIRM_COMMITMENT", "finalized").lower(),
+            min_interval=float(os.getenv("CONFIRM_MIN_INTERVAL", 0.4)),
+            max_interval=float(os.getenv("CONFIRM_MAX_INTERVAL", 2)),
+        )
+
+    def watch(
+        self,
+        signature: Signature,
+        last_valid_block_height: Optional[int] = None,
+        callback: Optional[Callable[[asyncio.Future], None]] = None,
+    ) -> asyncio.Future:
+        """
+        Start tracking a signature; watching one twice shares the future.
+
+        Args:
+            signature (Signature): The transaction to confirm.
+            last_valid_block_height (int, optional): Give up once the chain passes this height.
+            callback (Callable, optional): Called with the future once it resolves.
+
+        Returns:
+            asyncio.Future: Resolves to the TransactionStatus at the commitment.
+        """
+        pending = self._pending.get(signature)
+        if pending is None:
+            pending = _Pending(
+                asyncio.get_running_loop().create_future(),
+                last_valid_block_height,
+                time.monotonic() + self.timeout,
+            )
+            self._pending[signature] = pending
+            # Nobody may await a callback-only watch; don't leave errors unretrieved
+            pending.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        if callback is not None:
+            pending.future.add_done_callback(callback)
+        self._interval = self.min_interval
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run())
+        return pending.future
+
+    async def confirm(
+        self, signature: Signature, last_valid_block_height: Optional[int] = None
+    ) -> TransactionStatus:
+        """
+        Wait for a signature to reach the commitment.
+
+        Returns:
+            TransactionStatus: The status; a failed transaction has `err` set.
+
+        Raises:
+            TransactionExpiredBlockheightExceededError: If it expired without landing.
+            UnconfirmedTxError: If there's no block height and it timed out.
+        """
+        future = self.watch(signature, last_valid_block_height)
+        # Shielded: a cancelled waiter mustn't resolve the future for the others
+        return await deadline.wait_for(asyncio.shield(future))
+
+    async def poll(self) -> int:
+        """Check every pending signature once; returns how many were resolved"""
+        self.polls += 1
+        signatures = list(self._pending)
+        resolved = 0
+        block_height = None
+        for start in range(0, len(signatures), MAX_SIGNATURES):
+            chunk = signatures[start : start + MAX_SIGNATURES]
+            result = await self.rpc.call("get_signature_statuses", chunk)
+            for signature, status in zip(chunk, result.value):
+                pending = self._pending.get(signature)
+                if pending is None:
+                    continue
+                if pending.future.done():
+                    # Cancelled by whoever held it
+                    del self._pending[signature]
+                    continue
+                if self._reached(status):
+                    self.confirmed += 1
+                    pending.future.set_result(status)
+                elif status is not None:
+                    # Landed; it can no longer expire, only get there
+                    continue
+                elif pending.last_valid_block_height is not None:
+                    if block_height is None:
+                        block_height = (await self.rpc.call("get_block_height")).value
+                    if block_height <= pending.last_valid_block_height:
+                        continue
+                    self.expired += 1
+                    pending.future.set_exception(
+                        TransactionExpiredBlockheightExceededError(
+                            f"{signature} has expired: block height exceeded"
+                        )
+                    )
+                elif time.monotonic() >= pending.give_up_at:
+                    self.expired += 1
+                    pending.future.set_exception(
+                        UnconfirmedTxError(f"Unable to confirm transaction {signature}")
+                    )
+                else:
+                    continue
+                self._pending.pop(signature, None)
+                resolved += 1
+        return resolved
+
+    def _reached(self, status: Optional[TransactionStatus]) -> bool:
+        if status is None or status.confirmation_status is None:
+            return False
+        return int(status.confirmation_status) >= self.commitment
+
+    async def run(self):
+        # Not bound by the deadline of whichever request started the loop
+        deadline.current_deadline.set(None)
+        while self._pending:
+            await asyncio.sleep(self._interval)
+            try:
+                resolved = await self.poll()
+            except Exception:
+                logger.exception("Signature status poll failed")
+                resolved = 0
+            if resolved:
+                self._interval = self.min_interval
+            else:
+                self._interval = min(self._interval * 1.5, self.max_interval)
+
+    async def stop(self):
+        """Stop polling and fail whatever is still pending"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        for pending in self._pending.values():
+            pending.future.cancel()
+        self._pending.clear()
+
+    def stats(self):
+        return {
+            "size": len(self._pending),
+            "polls": self.polls,
+            "confirmed": self.confirmed,
+            "expired": self.expired,
+        }
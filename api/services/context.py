@@ -0,0 +1,70 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.user import Users
+from models.ussd import UssdRequest
+from services.misc import UssdInput, parse_input
+from services.user import UserService
+from services.user_cache import user_cache
+
+
+@dataclass
+class UssdContext:
+    """
+    Unit of work for a single USSD hop.
+
+    Holds one DB session and the caller's user, loaded once and shared by every
+    state handler, plus a working copy of the session data that is persisted
+    once when the hop finishes.
+    """
+
+    data: UssdRequest
+    db: AsyncSession
+    session_data: Dict = field(default_factory=dict)
+    user: Optional[Users] = None
+    input: Optional[UssdInput] = None
+    ended: bool = False
+
+    @property
+    def users(self) -> UserService:
+        return UserService(self.db)
+
+    @property
+    def state(self) -> str:
+        return self.session_data.get("state", "initial")
+
+    async def load_user(self) -> Optional[Users]:
+        """Look the caller up by phone number, once per hop"""
+        self.user = await self.users.get_user_by_phone_number(self.data.phone_number)
+        return self.user
+
+    def read_input(self) -> UssdInput:
+        """Parse only the segment entered since the previous hop"""
+        self.input = parse_input(self.data.text, self.session_data.get("offset", 0))
+        self.session_data["offset"] = self.input.offset
+        return self.input
+
+    def set(self, **data):
+        """Merge values into the session data"""
+        self.session_data.update(data)
+
+    def end(self):
+        """Drop the session once the hop finishes"""
+        self.ended = True
+
+    async def commit(self):
+        """
+        Commit pending changes, if any, with a single round trip, then drop
+        any changed users from the user cache.
+        """
+        if self.db.new or self.db.dirty or self.db.deleted:
+            changed = [
+                obj
+                for obj in (*self.db.dirty, *self.db.deleted)
+                if isinstance(obj, Users)
+            ]
+            await self.db.commit()
+            for user in changed:
+                user_cache.invalidate_user(user)
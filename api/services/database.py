@@ -1,8 +1,29 @@
+import asyncio
+import hashlib
+import logging
 import os
 from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
 from dotenv import load_dotenv
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import (
+    AsyncConnection,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from services import deadline
+from services.metrics import instrument_engine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).resolve().parent.parent / "migrations" / "versions"
 
 load_dotenv()
 DATABASE_URL = (
@@ -12,31 +33,251 @@ DATABASE_URL = (
 )
 
 
-def get_engine():
-    return create_async_engine(DATABASE_URL, echo=True)
+def _pool_options(url: str) -> dict:
+    """Pool settings from the environment, skipped for in-memory SQLite"""
+    options = {
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", 1800)),
+    }
+    parsed = make_url(url)
+    if parsed.database not in (None, "", ":memory:"):
+        # aiosqlite defaults file databases to NullPool; queue them like Postgres
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=int(os.getenv("DB_POOL_SIZE", 10)),
+            max_overflow=int(os.getenv("DB_MAX_OVERFLOW", 20)),
+            pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", 5)),
+        )
+    return options
+
+
+def get_engine(url: str = None):
+    url = url or DATABASE_URL
+    return create_async_engine(url, **_pool_options(url))
 
 
+# One engine and session factory per process, so connections are reused across
+# requests instead of being re-established on every query
 engine = get_engine()
+instrument_engine(engine)
+session_factory = async_sessionmaker(
+    engine, expire_on_commit=False, class_=AsyncSession
+)
+
+
+# SQLSTATE of a statement Postgres cancelled, e.g. on statement_timeout
+QUERY_CANCELED = "57014"
+
+
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _statement_timeout(conn, cursor, statement, parameters, context, executemany):
+    """
+    Bound each statement by the request deadline, if any.
+
+    The timeout is set once per transaction and set again only when the
+    deadline has moved since, e.g. after a hop is handed to the background,
+    so the common case costs one extra round trip per transaction.
+    """
+    value = deadline.current_deadline.get()
+    if value is None or conn.dialect.name != "postgresql":
+        return
+    applied = (conn.get_transaction(), value, value.expires_at)
+    if conn.info.get("statement_timeout") == applied:
+        return
+    conn.info["statement_timeout"] = applied
+    # 0 would disable the timeout
+    timeout_ms = max(int(value.remaining() * 1000), 1)
+    cursor.execute(f"SET LOCAL statement_timeout = {timeout_ms}")
+
+
+def statement_timed_out(error: BaseException) -> bool:
+    """Whether `error` is Postgres cancelling a statement, as statement_timeout does"""
+    if not isinstance(error, DBAPIError):
+        return False
+    orig = error.orig
+    return QUERY_CANCELED in (
+        getattr(orig, "sqlstate", None),
+        getattr(orig, "pgcode", None),
+    )
+
+
+def upsert(session: AsyncSession, model):
+    """The dialect's INSERT for `model`, which supports ON CONFLICT DO NOTHING"""
+    dialect = session.bind.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"No upsert support for {dialect}")
+    return insert(model)
 
 
 @asynccontextmanager
 async def get_session():
-    async_session = async_sessionmaker(
-        engine, expire_on_commit=False, class_=AsyncSession
-    )
-    async with async_session() as session:
+    async with session_factory() as session:
+        yield session
+
+
+class AdvisoryLock:
+    """A lock taken by `advisory_lock`, on the connection that holds it, if any"""
+
+    def __init__(self, name: str, locked: bool, conn: Optional[AsyncConnection]):
+        self.name = name
+        self.locked = locked
+        self.conn = conn
+
+    async def held(self) -> bool:
+        """
+        Whether this process still holds the lock.
+
+        Postgres drops a session-level lock with its connection, and another
+        worker may take it right away, so the connection is checked with a
+        round trip on every call; once that fails the lock counts as lost.
+        """
+        if not self.locked or self.conn is None:
+            return self.locked
         try:
-            yield session
+            await self.conn.scalar(text("SELECT 1"))
+            await self.conn.commit()
+        except Exception:
+            logger.warning("Lost the %s lock with its connection", self.name)
+            self.locked = False
+        return self.locked
+
+
+@asynccontextmanager
+async def advisory_lock(name: str) -> AsyncIterator[AdvisoryLock]:
+    """
+    Try to take the database-wide lock `name` for as long as the block runs.
+
+    Background jobs that every worker starts (balance sweeps, pool refills)
+    use it to elect one runner per deployment, see `run_as_leader`. On
+    Postgres it is a session-level advisory lock on a connection kept for
+    the whole block, so the lock goes away with the process if it dies.
+    Other databases have no such lock and always get it: SQLite is only used
+    with a single worker.
+
+    Yields:
+        AdvisoryLock: Whether, and for how long, this process holds the lock.
+    """
+    if engine.dialect.name != "postgresql":
+        yield AdvisoryLock(name, True, None)
+        return
+    key = int.from_bytes(hashlib.sha256(name.encode()).digest()[:8], "big", signed=True)
+    async with engine.connect() as conn:
+        lock = AdvisoryLock(
+            name,
+            await conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": key}),
+            conn,
+        )
+        # The lock outlives the transaction; don't sit idle inside one
+        await conn.commit()
+        try:
+            yield lock
         finally:
-            await session.close()
-            await engine.dispose()
+            if lock.locked:
+                await conn.execute(
+                    text("SELECT pg_advisory_unlock(:key)"), {"key": key}
+                )
+                await conn.commit()
+
+
+async def run_as_leader(
+    name: str, step: Callable[[], Awaitable[None]], interval: float
+):
+    """
+    Run `step` every `interval` seconds while this process holds the lock `name`.
+
+    Every worker runs this in a background task. Whoever gets the lock calls
+    `step`, and makes sure it still holds the lock before each call. The
+    other workers try for the lock every `interval` seconds, so one of them
+    takes over when the leader goes away. A failed step is logged and
+    retried on the next tick. Never returns.
+    """
+    while True:
+        try:
+            async with advisory_lock(name) as lock:
+                while await lock.held():
+                    try:
+                        await step()
+                    except Exception:
+                        logger.exception("%s failed", name)
+                    await asyncio.sleep(interval)
+        except Exception:
+            logger.exception("Lost the %s lock", name)
+        await asyncio.sleep(interval)
 
 
 # Database setup
 async def init_db():
+    """
+    Create any missing tables straight from the models.
+
+    Only for throwaway databases (benchmarks, local experiments); real ones
+    are created and upgraded by the migrations, see `check_schema`.
+    """
     async with engine.begin() as conn:
         # Import all models here
+        from models import (  # noqa: F401
+            auth,
+            token_account,
+            transfer,
+            user,
+            waitlist,
+            wallet_pool,
+        )
         from models.base import Base
 
         # Create tables
         await conn.run_sync(Base.metadata.create_all)
+
+
+async def close_db():
+    """Dispose of the connection pool, called once when the server shuts down"""
+    await engine.dispose()
+
+
+def latest_revision() -> Optional[str]:
+    """
+    The newest migration's revision id.
+
+    Revisions are numbered in order and lead their file names (see
+    alembic.ini), so the directory listing is enough; loading the scripts
+    through alembic would take about half a second on every start.
+    """
+    revisions = [path.name.split("_", 1)[0] for path in MIGRATIONS_DIR.glob("*_*.py")]
+    return max(revisions, default=None)
+
+
+async def check_schema():
+    """
+    Make sure the database has been migrated, without running any DDL.
+
+    Migrations are applied once per deploy, out of band, with
+    `alembic upgrade head`; workers starting in parallel only read the
+    current revision, so they never race each other on schema changes.
+
+    Raises:
+        RuntimeError: If the database is missing migrations.
+    """
+    expected = latest_revision()
+    try:
+        async with engine.connect() as conn:
+            current = await conn.scalar(text("SELECT version_num FROM alembic_version"))
+    except DBAPIError as e:
+        raise RuntimeError(
+            "Can't read the database's schema revision; "
+            "run `alembic upgrade head` from the api directory"
+        ) from e
+    if current is None or (expected is not None and current < expected):
+        raise RuntimeError(
+            f"Database schema is at revision {current}, expected {expected}; "
+            "run `alembic upgrade head` from the api directory"
+        )
+    if expected is not None and current > expected:
+        logger.warning(
+            "Database schema revision %s is newer than this build's %s",
+            current,
+            expected,
+        )
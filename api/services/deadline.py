@@ -0,0 +1,147 @@
+"""
+Per-request deadlines.
+
+A USSD gateway drops the session if a hop isn't answered within its timeout,
+so each hop gets a `Deadline` in a context variable. Everything that waits on
+I/O caps its own timeout by the time left: RPC calls, session store access and
+(on Postgres) each statement's timeout. Tasks started while a deadline is set
+inherit it.
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Awaitable, Optional, Set, TypeVar
+
+T = TypeVar("T")
+
+
+class DeadlineExceeded(asyncio.TimeoutError):
+    """Raised when the current request's time budget is used up"""
+
+
+class Deadline:
+    """An absolute point on the monotonic clock; `extend` moves it"""
+
+    def __init__(self, budget: float):
+        self.expires_at = time.monotonic() + budget
+        # Waits in progress, rescheduled when the deadline moves
+        self.timers: Set["_Timer"] = set()
+
+    def remaining(self) -> float:
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def when(self, loop: asyncio.AbstractEventLoop, limit: Optional[float]) -> float:
+        """The deadline in `loop` time, or `limit` if that is sooner"""
+        when = loop.time() + self.remaining()
+        return when if limit is None else min(when, limit)
+
+    def extend(self, budget: float):
+        """Give the work `budget` more seconds from now, e.g. once it's backgrounded"""
+        self.expires_at = time.monotonic() + budget
+        for timer in self.timers:
+            timer.schedule(self)
+
+
+current_deadline: ContextVar[Optional[Deadline]] = ContextVar(
+    "current_deadline", default=None
+)
+
+
+@contextmanager
+def request_deadline(budget: float):
+    """Run the block (and tasks it starts) under a deadline `budget` seconds away"""
+    value = Deadline(budget)
+    token = current_deadline.set(value)
+    try:
+        yield value
+    finally:
+        current_deadline.reset(token)
+
+
+def remaining(default: Optional[float] = None) -> Optional[float]:
+    """Seconds left before the current deadline, or `default` without one"""
+    value = current_deadline.get()
+    return default if value is None else value.remaining()
+
+
+def cap(timeout: Optional[float]) -> Optional[float]:
+    """
+    A timeout no later than the current deadline.
+
+    Raises:
+        DeadlineExceeded: If the deadline has already passed.
+    """
+    value = current_deadline.get()
+    if value is None:
+        return timeout
+    left = value.remaining()
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return left if timeout is None else min(timeout, left)
+
+
+class _Timer:
+    """Cancels the waiting task when the deadline (or its own limit) passes"""
+
+    __slots__ = ("task", "loop", "limit", "handle", "fired")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, limit: Optional[float]):
+        self.task = asyncio.current_task()
+        self.loop = loop
+        self.limit = limit
+        self.handle = None
+        self.fired = False
+
+    def schedule(self, value: Deadline):
+        self.cancel()
+        self.handle = self.loop.call_at(value.when(self.loop, self.limit), self._fire)
+
+    def _fire(self):
+        self.fired = True
+        self.task.cancel()
+
+    def cancel(self):
+        if self.handle is not None:
+            self.handle.cancel()
+
+
+async def wait_for(awaitable: Awaitable[T], timeout: Optional[float] = None) -> T:
+    """
+    `asyncio.wait_for` bounded by the current deadline as well as `timeout`.
+
+    The awaitable runs in the calling task, with no extra task per call. If
+    the deadline is extended while waiting (the request was handed to the
+    background), the wait follows it instead of timing out at the old one.
+
+    Raises:
+        DeadlineExceeded: If the deadline passed first.
+        asyncio.TimeoutError: If `timeout` passed first.
+    """
+    value = current_deadline.get()
+    if value is None:
+        return await asyncio.wait_for(awaitable, timeout)
+
+    loop = asyncio.get_running_loop()
+    timer = _Timer(loop, None if timeout is None else loop.time() + timeout)
+    timer.schedule(value)
+    value.timers.add(timer)
+    try:
+        return await awaitable
+    except asyncio.CancelledError:
+        if not timer.fired:
+            raise
+        # Python 3.11+ counts cancel() requests; withdraw ours
+        if hasattr(timer.task, "uncancel"):
+            timer.task.uncancel()
+        if value.expired:
+            raise DeadlineExceeded("Request deadline exceeded") from None
+        raise asyncio.TimeoutError() from None
+    finally:
+        timer.cancel()
+        value.timers.discard(timer)
@@ -0,0 +1,199 @@
+import asyncio
+import base64
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from solders.keypair import Keypair
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.auth import Keys
+from models.user import Users
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+SEALED_VERSION = "v1"
+
+
+class KeyDecryptionError(Exception):
+    """Raised when a stored key can't be decrypted with the configured KEK"""
+
+
+def _b64(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def _unb64(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data.encode())
+
+
+def load_kek() -> bytes:
+    """
+    The key-encryption key, from $KEY_ENCRYPTION_KEY (32 bytes, urlsafe base64).
+
+    In development a key is derived from $SECRET_KEY instead, so local setups
+    work without extra configuration.
+
+    Raises:
+        ValueError: If neither is set, since a key derived from nothing would
+            seal every wallet under a publicly known key.
+    """
+    raw = os.getenv("KEY_ENCRYPTION_KEY")
+    if raw:
+        kek = _unb64(raw.strip())
+        if len(kek) != 32:
+            raise ValueError("KEY_ENCRYPTION_KEY must decode to 32 bytes")
+        return kek
+    if os.getenv("env") != "dev":
+        raise ValueError("KEY_ENCRYPTION_KEY is required outside development")
+    secret = os.getenv("SECRET_KEY", "").strip()
+    if len(secret) < 10:
+        raise ValueError(
+            "KEY_ENCRYPTION_KEY or SECRET_KEY (at least 10 characters) is required"
+        )
+    logger.warning("KEY_ENCRYPTION_KEY is not set; deriving one from SECRET_KEY")
+    return hashlib.sha256(f"youssd-kek:{secret}".encode()).digest()
+
+
+class KeyService:
+    """
+    Generates wallet keypairs and keeps their secrets encrypted at rest.
+
+    Each secret key is sealed with its own random data key (AES-256-GCM), and
+    the data key is wrapped with the key-encryption key, so rotating the KEK
+    only means re-wrapping data keys. Ciphertexts are bound to the wallet's
+    public key, so a sealed key can't be swapped onto another user.
+
+    Key generation and crypto run in a small thread pool, off the event loop.
+    Ready, already sealed wallets for signup come from the `wallet_pool`
+    table (see `services.wallet_pool`); decrypted keypairs are cached briefly
+    for the transfer workers.
+    """
+
+    def __init__(
+        self,
+        kek: bytes,
+        threads: int = 2,
+        cache_ttl: float = 30.0,
+        cache_size: int = 1000,
+    ):
+        """
+        Args:
+            kek (bytes): 32-byte key-encryption key.
+            threads (int, optional): Threads for generation and crypto. Defaults to 2.
+            cache_ttl (float, optional): Seconds a decrypted keypair is kept. Defaults to 30.
+            cache_size (int, optional): Maximum decrypted keypairs kept. Defaults to 1000.
+        """
+        self._kek = AESGCM(kek)
+        self.kek_id = hashlib.sha256(kek).hexdigest()[:8]
+        self.threads = threads
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+
+    @classmethod
+    def from_env(cls) -> "KeyService":
+        return cls(
+            load_kek(),
+            threads=int(os.getenv("KEY_THREADS", 2)),
+            cache_ttl=float(os.getenv("KEY_CACHE_TTL", 30)),
+        )
+
+    def seal(self, secret: bytes, public_key: str) -> str:
+        """Encrypt a secret key under a fresh data key wrapped by the KEK"""
+        data_key = AESGCM.generate_key(bit_length=256)
+        nonce, wrap_nonce = os.urandom(12), os.urandom(12)
+        ciphertext = AESGCM(data_key).encrypt(nonce, secret, public_key.encode())
+        wrapped = self._kek.encrypt(wrap_nonce, data_key, self.kek_id.encode())
+        return ":".join(
+            (
+                SEALED_VERSION,
+                self.kek_id,
+                _b64(wrap_nonce + wrapped),
+                _b64(nonce + ciphertext),
+            )
+        )
+
+    def open(self, sealed: str, public_key: str) -> bytes:
+        """Decrypt a secret key produced by `seal`"""
+        try:
+            version, kek_id, wrapped, ciphertext = sealed.split(":")
+        except ValueError:
+            raise KeyDecryptionError("Malformed sealed key")
+        if version != SEALED_VERSION or kek_id != self.kek_id:
+            raise KeyDecryptionError(f"Key sealed with unknown KEK {kek_id}")
+        wrapped, ciphertext = _unb64(wrapped), _unb64(ciphertext)
+        try:
+            data_key = self._kek.decrypt(wrapped[:12], wrapped[12:], kek_id.encode())
+            return AESGCM(data_key).decrypt(
+                ciphertext[:12], ciphertext[12:], public_key.encode()
+            )
+        except InvalidTag:
+            raise KeyDecryptionError("Sealed key failed authentication")
+
+    def _generate(self) -> Tuple[str, str]:
+        keypair = Keypair()
+        public_key = str(keypair.pubkey())
+        return public_key, self.seal(bytes(keypair), public_key)
+
+    async def _in_thread(self, func, *args):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.threads, thread_name_prefix="keys"
+            )
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    async def generate(self) -> Tuple[str, str]:
+        """Generate and seal a keypair in the thread pool"""
+        return await self._in_thread(self._generate)
+
+    def new_key(self, user: Users, sealed: str) -> Keys:
+        """The `Keys` row holding a user's sealed secret key"""
+        return Keys(user_id=user.id, mnemonic=None, private_key=sealed)
+
+    async def keypair_for(self, session: AsyncSession, user: Users) -> Keypair:
+        """Decrypt the user's current signing keypair, cached for a short while"""
+        keypair = self._cache.get(user.id)
+        if keypair is not None:
+            return keypair
+
+        result = await session.execute(
+            select(Keys.private_key)
+            .where(Keys.user_id == user.id, Keys.is_current.is_(True))
+            .order_by(Keys.date_created.desc())
+            .limit(1)
+        )
+        sealed = result.scalar_one_or_none()
+        if sealed is not None:
+            secret = await self._in_thread(self.open, sealed, user.public_key)
+            keypair = Keypair.from_bytes(secret)
+        elif await user.awaitable_attrs.private_key:
+            # Wallets created before keys were encrypted
+            keypair = Keypair.from_json(user.private_key)
+        else:
+            raise KeyDecryptionError(f"No signing key for user {user.id}")
+
+        self._cache.set(user.id, keypair)
+        return keypair
+
+    def forget(self, user_id):
+        """Drop a cached decrypted keypair, e.g. after rotation"""
+        self._cache.pop(user_id)
+
+    async def close(self):
+        """Shut down the thread pool"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {"cached_keypairs": len(self._cache)}
+
+
+key_service = KeyService.from_env()
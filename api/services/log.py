@@ -0,0 +1,139 @@
+"""
+Logging setup: JSON records with request/session correlation ids, written by
+a background thread so handlers on the event loop never block on stdout.
+
+Configured from the environment:
+    LOG_LEVEL   root level, default INFO
+    LOG_LEVELS  per-logger levels, e.g. "services.ussd=DEBUG,sqlalchemy.engine=INFO"
+    LOG_SAMPLE  fraction of sub-WARNING records kept per logger, e.g. "access=0.1"
+    LOG_FORMAT  "json" (default) or "text"
+
+Call sites use `logging.getLogger(__name__)` and %-style arguments, so nothing
+is formatted unless the record is actually emitted.
+"""
+
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+session_id: ContextVar[Optional[str]] = ContextVar("session_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via `extra=`
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+
+def _parse_pairs(value: str) -> Dict[str, str]:
+    pairs = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, setting = item.partition("=")
+        pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+class ContextFilter(logging.Filter):
+    """Stamp records with the correlation ids of the task that logged them"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id.get()
+        record.session_id = session_id.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of DEBUG/INFO records for the configured logger prefixes"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Longest prefix first, so "a.b" wins over "a"
+        self.rates = sorted(rates.items(), key=lambda item: -len(item[0]))
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                return random.random() < rate
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc_info"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _Handler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve the message here; the listener thread does the formatting
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def setup_logging() -> Optional[QueueListener]:
+    """Route all logging through a queue to a stdout writer thread; idempotent"""
+    global _listener
+    if _listener is not None:
+        return _listener
+
+    if os.getenv("LOG_FORMAT", "json") == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+        )
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    handler = _Handler(log_queue)
+    handler.addFilter(ContextFilter())
+    rates = {
+        name: float(rate)
+        for name, rate in _parse_pairs(os.getenv("LOG_SAMPLE", "")).items()
+    }
+    if rates:
+        handler.addFilter(SamplingFilter(rates))
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in _parse_pairs(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    _listener = QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
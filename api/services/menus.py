@@ -0,0 +1,63 @@
+from services.state_machine import Menu
+
+# Every USSD screen, parsed once at import time
+
+MAIN_MENU = Menu(
+    "Welcome to YouSSD. What would you like to do?\n1. Sign up\n2. Access wallet"
+)
+WELCOME_BACK = Menu(
+    "Welcome back {username}.\nCurrent balance: {balance} SOL.\n\n What would you like to do?\n1. Access wallet\n2. Quit\n3. View details"
+)
+WALLET_ACCESS = Menu(
+    "Wallet Access:\n1. View Balance\n2. Send sol\n3. Back to Main Menu"
+)
+SIGNUP_PROMPT = Menu(
+    "Enter your desired username and full name\ne.g 'idris_cool, Ade Obi':"
+)
+SIGNUP_FORMAT = Menu(
+    "Expected format 'username, full name'\n\te.g 'idris_cool, Ade Obi'", end=True
+)
+SIGNUP_INVALID_USERNAME = Menu("Invalid username. Please try again.")
+SIGNUP_USERNAME_TAKEN = Menu(
+    "Username {username} is taken. Enter another username and your full name\ne.g 'idris_cool, Ade Obi':"
+)
+SIGNUP_SUCCESS = Menu(
+    "Thank you for signing up, {username}!\nYour account has been created.\nYour public key is: \n{key_head}\n{key_tail}",
+    end=True,
+)
+SIGNUP_ERROR = Menu("An error occurred during signup. Please try again.", end=True)
+USER_EXISTS = Menu("User already exists", end=True)
+USER_DETAILS = Menu(
+    "Username: {username}\nWallet nick: {alias}\nPublic key: {public_key}\nBalance: {balance} SOL",
+    end=True,
+)
+BALANCE = Menu("Your balance is: {balance} SOL", end=True)
+LAST_KNOWN_BALANCE = Menu(
+    "Your balance was {balance} SOL at {updated_at}. "
+    "Live balances are unavailable right now.",
+    end=True,
+)
+BALANCE_UNAVAILABLE = Menu(
+    "Your balance is unavailable right now. Please try again later.", end=True
+)
+GOODBYE = Menu("Thank you for using YouSSD. Goodbye!", end=True)
+
+RECIPIENT_PROMPT = Menu("Enter the recipient's username:")
+AMOUNT_PROMPT = Menu("Enter amount to send to {recipient} (in SOL):")
+INVALID_AMOUNT = Menu("Enter an amount above 0 to send to {recipient} (in SOL):")
+INSUFFICIENT_BALANCE = Menu(
+    "Your balance is {balance} SOL. Enter a smaller amount to send to {recipient}:"
+)
+CONFIRM_SEND = Menu("Confirm sending {amount} SOL to {recipient}? \n1. Yes\n2. No")
+PIN_PROMPT = Menu("Enter transaction pin:")
+TRANSACTION_CANCELED = Menu("Transaction canceled.", end=True)
+INVALID_PIN = Menu("Invalid pin. Please try again.", end=True)
+RECIPIENT_NOT_FOUND = Menu("User {recipient} not found", end=True)
+TRANSFER_QUEUED = Menu(
+    "Sending {amount} SOL to {recipient}. Expect an sms once it completes", end=True
+)
+
+SIGNUP_REQUIRED = Menu("Please sign up first.", end=True)
+INVALID_INPUT = Menu("Invalid input. Please try again.", end=True)
+GENERIC_ERROR = Menu("An error occurred. Please try again.", end=True)
+PROCESSING = Menu("Processing, dial again")
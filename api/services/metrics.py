@@ -0,0 +1,278 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Recording is a dict lookup plus an addition (and a bisect for histograms), all
+on the event loop thread, so instruments are cheap enough to leave on. Values
+that are expensive or only meaningful at scrape time are filled in by
+collectors registered with `REGISTRY.add_collector`.
+"""
+
+import functools
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; tuned for USSD hops, which the gateway abandons after a few seconds
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple, object] = {}
+
+    def _key(self, labels: Dict) -> Tuple:
+        if len(labels) != len(self.labels):
+            raise ValueError(f"{self.name} expects labels {self.labels}")
+        return tuple(labels[name] for name in self.labels)
+
+    def clear(self):
+        self._values.clear()
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        for key, value in self._values.items():
+            yield self.name, _format_labels(self.labels, key), value
+
+    def render(self) -> List[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        lines.extend(
+            f"{name}{labels} {value}" for name, labels, value in self.samples()
+        )
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value: float, **labels):
+        """Mirror a running total kept elsewhere, from a collector"""
+        self._values[self._key(labels)] = value
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            # Per-bucket counts (last one is +Inf), then the running sum
+            state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the duration of the `with` block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                labels = _format_labels(self.labels, key, f'le="{bound}"')
+                yield f"{self.name}_bucket", labels, cumulative
+            labels = _format_labels(self.labels, key)
+            yield f"{self.name}_sum", labels, total
+            yield f"{self.name}_count", labels, cumulative
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._collectors: List[Callable[[], Awaitable[None]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels=()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self, name: str, documentation: str, labels=(), buckets=DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], Awaitable[None]]):
+        """Register a coroutine function that updates gauges just before a scrape"""
+        self._collectors.append(collector)
+
+    async def render(self) -> str:
+        for collector in self._collectors:
+            await collector()
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+USSD_REQUEST_SECONDS = REGISTRY.histogram(
+    "ussd_request_seconds", "Time to process one USSD hop", ("outcome",)
+)
+USSD_STATE_SECONDS = REGISTRY.histogram(
+    "ussd_state_seconds", "Time spent in each USSD state handler", ("state",)
+)
+USSD_RESPONSES = REGISTRY.counter(
+    "ussd_responses_total", "USSD responses by outcome (CON or END)", ("outcome",)
+)
+DB_QUERY_SECONDS = REGISTRY.histogram(
+    "db_query_seconds", "Database statement execution time", ("statement",)
+)
+RPC_SECONDS = REGISTRY.histogram(
+    "rpc_seconds", "Solana RPC time per SolanaTransfer method", ("method",)
+)
+RPC_ERRORS = REGISTRY.counter(
+    "rpc_errors_total", "Failed SolanaTransfer calls per method", ("method",)
+)
+# Kept apart from RPC_SECONDS: these include local signing and confirmation polling
+TRANSFER_STEP_SECONDS = REGISTRY.histogram(
+    "transfer_step_seconds",
+    "Time per SolanaTransfer signing or confirmation step, including waits",
+    ("method",),
+)
+RPC_ENDPOINT_LATENCY = REGISTRY.gauge(
+    "rpc_endpoint_latency_seconds", "Smoothed latency per RPC endpoint", ("url",)
+)
+RPC_ENDPOINT_ERROR_RATE = REGISTRY.gauge(
+    "rpc_endpoint_error_rate", "Smoothed error rate per RPC endpoint", ("url",)
+)
+RPC_ENDPOINT_HEALTHY = REGISTRY.gauge(
+    "rpc_endpoint_healthy", "1 if the RPC endpoint is in rotation", ("url",)
+)
+WALLET_POOL_DEPTH = REGISTRY.gauge(
+    "wallet_pool_depth", "Pre-generated wallets ready for signup"
+)
+WALLET_POOL_CLAIMS = REGISTRY.counter(
+    "wallet_pool_claims_total",
+    "Signup wallets by source: the pool table, or generated on demand",
+    ("source",),
+)
+CACHE_ENTRIES = REGISTRY.gauge(
+    "cache_entries", "Entries held by each in-process cache", ("cache",)
+)
+CACHE_EVENTS = REGISTRY.counter(
+    "cache_events_total",
+    "Hits, misses, evictions and expirations per in-process cache",
+    ("cache", "event"),
+)
+
+
+def timed(histogram: Histogram, errors: Counter = None, **labels):
+    """Decorator recording a coroutine's duration, and failures if `errors` is set"""
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(**labels)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - start, **labels)
+
+        return wrapper
+
+    return decorator
+
+
+def instrument_engine(engine):
+    """Time every statement run through an (async) SQLAlchemy engine"""
+    from sqlalchemy import event
+
+    sync_engine = getattr(engine, "sync_engine", engine)
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, many):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, many):
+        start = conn.info["query_start"].pop()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement else ""
+        DB_QUERY_SECONDS.observe(time.perf_counter() - start, statement=verb)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def handle_error(context):
+        # Keep the start-time stack balanced when a statement fails
+        starts = (
+            context.connection.info.get("query_start") if context.connection else None
+        )
+        if starts:
+            starts.pop()
@@ -1,3 +1,45 @@
-def process_request(text):
-    words = text.split("*")
-    return words, len(words)
+from typing import NamedTuple, Optional
+
+# Navigation tokens a subscriber can enter on any screen
+NAV_BACK = "0"
+NAV_HOME = "00"
+
+
+class UssdInput(NamedTuple):
+    """
+    The part of the cumulative USSD `text` that is new on this hop.
+
+    Attributes:
+        value (str): The newly entered segment; may itself contain '*'.
+        offset (int): Characters of `text` consumed so far, stored in the session.
+        nav (str, optional): NAV_BACK or NAV_HOME when the segment is a navigation token.
+    """
+
+    value: str
+    offset: int
+    nav: Optional[str] = None
+
+
+def parse_input(text: str, offset: int = 0) -> UssdInput:
+    """
+    Return only the segment appended since `offset`, instead of re-splitting the
+    whole history that gateways resend on every hop.
+
+    Args:
+        text (str): The cumulative text sent by the gateway, e.g. "1*2*alice".
+        offset (int, optional): Offset consumed by the previous hop. Defaults to 0.
+
+    Returns:
+        UssdInput: The new segment and the offset to store for the next hop.
+    """
+    if offset == 0:
+        value = text
+    elif len(text) > offset and text[offset] == "*":
+        value = text[offset + 1 :]
+    else:
+        # History doesn't extend what we consumed (gateway reset or replay),
+        # fall back to the last segment
+        value = text.rsplit("*", 1)[-1]
+
+    nav = value if value in (NAV_BACK, NAV_HOME) else None
+    return UssdInput(value=value, offset=len(text), nav=nav)
@@ -0,0 +1,54 @@
+import os
+import re
+from typing import Optional
+
+from pydantic import AfterValidator
+from typing_extensions import Annotated
+
+# Numbers without an international prefix are assumed to be Nigerian
+DEFAULT_COUNTRY_CODE = os.getenv("DEFAULT_COUNTRY_CODE", "234")
+
+_SEPARATORS = re.compile(r"[\s\-().]")
+_DIGITS = re.compile(r"[0-9]{8,15}")
+
+
+def normalize_phone_number(
+    raw: str, country_code: str = DEFAULT_COUNTRY_CODE
+) -> Optional[str]:
+    """
+    Normalize a phone number to "+<country code><number>".
+
+    Accepts "+234...", "00234...", "234..." and local "0..." forms with any
+    spaces, dashes, dots or brackets.
+
+    Args:
+        raw (str): The number as entered.
+        country_code (str, optional): Used for local numbers. Defaults to DEFAULT_COUNTRY_CODE.
+
+    Returns:
+        Optional[str]: The normalized number, or None if it isn't a phone number.
+    """
+    number = _SEPARATORS.sub("", str(raw or "").strip())
+    if number.startswith("+"):
+        digits = number[1:]
+    elif number.startswith("00"):
+        digits = number[2:]
+    elif number.startswith("0"):
+        digits = country_code + number[1:]
+    else:
+        digits = number
+    if not _DIGITS.fullmatch(digits):
+        return None
+    return f"+{digits}"
+
+
+def e164(raw: str) -> str:
+    """Normalize a phone number, raising ValueError if it isn't one"""
+    phone_number = normalize_phone_number(raw)
+    if phone_number is None:
+        raise ValueError(f"{raw!r} is not a valid phone number")
+    return phone_number
+
+
+# A request field that is validated and stored as E.164
+PhoneNumber = Annotated[str, AfterValidator(e164)]
@@ -0,0 +1,119 @@
+"""
+Rewrite stored phone numbers in E.164.
+
+Rows written before numbers were normalized may hold local ("080...") or
+unprefixed forms. Run once after deploying, from the api directory:
+
+    python -m services.phone_backfill --batch-size 500
+
+It is safe to re-run; rows already in E.164 are left alone.
+"""
+
+import argparse
+import asyncio
+import logging
+from typing import Dict
+
+from sqlalchemy import delete, select, update
+
+from models.user import Users
+from models.waitlist import Waitlist
+from services.database import close_db, get_session
+from services.log import setup_logging, shutdown_logging
+from services.phone import normalize_phone_number
+
+logger = logging.getLogger(__name__)
+
+
+async def backfill(model, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Normalize one table's phone numbers, a batch of rows per transaction.
+
+    A row whose normalized number is already taken is a duplicate: waitlist
+    duplicates are deleted, user duplicates are logged and left for a person
+    to merge, since each has its own wallet.
+
+    Args:
+        model: `Users` or `Waitlist`.
+        batch_size (int, optional): Rows read and updated per commit. Defaults to 500.
+
+    Returns:
+        Dict[str, int]: Counts of updated, duplicate and invalid rows.
+    """
+    counts = {"updated": 0, "duplicate": 0, "invalid": 0}
+    after = None
+    while True:
+        async with get_session() as sess:
+            stmt = (
+                select(model.id, model.phone_number)
+                .order_by(model.id)
+                .limit(batch_size)
+            )
+            if after is not None:
+                stmt = stmt.where(model.id > after)
+            rows = (await sess.execute(stmt)).all()
+            if not rows:
+                return counts
+            after = rows[-1].id
+
+            changes = {}
+            for row in rows:
+                phone_number = normalize_phone_number(row.phone_number)
+                if phone_number is None:
+                    counts["invalid"] += 1
+                    logger.warning(
+                        "%s %s has an invalid phone number",
+                        model.__tablename__,
+                        row.id,
+                    )
+                elif phone_number != row.phone_number:
+                    changes[row.id] = phone_number
+            if not changes:
+                continue
+
+            result = await sess.execute(
+                select(model.phone_number).where(
+                    model.phone_number.in_(set(changes.values()))
+                )
+            )
+            taken = set(result.scalars().all())
+            updates, duplicates = [], []
+            for row_id, phone_number in changes.items():
+                if phone_number in taken:
+                    duplicates.append(row_id)
+                else:
+                    taken.add(phone_number)
+                    updates.append({"id": row_id, "phone_number": phone_number})
+
+            if duplicates and model is Waitlist:
+                await sess.execute(delete(Waitlist).where(Waitlist.id.in_(duplicates)))
+            elif duplicates:
+                for row_id in duplicates:
+                    logger.warning(
+                        "User %s duplicates another user's phone number", row_id
+                    )
+            if updates:
+                await sess.execute(update(model), updates)
+            await sess.commit()
+
+        counts["updated"] += len(updates)
+        counts["duplicate"] += len(duplicates)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        for model in (Users, Waitlist):
+            counts = await backfill(model, batch_size=args.batch_size)
+            logger.info("Backfilled %s phone numbers: %s", model.__tablename__, counts)
+    finally:
+        await close_db()
+        shutdown_logging()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,61 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional, Tuple, Type
+
+logger = logging.getLogger(__name__)
+
+# Reconnect backoff bounds in seconds, doubled after each failed attempt
+MIN_RECONNECT_DELAY = 0.5
+MAX_RECONNECT_DELAY = 30.0
+
+
+class Reconnector:
+    """
+    Keeps a long-lived connection (a websocket, a pub/sub subscription) up.
+
+    `connect` runs until the connection closes or fails, and is then run
+    again after a delay that doubles with every failure in a row, from
+    MIN_RECONNECT_DELAY up to MAX_RECONNECT_DELAY. A connection that closed
+    cleanly starts the backoff over.
+    """
+
+    def __init__(
+        self,
+        connect: Callable[[], Awaitable[None]],
+        name: str,
+        expected: Tuple[Type[BaseException], ...] = (),
+        on_disconnect: Optional[Callable[[], None]] = None,
+    ):
+        """
+        Args:
+            connect (Callable): Coroutine function that holds the connection open.
+            name (str): What is connected, for the logs.
+            expected (tuple, optional): Errors logged without a traceback,
+                e.g. network failures.
+            on_disconnect (Callable, optional): Resets connection state; called
+                after every attempt.
+        """
+        self.connect = connect
+        self.name = name
+        self.expected = expected
+        self.on_disconnect = on_disconnect
+        self.reconnects = 0
+
+    async def run(self):
+        delay = MIN_RECONNECT_DELAY
+        while True:
+            try:
+                await self.connect()
+                delay = MIN_RECONNECT_DELAY
+                logger.warning("%s closed", self.name)
+            except self.expected as e:
+                logger.warning("%s failed: %r", self.name, e)
+            except Exception:
+                # e.g. a malformed message; drop the connection rather than the task
+                logger.exception("%s failed", self.name)
+            finally:
+                if self.on_disconnect is not None:
+                    self.on_disconnect()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, MAX_RECONNECT_DELAY)
+            self.reconnects += 1
@@ -0,0 +1,232 @@
+import asyncio
+import os
+import random
+import time
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from solana.exceptions import SolanaRpcException
+
+from services import deadline
+
+if TYPE_CHECKING:
+    from solana.rpc.async_api import AsyncClient
+
+DEFAULT_RPC_URL = "https://api.devnet.solana.com"
+
+
+@lru_cache(maxsize=None)
+def retryable_errors() -> Tuple[type, ...]:
+    """Errors worth retrying on another attempt or endpoint"""
+    import httpx
+
+    return (asyncio.TimeoutError, httpx.HTTPError, SolanaRpcException)
+
+
+class RpcUnavailableError(Exception):
+    """Raised when every attempt against every RPC endpoint failed"""
+
+
+class RpcEndpoint:
+    """
+    One RPC node with its own pooled HTTP client and health statistics.
+    """
+
+    # Weight of the newest sample in the latency/error moving averages
+    ALPHA = 0.2
+
+    def __init__(self, url: str, timeout: float, max_connections: int):
+        # solana-py's client and httpx take a few hundred milliseconds to
+        # import and set up, so they're only loaded for the first RPC call
+        import httpx
+        from solana.rpc.async_api import AsyncClient
+
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=30,
+        )
+        self.url = url
+        self.client = AsyncClient(url, timeout=timeout)
+        # AsyncClient takes no HTTP client of its own, so the tuned one goes
+        # into its private provider. Checked against solana==0.34.3, pinned
+        # in requirements.txt; fail loudly if an upgrade moves it
+        provider = getattr(self.client, "_provider", None)
+        if not isinstance(getattr(provider, "session", None), httpx.AsyncClient):
+            raise RuntimeError(
+                "solana-py's AsyncClient has no _provider.session to replace; "
+                "check the solana version pinned in requirements.txt"
+            )
+        # The default client never opened a connection; it's closed with ours
+        self._default_session = provider.session
+        provider.session = httpx.AsyncClient(timeout=timeout, limits=limits)
+        self.calls = 0
+        self.errors = 0
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.cooldown_until = 0.0
+        self.consecutive_failures = 0
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def score(self) -> float:
+        """Lower is better: smoothed latency inflated by the recent error rate"""
+        if not self.healthy:
+            return float("inf")
+        return (self.latency or 0.001) * (1 + 10 * self.error_rate)
+
+    def record(self, latency: float, ok: bool):
+        self.calls += 1
+        self.latency += self.ALPHA * (latency - self.latency)
+        self.error_rate += self.ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.consecutive_failures = 0
+            return
+        self.errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= 3:
+            # Take the node out of rotation for a while, longer on repeat offences
+            cooldown = min(2 ** (self.consecutive_failures - 3), 60)
+            self.cooldown_until = time.monotonic() + cooldown
+
+    async def close(self):
+        await self.client.close()
+        await self._default_session.aclose()
+
+    def stats(self) -> Dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "latency_ms": round(self.latency * 1000, 2),
+            "error_rate": round(self.error_rate, 4),
+            "healthy": self.healthy,
+        }
+
+
+class RpcManager:
+    """
+    Shared Solana RPC client: health-scored failover across several endpoints,
+    per-call deadlines, bounded concurrency and jittered retries.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        timeout: float = 3.0,
+        max_concurrency: int = 64,
+        retries: int = 2,
+        backoff: float = 0.1,
+        max_connections: int = 100,
+    ):
+        """
+        Args:
+            urls (List[str]): RPC endpoints, in order of preference.
+            timeout (float, optional): Default per-call deadline in seconds. Defaults to 3.
+            max_concurrency (int, optional): Maximum in-flight RPC calls. Defaults to 64.
+            retries (int, optional): Extra attempts after a failure. Defaults to 2.
+            backoff (float, optional): Base retry delay in seconds, jittered. Defaults to 0.1.
+            max_connections (int, optional): HTTP connections per endpoint. Defaults to 100.
+        """
+        if not urls:
+            raise ValueError("At least one RPC URL is required")
+        self.urls = urls
+        self.max_connections = max_connections
+        self._endpoints: Optional[List[RpcEndpoint]] = None
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @classmethod
+    def from_env(cls) -> "RpcManager":
+        """Build from $RPC_URLS (comma separated), falling back to $RPC_URL"""
+        urls = os.getenv("RPC_URLS") or os.getenv("RPC_URL") or DEFAULT_RPC_URL
+        return cls(
+            [url.strip() for url in urls.split(",") if url.strip()],
+            timeout=float(os.getenv("RPC_TIMEOUT", 3)),
+            max_concurrency=int(os.getenv("RPC_MAX_CONCURRENCY", 64)),
+            retries=int(os.getenv("RPC_RETRIES", 2)),
+        )
+
+    @property
+    def endpoints(self) -> List[RpcEndpoint]:
+        """The endpoints' clients, created on first use rather than at import"""
+        if self._endpoints is None:
+            self._endpoints = [
+                RpcEndpoint(url, self.timeout, self.max_connections)
+                for url in self.urls
+            ]
+        return self._endpoints
+
+    @property
+    def client(self) -> "AsyncClient":
+        """The currently best-scored client, for APIs that need a raw connection"""
+        return self._pick(()).client
+
+    def _pick(self, tried) -> RpcEndpoint:
+        candidates = [e for e in self.endpoints if e not in tried] or self.endpoints
+        return min(candidates, key=RpcEndpoint.score)
+
+    async def call(
+        self,
+        method: str,
+        *args,
+        timeout: Optional[float] = None,
+        retries: Optional[int] = None,
+        **kwargs,
+    ):
+        """
+        Call an `AsyncClient` method on the healthiest endpoint.
+
+        Args:
+            method (str): Name of the AsyncClient method, e.g. "get_balance".
+            timeout (float, optional): Deadline for each attempt. Defaults to the manager's.
+            retries (int, optional): Override the retry count; pass 0 for calls
+                that must not be repeated, such as sending a freshly signed transaction.
+
+        Returns:
+            The AsyncClient method's result.
+
+        Raises:
+            DeadlineExceeded: If the request's deadline passes; no further
+                attempts are made.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        retries = self.retries if retries is None else retries
+        tried = []
+        async with self._semaphore:
+            for attempt in range(retries + 1):
+                endpoint = self._pick(tried)
+                tried.append(endpoint)
+                start = time.monotonic()
+                try:
+                    result = await deadline.wait_for(
+                        getattr(endpoint.client, method)(*args, **kwargs), timeout
+                    )
+                except deadline.DeadlineExceeded:
+                    raise
+                except retryable_errors() as e:
+                    endpoint.record(time.monotonic() - start, ok=False)
+                    error = e
+                    if attempt < retries:
+                        await asyncio.sleep(
+                            deadline.cap(
+                                self.backoff * 2**attempt * random.uniform(0.5, 1.5)
+                            )
+                        )
+                    continue
+                endpoint.record(time.monotonic() - start, ok=True)
+                return result
+        raise RpcUnavailableError(
+            f"{method} failed after {len(tried)} attempts: {error!r}"
+        )
+
+    def stats(self) -> Dict[str, Dict]:
+        """Latency and error statistics per endpoint"""
+        return {endpoint.url: endpoint.stats() for endpoint in self._endpoints or ()}
+
+    async def close(self):
+        for endpoint in self._endpoints or ():
+            await endpoint.close()
@@ -0,0 +1,151 @@
+import json
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Optional
+
+from services import deadline
+from services.cache import TTLCache
+
+# USSD sessions are torn down by the gateway after ~180 seconds of inactivity
+DEFAULT_SESSION_TTL = 180
+DEFAULT_SESSION_MAX_SIZE = 100_000
+
+
+class SessionStore(ABC):
+    """
+    Storage backend for USSD session state.
+
+    Every backend enforces a TTL on stored sessions; `set` refreshes it.
+    """
+
+    @abstractmethod
+    async def get(self, session_id: str) -> Dict:
+        """Return the session data, or an empty dict for unknown/expired sessions"""
+
+    @abstractmethod
+    async def set(self, session_id: str, data: Dict):
+        """Replace the session data and refresh its TTL"""
+
+    @abstractmethod
+    async def delete(self, session_id: str):
+        """Remove the session if it exists"""
+
+    @abstractmethod
+    async def size(self) -> int:
+        """Return the number of sessions currently held"""
+
+    def stats(self) -> Dict[str, int]:
+        """Cheap counters for metrics; backends report what they can without I/O"""
+        return {}
+
+    async def close(self):
+        """Release any resources held by the backend"""
+
+
+class MemorySessionStore(SessionStore):
+    """
+    In-process store with TTL plus LRU eviction and a bounded size.
+    Only suitable for a single worker process.
+    """
+
+    def __init__(
+        self, ttl: float = DEFAULT_SESSION_TTL, maxsize: int = DEFAULT_SESSION_MAX_SIZE
+    ):
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, session_id: str) -> Dict:
+        # Hand out a copy so callers can't mutate stored state behind our back
+        return dict(self.cache.get(session_id) or {})
+
+    async def set(self, session_id: str, data: Dict):
+        self.cache.set(session_id, dict(data))
+
+    async def delete(self, session_id: str):
+        self.cache.pop(session_id)
+
+    async def size(self) -> int:
+        return len(self.cache)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self.cache),
+            "evictions": self.cache.evictions,
+            "expirations": self.cache.expirations,
+        }
+
+
+class RedisSessionStore(SessionStore):
+    """
+    Store backed by a Redis-compatible async client (e.g. `redis.asyncio.Redis`),
+    shared by every worker process behind the load balancer.
+
+    The client only needs async `get`, `set(ex=...)`, `delete` and `scan_iter`,
+    so any object implementing those (such as a local fake) can be used.
+    Round trips are bounded by the request deadline, if one is set.
+    """
+
+    def __init__(
+        self, client, ttl: float = DEFAULT_SESSION_TTL, prefix: str = "ussd:session:"
+    ):
+        self.client = client
+        self.ttl = int(ttl)
+        self.prefix = prefix
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}{session_id}"
+
+    async def get(self, session_id: str) -> Dict:
+        raw = await deadline.wait_for(self.client.get(self._key(session_id)))
+        if raw is None:
+            return {}
+        return json.loads(raw)
+
+    async def set(self, session_id: str, data: Dict):
+        await deadline.wait_for(
+            self.client.set(
+                self._key(session_id), json.dumps(data, default=str), ex=self.ttl
+            )
+        )
+
+    async def delete(self, session_id: str):
+        await deadline.wait_for(self.client.delete(self._key(session_id)))
+
+    async def size(self) -> int:
+        # SCAN is O(keys); only meant for diagnostics, never the request path
+        count = 0
+        async for _ in self.client.scan_iter(match=f"{self.prefix}*"):
+            count += 1
+        return count
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_session_store(
+    backend: Optional[str] = None, redis_url: Optional[str] = None
+) -> SessionStore:
+    """
+    Build the session store configured through the environment.
+
+    Args:
+        backend (str, optional): "memory" or "redis". Defaults to $SESSION_STORE or "memory".
+        redis_url (str, optional): Redis connection URL. Defaults to $REDIS_URL.
+
+    Returns:
+        SessionStore: The configured session store.
+    """
+    backend = (backend or os.getenv("SESSION_STORE", "memory")).lower()
+    ttl = float(os.getenv("SESSION_TTL", DEFAULT_SESSION_TTL))
+
+    if backend == "memory":
+        maxsize = int(os.getenv("SESSION_MAX_SIZE", DEFAULT_SESSION_MAX_SIZE))
+        return MemorySessionStore(ttl=ttl, maxsize=maxsize)
+
+    if backend == "redis":
+        # Optional dependency, only needed when running several workers
+        from redis.asyncio import from_url
+
+        redis_url = redis_url or os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        return RedisSessionStore(from_url(redis_url), ttl=ttl)
+
+    raise ValueError(f"Unknown session store backend: {backend}")
@@ -0,0 +1,145 @@
+from dataclasses import dataclass, field
+from string import Formatter
+from typing import Awaitable, Callable, Dict, FrozenSet, Optional
+
+from services.metrics import USSD_STATE_SECONDS
+from services.misc import NAV_BACK
+
+
+class StateMachineError(Exception):
+    """Raised for invalid state registrations or undeclared transitions"""
+
+
+class Menu:
+    """
+    A USSD response template, parsed once when the module is imported.
+
+    Templates without placeholders are rendered to their final string up front,
+    so static menus cost nothing on the hot path.
+    """
+
+    __slots__ = ("template", "fields", "prefix", "_static")
+
+    def __init__(self, template: str, end: bool = False):
+        self.template = template
+        self.prefix = "END " if end else "CON "
+        self.fields = frozenset(
+            name for _, name, _, _ in Formatter().parse(template) if name
+        )
+        self._static = None if self.fields else self.prefix + template
+
+    @property
+    def end(self) -> bool:
+        return self.prefix == "END "
+
+    def render(self, **values) -> str:
+        if self._static is not None:
+            return self._static
+        return self.prefix + self.template.format(**values)
+
+
+@dataclass(frozen=True)
+class Reply:
+    """
+    What a state handler returns: the text to send back, the state the session
+    moves to, and any values to merge into the session data.
+    A reply without a next state ends the session.
+    """
+
+    text: str
+    next_state: Optional[str] = None
+    data: Dict = field(default_factory=dict)
+
+
+def con(text: str, next_state: str, **data) -> Reply:
+    """Continue the session in `next_state`"""
+    return Reply(text=text, next_state=next_state, data=data)
+
+
+def end(text: str) -> Reply:
+    """End the session"""
+    return Reply(text=text)
+
+
+Handler = Callable[..., Awaitable[Reply]]
+
+
+class StateMachine:
+    """
+    Declarative registry mapping each USSD state to its handler and the states
+    it may move to. Dispatch is a single dict lookup, and `validate()` checks
+    the transition table once at import time.
+
+    The engine also owns navigation: NAV_BACK re-shows the previous screen from
+    the session's history and NAV_HOME restarts from the initial state.
+    """
+
+    def __init__(self, initial: str, fallback: str):
+        """
+        Args:
+            initial (str): State new sessions start in.
+            fallback (str): END text sent when a session is in an unknown state.
+        """
+        self.initial = initial
+        self.fallback = fallback
+        self.handlers: Dict[str, Handler] = {}
+        self.transitions: Dict[str, FrozenSet[str]] = {}
+
+    def state(self, name: str, transitions: tuple = ()):
+        """Register the decorated coroutine as the handler for `name`"""
+
+        def decorator(handler: Handler) -> Handler:
+            if name in self.handlers:
+                raise StateMachineError(f"State '{name}' is already registered")
+            self.handlers[name] = handler
+            self.transitions[name] = frozenset(transitions)
+            return handler
+
+        return decorator
+
+    def validate(self):
+        """Ensure the initial state and every declared transition target exist"""
+        if self.initial not in self.handlers:
+            raise StateMachineError(f"Initial state '{self.initial}' has no handler")
+        for state, targets in self.transitions.items():
+            unknown = targets - self.handlers.keys()
+            if unknown:
+                raise StateMachineError(
+                    f"State '{state}' transitions to unknown states: {sorted(unknown)}"
+                )
+
+    async def dispatch(self, ctx) -> str:
+        """Run the handler for the context's current state and apply its reply"""
+        state = ctx.session_data.get("state", self.initial)
+        history = ctx.session_data.get("history", [])
+
+        if ctx.input.nav == NAV_BACK and history:
+            # Re-show the previous screen without running any handler
+            state, screen = history.pop()
+            ctx.set(state=state, screen=screen, history=history)
+            return screen
+        if ctx.input.nav is not None:
+            # Main menu, or back from the first screen
+            state, history = self.initial, []
+            ctx.input = ctx.input._replace(value="", nav=None)
+
+        handler = self.handlers.get(state)
+        if handler is None:
+            ctx.end()
+            return self.fallback
+
+        with USSD_STATE_SECONDS.time(state=state):
+            reply = await handler(ctx)
+        if reply.next_state is None:
+            ctx.end()
+            return reply.text
+        if reply.next_state not in self.transitions[state]:
+            raise StateMachineError(
+                f"Undeclared transition '{state}' -> '{reply.next_state}'"
+            )
+        if reply.next_state != state and "screen" in ctx.session_data:
+            history.append((state, ctx.session_data["screen"]))
+        ctx.set(
+            state=reply.next_state, screen=reply.text, history=history, **reply.data
+        )
+        return reply.text
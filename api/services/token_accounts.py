@@ -0,0 +1,248 @@
+import asyncio
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from solders.keypair import Keypair
+from solders.pubkey import Pubkey
+from sqlalchemy import and_, exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.token_account import TokenAccount
+from models.user import Users
+from services.cache import TTLCache
+from services.database import get_session, run_as_leader, upsert
+from services.transfer import SolanaTransfer, TokenAccountMissing
+
+logger = logging.getLogger(__name__)
+
+# Users checked per pass, and owners per create transaction; each create
+# instruction adds seven accounts, and about ten fit in a transaction
+SCAN_PAGE = 500
+DEFAULT_CREATE_BATCH = 8
+
+
+class TokenAccountCache:
+    """
+    Owner + mint -> associated token account, for accounts known to exist.
+
+    An in-memory LRU sits in front of the `token_accounts` table. Entries never
+    change once an account exists, so they live as long as memory allows.
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self._cache = TTLCache(maxsize=maxsize, ttl=float("inf"))
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(owner, mint) -> Tuple[str, str]:
+        return str(owner), str(mint)
+
+    def get_cached(self, owner: Pubkey, mint: Pubkey) -> Optional[Pubkey]:
+        """The account from memory only, without touching the database"""
+        return self._cache.get(self._key(owner, mint))
+
+    async def get(
+        self, session: AsyncSession, owner: Pubkey, mint: Pubkey
+    ) -> Optional[Pubkey]:
+        """The account from memory or the database, or None if it isn't known"""
+        address = self.get_cached(owner, mint)
+        if address is not None:
+            self.hits += 1
+            return address
+        self.misses += 1
+        result = await session.execute(
+            select(TokenAccount.address).where(
+                TokenAccount.owner == str(owner), TokenAccount.mint == str(mint)
+            )
+        )
+        address = result.scalar_one_or_none()
+        if address is None:
+            return None
+        address = Pubkey.from_string(address)
+        self._cache.set(self._key(owner, mint), address)
+        return address
+
+    async def lookup(
+        self,
+        session: AsyncSession,
+        sol_transfer: SolanaTransfer,
+        owner: Pubkey,
+        mint: Pubkey,
+    ) -> Pubkey:
+        """
+        The owner's token account, checking the chain only for unknown owners.
+
+        Raises:
+            TokenAccountMissing: If the account hasn't been created yet.
+        """
+        address = await self.get(session, owner, mint)
+        if address is not None:
+            return address
+        address = sol_transfer.associated_token_account(owner, mint)
+        if not await sol_transfer.existing_accounts([address]):
+            raise TokenAccountMissing(f"{owner} has no account for {mint}")
+        await self.record(session, [(owner, mint, address)])
+        return address
+
+    async def record(
+        self, session: AsyncSession, accounts: Iterable[Tuple[Pubkey, Pubkey, Pubkey]]
+    ):
+        """Remember accounts that exist on-chain and commit"""
+        rows = [
+            {"owner": str(owner), "mint": str(mint), "address": str(address)}
+            for owner, mint, address in accounts
+        ]
+        if not rows:
+            return
+        await session.execute(
+            upsert(session, TokenAccount)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["owner", "mint"])
+        )
+        await session.commit()
+        for row in rows:
+            self._cache.set(
+                (row["owner"], row["mint"]), Pubkey.from_string(row["address"])
+            )
+
+    async def owners_without_account(
+        self, session: AsyncSession, mint: Pubkey, limit: int
+    ) -> List[Pubkey]:
+        """Users with no recorded account for the mint"""
+        recorded = exists().where(
+            and_(
+                TokenAccount.owner == Users.public_key,
+                TokenAccount.mint == str(mint),
+            )
+        )
+        result = await session.execute(
+            select(Users.public_key).where(~recorded).limit(limit)
+        )
+        return [Pubkey.from_string(owner) for owner in result.scalars().all()]
+
+    def stats(self) -> Dict[str, int]:
+        return {"size": len(self._cache), "hits": self.hits, "misses": self.misses}
+
+
+token_accounts = TokenAccountCache(
+    maxsize=int(os.getenv("TOKEN_ACCOUNT_CACHE_SIZE", 100_000))
+)
+
+
+class TokenAccountProvisioner:
+    """
+    Background task that creates users' token accounts ahead of time.
+
+    For every configured mint it finds users with no recorded account, skips
+    the ones that already exist on-chain, and creates the rest in batched
+    multi-instruction transactions paid by `payer`. USSD hops then only ever
+    read accounts, never create them.
+
+    Only the holder of the `token_accounts` advisory lock provisions, and it
+    re-checks the lock before every pass, so workers don't send create
+    transactions for the same owners side by side. Every batch skips owners
+    whose accounts already exist on-chain, which also covers a pass left
+    unfinished by a previous leader.
+    Database sessions are only held for the reads and writes themselves,
+    never across an RPC call or a confirmation wait.
+    """
+
+    def __init__(
+        self,
+        sol_transfer: SolanaTransfer,
+        payer: Keypair,
+        mints: List[Pubkey],
+        batch_size: int = DEFAULT_CREATE_BATCH,
+        interval: float = 30.0,
+        cache: TokenAccountCache = token_accounts,
+    ):
+        """
+        Args:
+            sol_transfer (SolanaTransfer): Sends the create transactions.
+            payer (Keypair): Pays fees and rent for new accounts.
+            mints (List[Pubkey]): Tokens every user should hold an account for.
+            batch_size (int, optional): Owners per transaction. Defaults to DEFAULT_CREATE_BATCH.
+            interval (float, optional): Seconds between scans. Defaults to 30.
+            cache (TokenAccountCache, optional): Where created accounts are recorded.
+        """
+        self.sol_transfer = sol_transfer
+        self.payer = payer
+        self.mints = mints
+        self.batch_size = batch_size
+        self.interval = interval
+        self.cache = cache
+        self._task = None
+
+    @classmethod
+    def from_env(
+        cls, sol_transfer: SolanaTransfer
+    ) -> Optional["TokenAccountProvisioner"]:
+        """Configured by $SPL_MINTS and $TOKEN_ACCOUNT_PAYER_KEY, or None if unset"""
+        mints = [m.strip() for m in os.getenv("SPL_MINTS", "").split(",") if m.strip()]
+        payer = os.getenv("TOKEN_ACCOUNT_PAYER_KEY")
+        if not mints or not payer:
+            return None
+        return cls(
+            sol_transfer,
+            Keypair.from_base58_string(payer.strip()),
+            [Pubkey.from_string(mint) for mint in mints],
+            interval=float(os.getenv("TOKEN_ACCOUNT_INTERVAL", 30)),
+        )
+
+    async def provision(self, mint: Pubkey) -> int:
+        """Create every missing account for one mint; returns accounts created"""
+        created = 0
+        while True:
+            async with get_session() as sess:
+                owners = await self.cache.owners_without_account(sess, mint, SCAN_PAGE)
+            if not owners:
+                return created
+            addresses = {
+                owner: self.sol_transfer.associated_token_account(owner, mint)
+                for owner in owners
+            }
+            existing = await self.sol_transfer.existing_accounts(
+                list(addresses.values())
+            )
+            await self._record(
+                [
+                    (owner, mint, address)
+                    for owner, address in addresses.items()
+                    if address in existing
+                ]
+            )
+            missing = [o for o, a in addresses.items() if a not in existing]
+            for start in range(0, len(missing), self.batch_size):
+                batch = missing[start : start + self.batch_size]
+                await self.sol_transfer.create_token_accounts(self.payer, batch, mint)
+                await self._record([(owner, mint, addresses[owner]) for owner in batch])
+                created += len(batch)
+
+    async def _record(self, accounts: List[Tuple[Pubkey, Pubkey, Pubkey]]):
+        if accounts:
+            async with get_session() as sess:
+                await self.cache.record(sess, accounts)
+
+    async def run(self):
+        await run_as_leader("token_accounts", self.provision_all, self.interval)
+
+    async def provision_all(self):
+        for mint in self.mints:
+            try:
+                created = await self.provision(mint)
+                if created:
+                    logger.info("Created %d token accounts for mint %s", created, mint)
+            except Exception:
+                logger.exception("Token account provisioning failed for %s", mint)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -1,11 +1,79 @@
-from solana.rpc.async_api import AsyncClient
+from typing import TYPE_CHECKING, Dict, List, NamedTuple, Optional, Set, Tuple
+
+from solana.rpc.types import DataSliceOpts
 from solana.transaction import Transaction
+from solders.hash import Hash
+from solders.instruction import Instruction
 from solders.keypair import Keypair
+from solders.message import Message
 from solders.pubkey import Pubkey
 from solders.signature import Signature
 from solders.system_program import TransferParams, transfer
-from spl.token.client import Token
-from spl.token.constants import TOKEN_PROGRAM_ID
+
+from services.blockhash import BlockhashCache
+from services.cache import TTLCache
+from services.confirmer import SignatureConfirmer
+from services.metrics import RPC_ERRORS, RPC_SECONDS, TRANSFER_STEP_SECONDS, timed
+from services.rpc import DEFAULT_RPC_URL, RpcManager
+
+if TYPE_CHECKING:
+    from solana.rpc.async_api import AsyncClient
+    from spl.token.async_client import AsyncToken
+
+# Upper bound on pubkeys per getMultipleAccounts request
+MAX_MULTIPLE_ACCOUNTS = 100
+
+# Associated token account program instruction that succeeds if the account exists
+CREATE_IDEMPOTENT = bytes([1])
+
+
+class TokenAccountMissing(Exception):
+    """Raised when an owner has no associated token account for a mint yet"""
+
+
+class SignedTransaction(NamedTuple):
+    raw: bytes
+    signature: Signature
+    last_valid_block_height: int
+
+
+class TransferTemplate:
+    """
+    A serialized SOL transfer message for one sender and recipient.
+
+    Only the blockhash and the lamports change between transfers, so both are
+    patched into a copy of the bytes and the copy is signed, skipping
+    solana-py's transaction building and compiling on every transfer.
+    """
+
+    __slots__ = ("message", "blockhash_offset")
+
+    def __init__(self, sender: Pubkey, recipient: Pubkey):
+        message = Message.new_with_blockhash(
+            [
+                transfer(
+                    TransferParams(from_pubkey=sender, to_pubkey=recipient, lamports=0)
+                )
+            ],
+            sender,
+            Hash.default(),
+        )
+        self.message = bytes(message)
+        # Legacy layout: 3 header bytes, the key count (one byte below 128),
+        # the keys, then the blockhash; the lamports end the instruction data
+        self.blockhash_offset = 4 + 32 * len(message.account_keys)
+
+    def sign(
+        self, sender: Keypair, blockhash: Hash, lamports: int
+    ) -> Tuple[bytes, Signature]:
+        """The wire-format transaction and its signature"""
+        message = bytearray(self.message)
+        offset = self.blockhash_offset
+        message[offset : offset + 32] = bytes(blockhash)
+        message[-8:] = lamports.to_bytes(8, "little")
+        signature = sender.sign_message(bytes(message))
+        # One signature: compact-u16 count, the signature, then the message
+        return b"\x01" + bytes(signature) + message, signature
 
 
 class SolanaTransfer:
@@ -14,14 +82,25 @@ class SolanaTransfer:
     Idea: https://github.com/SeveighTech-Management/solana-py-implementation
     """
 
-    def __init__(self, rpc_url="https://api.devnet.solana.com"):
+    def __init__(self, rpc_url=DEFAULT_RPC_URL, rpc: Optional[RpcManager] = None):
         """
         Initializes the SolanaTransfer class with a specified RPC URL.
 
         Args:
             rpc_url (str, optional): The URL of the Solana RPC node. Defaults to "https://api.devnet.solana.com".
+            rpc (RpcManager, optional): Shared RPC client manager; takes precedence over `rpc_url`.
         """
-        self.client = AsyncClient(rpc_url)
+        self.rpc = rpc or RpcManager([rpc_url or DEFAULT_RPC_URL])
+        self.blockhashes = BlockhashCache.from_env(self.rpc)
+        self.confirmer = SignatureConfirmer.from_env(self.rpc)
+        self._token_clients: Dict[Pubkey, "AsyncToken"] = {}
+        # Senders tend to pay the same few recipients again
+        self._templates = TTLCache(maxsize=10_000, ttl=3600)
+
+    @property
+    def client(self) -> "AsyncClient":
+        """The healthiest underlying client, for APIs that need a raw connection"""
+        return self.rpc.client
 
     async def set_source_wallet(self, private_key: str):
         """
@@ -47,6 +126,7 @@ class SolanaTransfer:
         """
         return Pubkey.from_string(address)
 
+    @timed(RPC_SECONDS, RPC_ERRORS, method="get_solana_balance")
     async def get_solana_balance(self, public_key: Pubkey):
         """
         Retrieves the SOL balance of a given public key.
@@ -57,12 +137,44 @@ class SolanaTransfer:
         Returns:
             float: The SOL balance of the wallet.
         """
-        balance = await self.client.get_balance(public_key)
+        balance = await self.rpc.call("get_balance", public_key)
         return float(balance.value) / 1e9
 
-    async def send_sol(self, sender: Keypair, recipient: Pubkey, amount: float):
+    @timed(RPC_SECONDS, RPC_ERRORS, method="get_multiple_balances")
+    async def get_multiple_balances(
+        self, public_keys: List[Pubkey]
+    ) -> Dict[Pubkey, float]:
+        """
+        Retrieves the SOL balances of many public keys, batching up to
+        MAX_MULTIPLE_ACCOUNTS per getMultipleAccounts round trip.
+
+        Args:
+            public_keys (List[Pubkey]): The public keys of the wallets.
+
+        Returns:
+            Dict[Pubkey, float]: The SOL balance per wallet; 0 for accounts that don't exist yet.
+        """
+        balances = {}
+        # Only lamports are needed, so skip the account data entirely
+        data_slice = DataSliceOpts(offset=0, length=0)
+        for start in range(0, len(public_keys), MAX_MULTIPLE_ACCOUNTS):
+            chunk = public_keys[start : start + MAX_MULTIPLE_ACCOUNTS]
+            result = await self.rpc.call(
+                "get_multiple_accounts", chunk, data_slice=data_slice
+            )
+            for public_key, account in zip(chunk, result.value):
+                balances[public_key] = float(account.lamports) / 1e9 if account else 0.0
+        return balances
+
+    @timed(TRANSFER_STEP_SECONDS, method="build_sol_transfer")
+    async def build_sol_transfer(
+        self, sender: Keypair, recipient: Pubkey, amount: float
+    ) -> SignedTransaction:
         """
-        Sends SOL from the sender's wallet to the recipient's wallet.
+        Builds and signs a SOL transfer without sending it.
+
+        The blockhash comes from the shared cache and the message from a
+        per-pair template, so this normally makes no RPC call.
 
         Args:
             sender (Keypair): The Keypair object representing the sender's wallet.
@@ -70,74 +182,213 @@ class SolanaTransfer:
             amount (float): The amount of SOL to be sent.
 
         Returns:
-            str: The transaction signature.
+            SignedTransaction: The serialized transaction, its signature and
+                the last block height it is valid for.
         """
-        transaction = Transaction().add(
-            transfer(
-                TransferParams(
-                    from_pubkey=sender.pubkey(),
-                    to_pubkey=recipient,
-                    lamports=int(amount * 1e9),
-                )
-            )
+        latest = await self.blockhashes.get()
+        key = (sender.pubkey(), recipient)
+        template = self._templates.get(key)
+        if template is None:
+            template = TransferTemplate(*key)
+            self._templates.set(key, template)
+        raw, signature = template.sign(sender, latest.blockhash, round(amount * 1e9))
+        return SignedTransaction(raw, signature, latest.last_valid_block_height)
+
+    @timed(RPC_SECONDS, RPC_ERRORS, method="send_raw")
+    async def send_raw(self, raw_transaction: bytes) -> Signature:
+        """
+        Sends an already signed, serialized transaction. Resending the same bytes
+        is idempotent, so this is safe to retry.
+
+        Args:
+            raw_transaction (bytes): The serialized transaction.
+
+        Returns:
+            Signature: The transaction signature.
+        """
+        result = await self.rpc.call("send_raw_transaction", raw_transaction)
+        return result.value
+
+    @timed(RPC_SECONDS, RPC_ERRORS, method="get_signature_status")
+    async def get_signature_status(self, signature: Signature):
+        """
+        Looks a signature up in the transaction history.
+
+        Args:
+            signature (Signature): The signature of the transaction.
+
+        Returns:
+            TransactionStatus: The status, or None if the cluster has never seen it.
+        """
+        result = await self.rpc.call(
+            "get_signature_statuses", [signature], search_transaction_history=True
         )
+        return result.value[0]
 
-        result = await self.client.send_transaction(transaction, sender)
+    @timed(TRANSFER_STEP_SECONDS, method="send_sol")
+    async def send_sol(self, sender: Keypair, recipient: Pubkey, amount: float):
+        """
+        Sends SOL from the sender's wallet to the recipient's wallet; signing
+        and sending is a single RPC call, the rest is waiting for confirmation.
+
+        Args:
+            sender (Keypair): The Keypair object representing the sender's wallet.
+            recipient (Pubkey): The Pubkey object representing the recipient's wallet.
+            amount (float): The amount of SOL to be sent.
 
-        confirm = await self.check_transaction(result.value)
+        Returns:
+            str: The transaction signature.
+        """
+        transaction = await self.build_sol_transfer(sender, recipient, amount)
+        signature = await self.send_raw(transaction.raw)
+
+        confirm = await self.check_transaction(
+            signature, transaction.last_valid_block_height
+        )
         return confirm
 
     async def set_spl_client(self, token_address: Pubkey, sender: Keypair):
         """
-        Sets up a client for SPL token operations.
+        The SPL token client for a mint, created once and shared.
 
         Args:
             token_address (Pubkey): The public key of the token.
-            sender (Keypair): The Keypair object representing the sender's wallet.
+            sender (Keypair): Set as the payer of a newly created client. The
+                transfer methods here sign and pay with their own `sender`,
+                so a shared client's payer is never charged by them.
 
         Returns:
-            Token: The Token client object.
+            AsyncToken: The Token client object.
         """
-        return Token(
-            conn=self.client,
-            pubkey=token_address,
-            program_id=TOKEN_PROGRAM_ID,
-            payer=sender,
-        )
+        client = self._token_clients.get(token_address)
+        if client is None:
+            # The SPL stack is slow to import and only needed for token transfers
+            from spl.token.async_client import AsyncToken
+            from spl.token.constants import TOKEN_PROGRAM_ID
+
+            client = AsyncToken(
+                conn=self.client,
+                pubkey=token_address,
+                program_id=TOKEN_PROGRAM_ID,
+                payer=sender,
+            )
+            self._token_clients[token_address] = client
+        return client
 
-    async def get_token_account(self, spl_client: Token, owner: Pubkey):
+    @staticmethod
+    def associated_token_account(owner: Pubkey, mint: Pubkey) -> Pubkey:
+        """Derive an owner's associated token account for a mint; no RPC needed"""
+        from spl.token.instructions import get_associated_token_address
+
+        return get_associated_token_address(owner, mint)
+
+    @timed(RPC_SECONDS, RPC_ERRORS, method="existing_accounts")
+    async def existing_accounts(self, public_keys: List[Pubkey]) -> Set[Pubkey]:
         """
-        Retrieves or creates a token account for a given owner.
+        Which of the given accounts exist on-chain, batching up to
+        MAX_MULTIPLE_ACCOUNTS per getMultipleAccounts round trip.
 
         Args:
-            spl_client (Token): The Token client object.
+            public_keys (List[Pubkey]): The accounts to look up.
+
+        Returns:
+            Set[Pubkey]: The accounts that exist.
+        """
+        existing = set()
+        data_slice = DataSliceOpts(offset=0, length=0)
+        for start in range(0, len(public_keys), MAX_MULTIPLE_ACCOUNTS):
+            chunk = public_keys[start : start + MAX_MULTIPLE_ACCOUNTS]
+            result = await self.rpc.call(
+                "get_multiple_accounts", chunk, data_slice=data_slice
+            )
+            existing.update(
+                public_key
+                for public_key, account in zip(chunk, result.value)
+                if account is not None
+            )
+        return existing
+
+    @timed(RPC_SECONDS, RPC_ERRORS, method="get_token_account")
+    async def get_token_account(self, spl_client: "AsyncToken", owner: Pubkey):
+        """
+        Retrieves the owner's associated token account.
+
+        Accounts are created ahead of time by `create_token_accounts`, never
+        here; callers with a database session should go through
+        `services.token_accounts.token_accounts`, which skips this RPC call
+        for accounts it already knows about.
+
+        Args:
+            spl_client (AsyncToken): The Token client object.
             owner (Pubkey): The Pubkey object representing the owner's wallet.
 
         Returns:
             Pubkey: The public key of the token account.
+
+        Raises:
+            TokenAccountMissing: If the account hasn't been created yet.
+        """
+        address = self.associated_token_account(owner, spl_client.pubkey)
+        if not await self.existing_accounts([address]):
+            raise TokenAccountMissing(f"{owner} has no account for {spl_client.pubkey}")
+        return address
+
+    @timed(TRANSFER_STEP_SECONDS, method="create_token_accounts")
+    async def create_token_accounts(
+        self, payer: Keypair, owners: List[Pubkey], mint: Pubkey
+    ) -> Signature:
         """
-        accounts = await spl_client.get_accounts_by_owner(owner)
-        if accounts.value:
-            return accounts.value[0].pubkey
-        return await spl_client.create_associated_token_account(owner)
+        Creates associated token accounts for several owners in one transaction.
 
-    async def get_token_balance(self, spl_client: Token, token_account: Pubkey):
+        The idempotent create instruction is used, so an account created in
+        the meantime doesn't fail the batch. Keep batches to about ten owners
+        to stay within the transaction size limit.
+
+        Args:
+            payer (Keypair): Pays the fee and the accounts' rent.
+            owners (List[Pubkey]): The wallets to create accounts for.
+            mint (Pubkey): The token.
+
+        Returns:
+            Signature: The signature of the confirmed transaction.
+        """
+        from spl.token import instructions as spl_token
+
+        latest = await self.blockhashes.get()
+        transaction = Transaction(
+            recent_blockhash=latest.blockhash, fee_payer=payer.pubkey()
+        )
+        for owner in owners:
+            create = spl_token.create_associated_token_account(
+                payer=payer.pubkey(), owner=owner, mint=mint
+            )
+            transaction.add(
+                Instruction(create.program_id, CREATE_IDEMPOTENT, create.accounts)
+            )
+        transaction.sign(payer)
+        signature = await self.send_raw(transaction.serialize())
+        await self.check_transaction(signature, latest.last_valid_block_height)
+        return signature
+
+    @timed(RPC_SECONDS, RPC_ERRORS, method="get_token_balance")
+    async def get_token_balance(self, spl_client: "AsyncToken", token_account: Pubkey):
         """
         Retrieves the balance of a token account.
 
         Args:
-            spl_client (Token): The Token client object.
+            spl_client (AsyncToken): The Token client object.
             token_account (Pubkey): The public key of the token account.
 
         Returns:
             str: The balance of the token account as a string.
         """
-        balance = await spl_client.get_balance(token_account)
+        balance = await self.rpc.call("get_token_account_balance", token_account)
         return balance.value.ui_amount_string
 
+    @timed(TRANSFER_STEP_SECONDS, method="send_spl_token")
     async def send_spl_token(
         self,
-        spl_client: Token,
+        spl_client: "AsyncToken",
         sender: Keypair,
         sender_token_account: Pubkey,
         recipient_token_account: Pubkey,
@@ -147,8 +398,8 @@ class SolanaTransfer:
         Sends SPL tokens from the sender's token account to the recipient's token account.
 
         Args:
-            spl_client (Token): The Token client object.
-            sender (Keypair): The Keypair object representing the sender's wallet.
+            spl_client (AsyncToken): The Token client object.
+            sender (Keypair): The Keypair object representing the sender's wallet; signs and pays the fee.
             sender_token_account (Pubkey): The public key of the sender's token account.
             recipient_token_account (Pubkey): The public key of the recipient's token account.
             amount (float): The amount of tokens to be sent.
@@ -156,29 +407,49 @@ class SolanaTransfer:
         Returns:
             str: The transaction signature.
         """
-        transaction = await spl_client.transfer(
-            source=sender_token_account,
-            dest=recipient_token_account,
-            owner=sender,
-            amount=int(amount * 1e9),
+        from spl.token import instructions as spl_token
+
+        latest = await self.blockhashes.get()
+        transaction = Transaction(
+            recent_blockhash=latest.blockhash, fee_payer=sender.pubkey()
+        ).add(
+            spl_token.transfer(
+                spl_token.TransferParams(
+                    program_id=spl_client.program_id,
+                    source=sender_token_account,
+                    dest=recipient_token_account,
+                    owner=sender.pubkey(),
+                    amount=int(amount * 1e9),
+                )
+            )
         )
-        return str(transaction.value)
+        transaction.sign(sender)
+        signature = await self.send_raw(transaction.serialize())
+        return str(signature)
 
-    async def check_transaction(self, signature: Signature):
+    @timed(TRANSFER_STEP_SECONDS, method="check_transaction")
+    async def check_transaction(
+        self, signature: Signature, last_valid_block_height: Optional[int] = None
+    ):
         """
-        Checks the status of a transaction.
+        Waits for a transaction to be confirmed. Signatures are polled
+        together with every other in-flight transaction's by `self.confirmer`.
 
         Args:
             signature (Signature): The signature of the transaction to be checked.
+            last_valid_block_height (int, optional): Stop waiting once the chain passes this height.
 
         Returns:
-            str: The status of the transaction.
+            TransactionStatus: The status of the transaction; `err` is set if it failed.
+
+        Raises:
+            TransactionExpiredBlockheightExceededError: If it expired without landing.
         """
-        result = await self.client.confirm_transaction(signature)
-        return result
+        return await self.confirmer.confirm(signature, last_valid_block_height)
 
     async def close(self):
         """
-        Closes the Solana client connection.
+        Closes the Solana client connections.
         """
-        await self.client.close()
+        await self.confirmer.stop()
+        await self.rpc.close()
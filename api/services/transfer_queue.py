@@ -0,0 +1,321 @@
+import asyncio
+import base64
+import hashlib
+import logging
+from datetime import timedelta
+from typing import Awaitable, Callable, Optional, Tuple
+
+from solana.rpc.core import TransactionExpiredBlockheightExceededError
+from solders.pubkey import Pubkey
+from solders.signature import Signature
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.exc import StaleDataError
+
+from models.transfer import TransferJob, utcnow
+from models.user import Users
+from services.balance import BalanceCache
+from services.database import get_session
+from services.keys import key_service
+from services.transfer import SolanaTransfer
+from services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
+
+Notifier = Callable[[TransferJob, Users, Users], Awaitable[None]]
+
+
+def idempotency_key(session_id: str, sender_id, recipient_id, lamports: int) -> str:
+    """Key that is identical for every retry of the same USSD confirmation"""
+    raw = f"{session_id}:{sender_id}:{recipient_id}:{lamports}"
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+async def enqueue_transfer(
+    session: AsyncSession, key: str, sender_id, recipient_id, lamports: int
+) -> Tuple[TransferJob, bool]:
+    """
+    Queue a transfer unless one with the same idempotency key already exists.
+    The caller commits.
+
+    Returns:
+        Tuple[TransferJob, bool]: The job and whether it was newly created.
+    """
+    stmt = select(TransferJob).where(TransferJob.idempotency_key == key)
+    existing = (await session.execute(stmt)).scalar_one_or_none()
+    if existing:
+        return existing, False
+
+    job = TransferJob(
+        idempotency_key=key,
+        sender_id=sender_id,
+        recipient_id=recipient_id,
+        lamports=lamports,
+    )
+    try:
+        async with session.begin_nested():
+            session.add(job)
+    except IntegrityError:
+        # Lost a race with a concurrent retry of the same request
+        return (await session.execute(stmt)).scalar_one(), False
+    return job, True
+
+
+async def log_notification(job: TransferJob, sender: Users, recipient: Users):
+    """Default notifier; swap in an SMS sender when one is available"""
+    logger.info(
+        "Transfer %s of %s SOL from %s to %s is %s",
+        job.id,
+        job.amount,
+        sender.id,
+        recipient.id,
+        job.status,
+    )
+
+
+class TransferWorker:
+    """
+    Pool of background tasks that submit, confirm and reconcile queued transfers.
+
+    Jobs are claimed with a lease on `next_attempt_at` using a compare-and-set
+    UPDATE, so several workers (and processes) never process a job at once, and
+    a crashed worker's jobs become claimable again when the lease runs out. A
+    claim bumps the job's `version`, so a worker that overran its lease can't
+    re-sign or otherwise write the job once someone else holds it.
+
+    A pending job fails after `max_attempts`. A submitted one keeps being
+    checked, since its transaction may still land, but fails after
+    `max_submitted_attempts`; its signature stays on the job for
+    reconciliation. A transaction that expires unseen sends the job back to
+    pending with its attempts reset, to be signed again, up to
+    `max_expiries` times.
+    """
+
+    def __init__(
+        self,
+        sol_transfer: SolanaTransfer,
+        workers: int = 2,
+        poll_interval: float = 0.5,
+        lease: float = 120.0,
+        max_attempts: int = 3,
+        max_submitted_attempts: int = 20,
+        max_expiries: int = 3,
+        balance_cache: Optional[BalanceCache] = None,
+        notify: Notifier = log_notification,
+    ):
+        """
+        Args:
+            sol_transfer (SolanaTransfer): Client used to sign, send and confirm.
+            workers (int, optional): Number of concurrent worker tasks. Defaults to 2.
+            poll_interval (float, optional): Idle seconds between queue polls. Defaults to 0.5.
+            lease (float, optional): Seconds a claimed job stays reserved. Defaults to 120.
+            max_attempts (int, optional): Attempts before a pending job is failed. Defaults to 3.
+            max_submitted_attempts (int, optional): Attempts before a submitted job is failed. Defaults to 20.
+            max_expiries (int, optional): Expired transactions before a job is failed. Defaults to 3.
+            balance_cache (BalanceCache, optional): Cache updated after reconciliation.
+            notify (Notifier, optional): Coroutine told about confirmed and failed jobs.
+        """
+        self.sol_transfer = sol_transfer
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.max_submitted_attempts = max_submitted_attempts
+        self.max_expiries = max_expiries
+        self.balance_cache = balance_cache
+        self.notify = notify
+        self._tasks = []
+
+    async def claim(self) -> Optional[TransferJob]:
+        """Reserve the next due job, or return None if the queue is empty"""
+        async with get_session() as sess:
+            now = utcnow()
+            result = await sess.execute(
+                select(TransferJob.id, TransferJob.next_attempt_at)
+                .where(
+                    TransferJob.status.in_(("pending", "submitted")),
+                    TransferJob.next_attempt_at <= now,
+                )
+                .order_by(TransferJob.next_attempt_at)
+                .limit(1)
+            )
+            row = result.first()
+            if row is None:
+                return None
+            claimed = await sess.execute(
+                update(TransferJob)
+                .where(
+                    TransferJob.id == row.id,
+                    TransferJob.next_attempt_at == row.next_attempt_at,
+                )
+                .values(
+                    next_attempt_at=now + timedelta(seconds=self.lease),
+                    attempts=TransferJob.attempts + 1,
+                    version=TransferJob.version + 1,
+                )
+            )
+            await sess.commit()
+            if claimed.rowcount != 1:
+                return None
+            return await sess.get(TransferJob, row.id, populate_existing=True)
+
+    async def process(self, job: TransferJob):
+        """Drive one claimed job as far as it can go"""
+        async with get_session() as sess:
+            job = await sess.merge(job)
+            sender = await sess.get(Users, job.sender_id)
+            recipient = await sess.get(Users, job.recipient_id)
+            if sender is None or recipient is None:
+                await self._fail(sess, job, sender, recipient, "Unknown wallet")
+                return
+
+            try:
+                resend = job.raw_transaction is not None
+                if not resend:
+                    await self._sign(sess, job, sender, recipient)
+                signature = Signature.from_string(job.signature)
+                await self._send(job, resend)
+                status = await self._confirm(job, signature)
+            except StaleDataError:
+                raise
+            except Exception as e:
+                await self._retry_later(sess, job, sender, recipient, str(e))
+                return
+
+            if status is None:
+                # Expired without landing: safe to sign a fresh transaction
+                job.expiries += 1
+                if job.expiries > self.max_expiries:
+                    await self._fail(
+                        sess, job, sender, recipient, "Transaction expired"
+                    )
+                    return
+                job.raw_transaction = job.signature = None
+                job.status = "pending"
+                # Status polls of the expired transaction don't count against
+                # signing the new one
+                job.attempts = 0
+                job.error = "Transaction expired"
+                job.next_attempt_at = utcnow()
+                await sess.commit()
+            elif status.err is not None:
+                await self._fail(sess, job, sender, recipient, str(status.err))
+            else:
+                job.status = "confirmed"
+                job.error = None
+                await sess.commit()
+                try:
+                    await self._reconcile(sess, sender, recipient)
+                except Exception:
+                    # The job is settled either way; the refresher catches up
+                    logger.exception(
+                        "Reconciling balances for transfer %s failed", job.id
+                    )
+                    await sess.rollback()
+                user_cache.invalidate_user(sender)
+                user_cache.invalidate_user(recipient)
+                await self.notify(job, sender, recipient)
+
+    async def _sign(self, sess: AsyncSession, job, sender: Users, recipient: Users):
+        transaction = await self.sol_transfer.build_sol_transfer(
+            await key_service.keypair_for(sess, sender),
+            Pubkey.from_string(recipient.public_key),
+            job.amount,
+        )
+        # Persist before sending, so a crash can never lead to a second signature
+        job.raw_transaction = base64.b64encode(transaction.raw).decode()
+        job.signature = str(transaction.signature)
+        job.last_valid_block_height = transaction.last_valid_block_height
+        job.status = "submitted"
+        await sess.commit()
+
+    async def _send(self, job: TransferJob, resend: bool):
+        raw = base64.b64decode(job.raw_transaction)
+        if not resend:
+            await self.sol_transfer.send_raw(raw)
+            return
+        try:
+            # Resending the stored bytes is harmless if the first send landed
+            await self.sol_transfer.send_raw(raw)
+        except Exception as e:
+            # e.g. rejected in preflight; confirming still settles it, as
+            # landed or expired, instead of retrying the send forever
+            logger.warning("Resending transfer %s failed: %s", job.id, e)
+
+    async def _confirm(self, job: TransferJob, signature: Signature):
+        """Return the final status, or None if the transaction expired unseen"""
+        try:
+            return await self.sol_transfer.check_transaction(
+                signature, job.last_valid_block_height
+            )
+        except TransactionExpiredBlockheightExceededError:
+            # It may have landed after all, just too late to see in recent statuses
+            return await self.sol_transfer.get_signature_status(signature)
+
+    async def _reconcile(self, sess: AsyncSession, sender: Users, recipient: Users):
+        balances = await self.sol_transfer.get_multiple_balances(
+            [
+                Pubkey.from_string(sender.public_key),
+                Pubkey.from_string(recipient.public_key),
+            ]
+        )
+        now = utcnow()
+        for user in (sender, recipient):
+            balance = balances[Pubkey.from_string(user.public_key)]
+            user.balance_lamports = round(balance * 1e9)
+            user.last_balance_update = now
+            if self.balance_cache is not None:
+                self.balance_cache.set(user.public_key, balance)
+        await sess.commit()
+
+    async def _retry_later(self, sess, job, sender, recipient, error: str):
+        limit = (
+            self.max_submitted_attempts
+            if job.status == "submitted"
+            else self.max_attempts
+        )
+        if job.attempts >= limit:
+            await self._fail(sess, job, sender, recipient, error)
+            return
+        job.error = error
+        backoff = min(2**job.attempts, 300)
+        job.next_attempt_at = utcnow() + timedelta(seconds=backoff)
+        await sess.commit()
+
+    async def _fail(self, sess, job, sender, recipient, error: str):
+        job.status = "failed"
+        job.error = error
+        await sess.commit()
+        if sender is not None and recipient is not None:
+            await self.notify(job, sender, recipient)
+
+    async def run_once(self) -> bool:
+        """Process a single due job; returns False when there was none"""
+        job = await self.claim()
+        if job is None:
+            return False
+        try:
+            await self.process(job)
+        except StaleDataError:
+            logger.warning("Lease on transfer %s was taken over; dropping it", job.id)
+        return True
+
+    async def run(self):
+        while True:
+            try:
+                if await self.run_once():
+                    continue
+            except Exception:
+                logger.exception("Transfer worker error")
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self.run()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -1,11 +1,59 @@
-from typing import Union
+import re
+from typing import Tuple, Union
+from uuid import UUID, uuid4
 
-from solders.keypair import Keypair
-from sqlalchemy import or_, select
+from solders.pubkey import Pubkey
+from sqlalchemy import exists, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
 
 from models.user import Users
-from models.waitlist import Waitlist, WaitlistJoinRequest
+from models.waitlist import WaitlistJoinRequest
+from services.keys import key_service
+from services.metrics import WALLET_POOL_CLAIMS
+from services.phone import normalize_phone_number
+from services.user_cache import NOT_FOUND, user_cache
+from services.waitlist import WaitlistImporter
+from services.wallet_pool import claim_wallet
+
+UUID_PATTERN = re.compile(r"^[0-9a-fA-F]{8}(-[0-9a-fA-F]{4}){3}-[0-9a-fA-F]{12}$")
+PHONE_NUMBER_PATTERN = re.compile(r"^\+?[\d\s\-().]{7,20}$")
+
+
+class UsernameTakenError(Exception):
+    """Raised when signing up with a username another user already has"""
+
+
+def lookup_columns(identifier: Union[UUID, str]) -> Tuple[str, ...]:
+    """
+    Work out which indexed `Users` columns an identifier can refer to, most
+    likely first, so lookups never have to OR across every column.
+
+    Args:
+        identifier (Union[UUID, str]): A user id, phone number, username,
+            public key or wallet alias.
+
+    Returns:
+        Tuple[str, ...]: Column names to try in order.
+    """
+    if isinstance(identifier, UUID):
+        return ("id",)
+    identifier = str(identifier).strip()
+    if UUID_PATTERN.match(identifier):
+        return ("id",)
+    if PHONE_NUMBER_PATTERN.match(identifier):
+        # Usernames may be all digits too
+        return ("phone_number", "username")
+    if 32 <= len(identifier) <= 44:
+        try:
+            Pubkey.from_string(identifier)
+            # Too long for a username, but not for a wallet alias
+            return ("public_key", "wallet_alias")
+        except ValueError:
+            pass
+    return ("username", "wallet_alias")
 
 
 class UserService:
@@ -13,51 +61,115 @@ class UserService:
         self.session = session
 
     async def create_user(self, user_dict: dict):
+        """
+        Sign a user up with a wallet from the pool, or a freshly generated one.
+
+        Returns:
+            The new user, or "END User already exists" if the phone number
+            is already registered.
+
+        Raises:
+            UsernameTakenError: If another user already has the username.
+        """
         username = user_dict.get("username")
         phone_number = user_dict.get("phone_number")
         full_name = user_dict.get("full_name")
         existing_user = await self.get_user_by_phone_number(phone_number)
         if existing_user:
             return "END User already exists"
+        if username and await self.username_taken(username):
+            raise UsernameTakenError(username)
 
-        keypair = Keypair()
+        # Pre-generated and already encrypted, so signup is just a few statements
+        wallet = await claim_wallet(self.session)
+        WALLET_POOL_CLAIMS.inc(source="pool" if wallet else "generated")
+        public_key, sealed_key = wallet or await key_service.generate()
         user = Users(
             username=username,
             phone_number=phone_number,
             full_name=full_name,
-            public_key=str(keypair.pubkey()),
-            private_key=keypair.to_json(),
+            public_key=public_key,
+            private_key=None,
         )
-        self.session.add(user)
+        user.id = uuid4()
+        self.session.add_all([user, key_service.new_key(user, sealed_key)])
 
-        await self.session.commit()
+        try:
+            await self.session.commit()
+        except IntegrityError:
+            # A concurrent signup took the phone number or username first;
+            # rolling back also returns the wallet to the pool
+            await self.session.rollback()
+            user_cache.invalidate(phone_number=phone_number)
+            if await self.get_user_by_phone_number(phone_number):
+                return "END User already exists"
+            raise UsernameTakenError(username)
+        # Clears the negative entry left by the existence check above
+        user_cache.invalidate_user(user)
         return user
 
-    async def get_user(self, user_id: Union[int | str]):
+    async def username_taken(self, username: str) -> bool:
         result = await self.session.execute(
-            select(Users).where(
-                or_(
-                    Users.id == user_id,
-                    Users.phone_number == user_id,
-                    Users.username == user_id,
-                    Users.public_key == user_id,
-                    Users.wallet_alias == user_id,
-                )
-            )
+            select(exists().where(Users.username == username))
         )
+        return result.scalar()
+
+    async def get_user(self, user_id: Union[UUID, str]):
+        """Find a user by id, phone number, username, public key or wallet alias"""
+        for column in lookup_columns(user_id):
+            value = user_id if isinstance(user_id, UUID) else str(user_id).strip()
+            if column == "id":
+                user = await self.get_user_by_id(UUID(str(value)))
+            elif column == "phone_number":
+                user = await self.get_user_by_phone_number(value)
+            else:
+                result = await self.session.execute(
+                    select(Users).where(getattr(Users, column) == value)
+                )
+                user = result.scalar_one_or_none()
+            if user is not None:
+                return user
+        return None
+
+    async def get_user_by_id(self, user_id: Union[UUID, str]):
+        if not isinstance(user_id, UUID):
+            user_id = UUID(str(user_id))
+        snapshot = user_cache.get_by_id(user_id)
+        if snapshot is not None:
+            return await self._attach(snapshot)
 
-        return result.scalar_one_or_none()
-
-    async def get_user_by_id(self, user_id: Union[int | str]):
         result = await self.session.execute(select(Users).where(Users.id == user_id))
-
-        return result.scalar_one_or_none()
+        user = result.scalar_one_or_none()
+        if user is not None:
+            user_cache.put(user)
+        return user
 
     async def get_user_by_phone_number(self, phone_number: str):
+        # Numbers are stored in E.164, however the telco or user wrote them
+        phone_number = normalize_phone_number(phone_number) or phone_number
+        snapshot = user_cache.get_by_phone_number(phone_number)
+        if snapshot is NOT_FOUND:
+            return None
+        if snapshot is not None:
+            return await self._attach(snapshot)
+
         result = await self.session.execute(
             select(Users).filter(Users.phone_number == phone_number)
         )
-        return result.scalar_one_or_none()
+        user = result.scalar_one_or_none()
+        if user is None:
+            user_cache.put_missing(phone_number)
+        else:
+            user_cache.put(user)
+        return user
+
+    async def _attach(self, snapshot: dict) -> Users:
+        """Turn a cached snapshot into a user bound to this session, without a SELECT"""
+        user = Users.__mapper__.class_manager.new_instance()
+        for key, value in snapshot.items():
+            set_committed_value(user, key, value)
+        make_transient_to_detached(user)
+        return await self.session.merge(user, load=False)
 
     async def get_user_public_key(self, user_id: int):
         user = await self.get_user(user_id)
@@ -66,12 +178,24 @@ class UserService:
     async def update_user_balance(self, user_id: int, new_balance: float):
         user = await self.get_user(user_id)
         if user:
-            user.balance = new_balance
+            user.balance_lamports = round(new_balance * 1e9)
             await self.session.commit()
+            user_cache.invalidate_user(user)
         return user
 
-    async def get_all_users(self):
-        result = await self.session.execute(select(Users))
+    async def get_all_users(self, limit: int = None, after_id=None):
+        """
+        Return all users, or one page of them ordered by id when `limit` is set.
+
+        Without a limit every row is loaded at once; stream whole-table reads
+        through `services.export.export_rows` instead.
+        """
+        stmt = select(Users)
+        if limit is not None:
+            stmt = stmt.order_by(Users.id).limit(limit)
+            if after_id is not None:
+                stmt = stmt.where(Users.id > after_id)
+        result = await self.session.execute(stmt)
         return result.scalars().all()
 
     async def delete_user(self, user_id: int):
@@ -79,21 +203,16 @@ class UserService:
         if user:
             await self.session.delete(user)
             await self.session.commit()
+            user_cache.invalidate_user(user)
         return user
 
     async def add_to_waitlist(self, data: WaitlistJoinRequest):
-        print(f"data: {data}")
-        phone_number = data.phone_number
-        user_id = None
-        stmt = select(Waitlist).where(Waitlist.phone_number == phone_number)
-        result = await self.session.execute(stmt)
-        waitlisted = result.scalar_one_or_none()
-        if waitlisted:
+        importer = WaitlistImporter(self.session)
+        await importer.add(data.phone_number)
+        await importer.flush()
+        status = importer.results[0]["status"]
+        if status == "invalid":
+            return 400, "Please enter a valid phone number"
+        if status == "exists":
             return 400, "You have already joined our waitlist"
-        user = await self.get_user_by_phone_number(phone_number)
-        if user:
-            user_id = user.id
-        waitlist = Waitlist(phone_number=phone_number, user_id=user_id)
-        self.session.add(waitlist)
-        await self.session.commit()
         return 200, "Congrats, you've been added to our waitlist"
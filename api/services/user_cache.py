@@ -0,0 +1,265 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import inspect
+
+from models.user import Users
+from services.cache import TTLCache
+from services.reconnect import Reconnector
+
+logger = logging.getLogger(__name__)
+
+# Returned for phone numbers known not to belong to any user
+NOT_FOUND = object()
+
+# Never kept in memory; loaded from the database when a handler needs them
+SECRET_COLUMNS = ("password", "private_key", "transaction_pin")
+
+
+class UserCache:
+    """
+    Bounded read-through cache of user rows, keyed by id and by phone number.
+
+    Entries are plain column snapshots rather than ORM instances, so they are
+    never tied to the session that loaded them. Unknown phone numbers are cached
+    too, for a shorter time, so repeated dials from unregistered numbers skip
+    the database. Writers must call `invalidate` after changing a user.
+
+    With several workers, `UserCacheInvalidations` passes every invalidation
+    on to the other processes; the cache is bypassed whenever it can't.
+    Secret columns (`SECRET_COLUMNS`) are left out of snapshots, so users
+    served from here load them on first access.
+    """
+
+    def __init__(
+        self, maxsize: int = 10_000, ttl: float = 60.0, negative_ttl: float = 5.0
+    ):
+        """
+        Args:
+            maxsize (int, optional): Maximum users held. Defaults to 10_000.
+            ttl (float, optional): Seconds a user row is served from memory. Defaults to 60.
+            negative_ttl (float, optional): Seconds an unknown phone number is
+                remembered. Defaults to 5.
+        """
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self.negative_hits = 0
+        # Set while invalidations from other workers may be getting lost
+        self.bypass = False
+        # Called with (user_id, phone_number) for every local invalidation
+        self.on_invalidate: Optional[Callable[[object, Optional[str]], None]] = None
+        self._by_id = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._by_phone = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    @classmethod
+    def from_env(cls) -> "UserCache":
+        return cls(
+            maxsize=int(os.getenv("USER_CACHE_MAX_SIZE", 10_000)),
+            ttl=float(os.getenv("USER_CACHE_TTL", 60)),
+            negative_ttl=float(os.getenv("USER_CACHE_NEGATIVE_TTL", 5)),
+        )
+
+    def get_by_id(self, user_id) -> Optional[Dict]:
+        """Return a snapshot for `user_id`, or None on a miss"""
+        snapshot = None if self.bypass else self._by_id.get(user_id)
+        if snapshot is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return snapshot
+
+    def get_by_phone_number(self, phone_number: str):
+        """Return a snapshot, `NOT_FOUND` for a known unknown number, or None on a miss"""
+        user_id = None if self.bypass else self._by_phone.get(phone_number)
+        if user_id is NOT_FOUND:
+            self.negative_hits += 1
+            return NOT_FOUND
+        snapshot = self._by_id.get(user_id) if user_id is not None else None
+        if snapshot is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return snapshot
+
+    def put(self, user: Users):
+        """Cache a freshly loaded user"""
+        if self.bypass:
+            return
+        snapshot = snapshot_user(user)
+        self._by_id.set(user.id, snapshot)
+        self._by_phone.set(user.phone_number, user.id)
+
+    def put_missing(self, phone_number: str):
+        if self.bypass:
+            return
+        self._by_phone.set(phone_number, NOT_FOUND, ttl=self.negative_ttl)
+
+    def invalidate(self, user_id=None, phone_number: Optional[str] = None):
+        """Drop a user by id and/or phone number, including a negative entry"""
+        self.drop(user_id, phone_number)
+        if self.on_invalidate is not None:
+            self.on_invalidate(user_id, phone_number)
+
+    def drop(self, user_id=None, phone_number: Optional[str] = None):
+        """Invalidate in this process only, e.g. on behalf of another worker"""
+        if user_id is not None:
+            snapshot = self._by_id.pop(user_id)
+            if snapshot is not None:
+                self._by_phone.pop(snapshot["phone_number"])
+        if phone_number is not None:
+            self._by_phone.pop(phone_number)
+
+    def invalidate_user(self, user: Users):
+        self.invalidate(user_id=user.id, phone_number=user.phone_number)
+
+    def clear(self):
+        self._by_id.clear()
+        self._by_phone.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": len(self._by_id),
+            "phone_keys": len(self._by_phone),
+            "hits": self.hits,
+            "misses": self.misses,
+            "negative_hits": self.negative_hits,
+            "evictions": self._by_id.evictions + self._by_phone.evictions,
+            "expirations": self._by_id.expirations + self._by_phone.expirations,
+        }
+
+
+def snapshot_user(user: Users) -> Dict:
+    """Copy the mapped columns of a loaded user, except secrets, into a plain dict"""
+    return {
+        attr.key: getattr(user, attr.key)
+        for attr in inspect(Users).column_attrs
+        if attr.key not in SECRET_COLUMNS
+    }
+
+
+class UserCacheInvalidations:
+    """
+    Shares `UserCache` invalidations between worker processes over Redis pub/sub.
+
+    Local invalidations are batched and published on `channel`; every
+    worker applies the batches the others publish. Messages published while
+    a worker isn't subscribed are lost, so the cache is bypassed until the
+    subscription is confirmed and cleared once it is, and bypassed again as
+    soon as the connection drops. A failed publish clears the local cache
+    and is logged; the other workers' entries then expire with their TTL.
+
+    The client only needs async `publish`, `aclose` and `pubsub()`, whose
+    object needs async `subscribe`, `aclose` and `listen`.
+    """
+
+    def __init__(self, client, cache: UserCache, channel: str = "user_cache"):
+        """
+        Args:
+            client: Redis-compatible async client, e.g. `redis.asyncio.Redis`.
+            cache (UserCache): The cache to keep in step with the other workers.
+            channel (str, optional): Pub/sub channel. Defaults to "user_cache".
+        """
+        self.client = client
+        self.cache = cache
+        self.channel = channel
+        self.origin = uuid4().hex
+        self.published = 0
+        self.received = 0
+        self.connection = Reconnector(
+            self._listen, "User cache invalidation subscription"
+        )
+        self._outbox: asyncio.Queue = asyncio.Queue()
+        self._tasks = []
+
+    @classmethod
+    def from_env(cls, cache: UserCache) -> Optional["UserCacheInvalidations"]:
+        """
+        Configured by $USER_CACHE_INVALIDATION ("local" or "redis"), which
+        follows $SESSION_STORE, and $REDIS_URL; None when invalidations stay local
+        """
+        backend = os.getenv("USER_CACHE_INVALIDATION") or os.getenv(
+            "SESSION_STORE", "memory"
+        )
+        if backend.lower() != "redis":
+            return None
+        from redis.asyncio import from_url
+
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        return cls(from_url(redis_url), cache)
+
+    def publish(self, user_id, phone_number: Optional[str]):
+        """Queue a local invalidation for the other workers"""
+        self._outbox.put_nowait(
+            [None if user_id is None else str(user_id), phone_number]
+        )
+
+    def apply(self, message: Dict):
+        """Drop what another worker invalidated"""
+        if message.get("origin") == self.origin:
+            return
+        self.received += 1
+        for user_id, phone_number in message["users"]:
+            self.cache.drop(None if user_id is None else UUID(user_id), phone_number)
+
+    async def run_publisher(self):
+        while True:
+            users: List = [await self._outbox.get()]
+            while not self._outbox.empty():
+                users.append(self._outbox.get_nowait())
+            try:
+                await self.client.publish(
+                    self.channel, json.dumps({"origin": self.origin, "users": users})
+                )
+                self.published += 1
+            except Exception:
+                logger.exception("Publishing %d user invalidations failed", len(users))
+                self.cache.clear()
+
+    async def _listen(self):
+        pubsub = self.client.pubsub()
+        try:
+            await pubsub.subscribe(self.channel)
+            async for message in pubsub.listen():
+                if message["type"] == "subscribe":
+                    self.cache.clear()
+                    self.cache.bypass = False
+                elif message["type"] == "message":
+                    self.apply(json.loads(message["data"]))
+        finally:
+            self.cache.bypass = True
+            await pubsub.aclose()
+
+    async def run(self):
+        await self.connection.run()
+
+    def start(self):
+        if not self._tasks:
+            self.cache.bypass = True
+            self.cache.on_invalidate = self.publish
+            self._tasks = [
+                asyncio.create_task(self.run()),
+                asyncio.create_task(self.run_publisher()),
+            ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.cache.on_invalidate = None
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "published": self.published,
+            "received": self.received,
+            "reconnects": self.connection.reconnects,
+        }
+
+
+user_cache = UserCache.from_env()
@@ -1,324 +1,439 @@
+import asyncio
+import logging
+import math
 import os
-from datetime import datetime, timedelta
-from typing import Dict
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
 
 from solders.pubkey import Pubkey
 
 from models.ussd import UssdRequest
-from services.database import get_session
+from services import menus
+from services.balance import BalanceCache
+from services.balance_subscriptions import BalanceSubscriptions
+from services.context import UssdContext
+from services import deadline
+from services.database import get_session, statement_timed_out
+from services.keys import key_service
+from services.log import session_id
+from services.metrics import (
+    CACHE_ENTRIES,
+    CACHE_EVENTS,
+    REGISTRY,
+    RPC_ENDPOINT_ERROR_RATE,
+    RPC_ENDPOINT_HEALTHY,
+    RPC_ENDPOINT_LATENCY,
+    USSD_REQUEST_SECONDS,
+    USSD_RESPONSES,
+)
+from services.rpc import RpcManager, RpcUnavailableError
+from services.session_store import create_session_store
+from services.state_machine import Reply, StateMachine, con, end
+from services.token_accounts import token_accounts
 from services.transfer import SolanaTransfer
-from services.user import UserService
+from services.transfer_queue import enqueue_transfer, idempotency_key
+from services.user import UsernameTakenError
+from services.user_cache import user_cache
 
-# Initialize in-memory cache
-session_cache = {}  # TODO: replace with redis
+logger = logging.getLogger(__name__)
 
-# Add these to your existing imports and global variables
-sol_transfer = SolanaTransfer(os.getenv("RPC_URL"))
+# Seconds the gateway waits for a reply, and how much of that is kept back for
+# sending it; a hop still running after that is finished in the background
+USSD_TIMEOUT = float(os.getenv("USSD_TIMEOUT", 5))
+USSD_REPLY_MARGIN = float(os.getenv("USSD_REPLY_MARGIN", 0.5))
+USSD_BACKGROUND_TIMEOUT = float(os.getenv("USSD_BACKGROUND_TIMEOUT", 30))
 
+# Hops being processed, referenced so backgrounded ones aren't garbage collected
+_hops: Set[asyncio.Task] = set()
 
-def get_session_data(session_id: str) -> Dict:
-    """Retrieve session data from memory cache"""
-    return session_cache.get(session_id, {})
+# Session state lives in a pluggable store (in-process or Redis) with TTL eviction
+session_store = create_session_store()
 
+# Maps every USSD state to its handler; see the @machine.state registrations below
+machine = StateMachine(initial="initial", fallback=menus.GENERIC_ERROR.render())
 
-def set_session(session_id: str, data: Dict):
-    """Store session data in memory cache"""
-    if session_id not in session_cache:
-        session_cache[session_id] = data
-        session_cache[session_id].update(
-            {
-                "expiration_time": (datetime.now() + timedelta(seconds=10)).isoformat(
-                    timespec="seconds"
-                )
-            }
-        )
-        return
+sol_transfer = SolanaTransfer(rpc=RpcManager.from_env())
+
+# Coalesces balance lookups so concurrent sessions share one RPC call per wallet
+balance_cache = BalanceCache(
+    fetch=lambda public_key: sol_transfer.get_solana_balance(
+        Pubkey.from_string(public_key)
+    ),
+    ttl=float(os.getenv("BALANCE_TTL", 10)),
+    stale_ttl=float(os.getenv("BALANCE_STALE_TTL", 60)),
+)
+
+# Optional: push balance updates over websocket subscriptions for active wallets
+balance_subscriptions = BalanceSubscriptions.from_env(sol_transfer, balance_cache)
 
-    session_cache[session_id].update(data)
 
+async def get_session_data(session_id: str) -> Dict:
+    """Retrieve session data from the session store"""
+    return await session_store.get(session_id)
 
-def delete_session(session_id: str):
-    """Delete session data from memory cache"""
-    if session_id in session_cache:
-        del session_cache[session_id]
+
+async def set_session(session_id: str, data: Dict):
+    """Merge data into the session and refresh its TTL"""
+    session_data = await session_store.get(session_id)
+    session_data.update(data)
+    await session_store.set(session_id, session_data)
+
+
+async def delete_session(session_id: str):
+    """Delete session data from the session store"""
+    await session_store.delete(session_id)
 
 
 async def process_request(data: UssdRequest) -> str:
     """Main function to process USSD requests"""
-    session_data = get_session_data(data.session_id)
-    state = session_data.get("state", "initial")
-    set_session(
-        data.session_id, {"state": "initial", "phone_number": data.phone_number}
-    )
+    started = time.perf_counter()
+    session_id.set(data.session_id)
+    session_data = await get_session_data(data.session_id)
     async with get_session() as sess:
-        user_service = UserService(sess)
-        user = await user_service.get_user_by_phone_number(data.phone_number)
-        if not user:
-            set_session(data.session_id, {"user_id": None})
-        else:
-            set_session(data.session_id, {"user_id": user.id, "user": user.to_dict()})
-    if state == "initial":
-        return await handle_initial_state(data)
-    elif state == "existing_user":
-        return await handle_existing_user(data)
-    elif state == "signup_username":
-        return await handle_signup_username(data)
-    elif state == "wallet_access":
-        return await handle_wallet_access(data)
-    elif state == "send_tokens":
-        return await handle_send_tokens(data)
-    elif state == "send_tokens_recipient":
-        return await handle_send_tokens_amount(data)
-    elif state == "send_tokens_confirm":
-        return await handle_send_tokens_confirm(data)
-    elif state == "view_balance":
-        return await handle_view_balance(data)
-    elif state == "finalize_transaction":
-        return await finalize_transaction(data)
+        ctx = UssdContext(data=data, db=sess, session_data=session_data)
+        ctx.read_input()
+        user = await ctx.load_user()
+        ctx.set(phone_number=data.phone_number, user_id=user.id if user else None)
+        if user is not None and balance_subscriptions is not None:
+            balance_subscriptions.track(user)
+        response = await machine.dispatch(ctx)
+        await ctx.commit()
+
+    if ctx.ended:
+        await delete_session(data.session_id)
     else:
-        return "END An error occurred. Please try again."
+        await session_store.set(data.session_id, ctx.session_data)
+
+    outcome = response[:3]
+    USSD_RESPONSES.inc(outcome=outcome)
+    USSD_REQUEST_SECONDS.observe(time.perf_counter() - started, outcome=outcome)
+    return response
+
+
+def _hop_done(task: asyncio.Task):
+    _hops.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("USSD hop failed", exc_info=task.exception())
+
+
+def _timed_out(error: BaseException) -> bool:
+    """Whether a hop failed by running out of time rather than by a bug"""
+    return isinstance(error, deadline.DeadlineExceeded) or statement_timed_out(error)
+
+
+async def respond(data: UssdRequest) -> str:
+    """
+    Process a USSD request within the gateway's time budget.
+
+    The hop runs under a deadline of USSD_TIMEOUT seconds, which every DB,
+    RPC and session store call respects. If it hasn't answered by the time
+    only USSD_REPLY_MARGIN is left, the user is asked to dial again and the
+    hop is given USSD_BACKGROUND_TIMEOUT more seconds to finish unobserved.
+    """
+    with deadline.request_deadline(USSD_TIMEOUT) as budget:
+        # The task inherits the deadline. asyncio.wait never cancels it, so
+        # neither running out of time here nor a dropped connection stops it
+        task = asyncio.create_task(process_request(data))
+    _hops.add(task)
+    task.add_done_callback(_hop_done)
+    await asyncio.wait({task}, timeout=max(budget.remaining() - USSD_REPLY_MARGIN, 0))
+    if not task.done():
+        budget.extend(USSD_BACKGROUND_TIMEOUT)
+        logger.warning("USSD hop over budget; finishing in the background")
+    elif not _timed_out(task.exception()):
+        return task.result()
+    else:
+        logger.warning("USSD hop ran out of time")
+    USSD_RESPONSES.inc(outcome="deferred")
+    return menus.PROCESSING.render()
+
+
+async def collect_metrics():
+    """Copy cache, session store and RPC endpoint statistics into gauges"""
+    users = user_cache.stats()
+    keys = key_service.stats()
+    caches = {
+        "sessions": session_store.stats(),
+        "users": users,
+        "user_phones": {"size": users.pop("phone_keys")},
+        "signing_keys": {"size": keys["cached_keypairs"]},
+        "balances": {
+            "size": len(balance_cache.cache),
+            "fetches": balance_cache.fetches,
+        },
+        "token_accounts": token_accounts.stats(),
+        "blockhash": sol_transfer.blockhashes.stats(),
+        "signatures": sol_transfer.confirmer.stats(),
+    }
+    if balance_subscriptions is not None:
+        caches["balance_subscriptions"] = balance_subscriptions.stats()
+    for cache, stats in caches.items():
+        for event, value in stats.items():
+            if event == "size":
+                CACHE_ENTRIES.set(value, cache=cache)
+            else:
+                CACHE_EVENTS.set_total(value, cache=cache, event=event)
+    for endpoint in sol_transfer.rpc.endpoints:
+        RPC_ENDPOINT_LATENCY.set(endpoint.latency, url=endpoint.url)
+        RPC_ENDPOINT_ERROR_RATE.set(endpoint.error_rate, url=endpoint.url)
+        RPC_ENDPOINT_HEALTHY.set(int(endpoint.healthy), url=endpoint.url)
+
+
+REGISTRY.add_collector(collect_metrics)
+
+
+def welcome_back(ctx: UssdContext) -> Reply:
+    return con(
+        menus.WELCOME_BACK.render(
+            username=ctx.user.username, balance=ctx.user.sol_balance
+        ),
+        "existing_user",
+    )
 
 
-async def view_details(data: UssdRequest) -> str:
-    session_data = get_session_data(data.session_id)
-    user_id = session_data.get("user_id")
-    user: Dict = session_data.get("user")
-    print(f"user_id: {user_id}")
-    if not user_id:
-        return "END Please sign up first."
+async def view_details(ctx: UssdContext) -> Reply:
+    user = ctx.user
     if not user:
-        return "END Please sign up first."
-    print(f"user: {user}")
-    return f'END Username: {user.get("username")}\nWallet nick: {user.get("alias")}\nPublic key: {user.get("public_key")}\nBalance: {user.get("balance")} SOL'
+        return end(menus.SIGNUP_REQUIRED.render())
+    return end(
+        menus.USER_DETAILS.render(
+            username=user.username,
+            alias=user.wallet_alias,
+            public_key=user.public_key,
+            balance=user.sol_balance,
+        )
+    )
+
+
+# region initial state
+@machine.state(
+    "initial",
+    transitions=("initial", "existing_user", "signup_username", "wallet_access"),
+)
+async def handle_initial_state(ctx: UssdContext) -> Reply:
+    """Handle the initial state of the USSD session"""
+    text = ctx.input.value
+    if text == "":
+        if ctx.user:
+            return welcome_back(ctx)
+        return con(menus.MAIN_MENU.render(), "initial")
+    elif text == "1":
+        return con(menus.SIGNUP_PROMPT.render(), "signup_username")
+    elif text == "2":
+        if not ctx.user:
+            return end(menus.SIGNUP_REQUIRED.render())
+        return con(menus.WALLET_ACCESS.render(), "wallet_access")
+    else:
+        return end(menus.INVALID_INPUT.render())
+
+
+@machine.state("signup_username", transitions=("signup_username",))
+async def handle_signup_username(ctx: UssdContext) -> Reply:
+    """Handle the username input during signup"""
+    text = ctx.input.value
+    if "," not in text:
+        return end(menus.SIGNUP_FORMAT.render())
+    username, full_name = text.split(",")[:2]
+    if not await validate_username(username):
+        return con(menus.SIGNUP_INVALID_USERNAME.render(), "signup_username")
+
+    # create wallet for user
+    user_dict = {
+        "username": username.strip(),
+        "full_name": full_name.title().strip(),
+        "phone_number": ctx.data.phone_number,
+    }
+    try:
+        user = await ctx.users.create_user(user_dict)
+    except UsernameTakenError:
+        return con(
+            menus.SIGNUP_USERNAME_TAKEN.render(username=user_dict["username"]),
+            "signup_username",
+        )
+    if isinstance(user, str):
+        return end(menus.USER_EXISTS.render())
+    if user is None:
+        return end(menus.SIGNUP_ERROR.render())
+
+    return end(
+        menus.SIGNUP_SUCCESS.render(
+            username=username,
+            key_head=user.public_key[:20],
+            key_tail=user.public_key[20:],
+        )
+    )
 
 
-async def handle_wallet_access(data: UssdRequest) -> str:
-    set_session(data.session_id, {"state": "wallet_access"})
-    response = data.text.split("*")[-1]
+@machine.state("existing_user", transitions=("wallet_access",))
+async def handle_existing_user(ctx: UssdContext) -> Reply:
+    response = ctx.input.value
     if response == "1":
-        return await handle_view_balance(data)
+        return con(menus.WALLET_ACCESS.render(), "wallet_access")
     elif response == "2":
-        set_session(data.session_id, {"state": "send_tokens"})
-        return "CON Enter the recipient's username:"
+        return end(menus.GOODBYE.render())
     elif response == "3":
-        set_session(data.session_id, {"state": "initial"})
-        return "CON Wallet Access:\n1. View Balance\n2. Send sol\n3. Back to Main Menu"
+        return await view_details(ctx)
     else:
-        return "END An error occurred. Please try again."
+        return end(menus.INVALID_INPUT.render())
 
 
-async def handle_existing_user(data: UssdRequest) -> str:
-    response = data.text.split("*")[-1]
-    if response == "2":
-        delete_session(data.session_id)
-        return "END Thank you for using YouSSD. Goodbye!"
-    elif response == "1":
-        set_session(data.session_id, {"state": "wallet_access"})
-        return "CON Wallet Access:\n1. View Balance\n2. Send sol\n3. Back to Main Menu"
+@machine.state("wallet_access", transitions=("send_tokens", "existing_user"))
+async def handle_wallet_access(ctx: UssdContext) -> Reply:
+    response = ctx.input.value
+    if response == "1":
+        return await handle_view_balance(ctx)
+    elif response == "2":
+        return con(menus.RECIPIENT_PROMPT.render(), "send_tokens")
     elif response == "3":
-        set_session(data.session_id, {"state": "view_details"})
-        return await view_details(data)
+        return welcome_back(ctx)
     else:
-        return "END Invalid input. Please try again."
+        return end(menus.GENERIC_ERROR.render())
 
 
 # region handle view balance
-async def handle_view_balance(data: UssdRequest) -> str:
-    async with get_session() as sess:
-        user_service = UserService(sess)
-        user = await user_service.get_user_by_phone_number(data.phone_number)
-
-        if not user:
-            return "END Please sign up first."
-
-        if user.last_balance_update is None and user.sol_balance == 0:
-            balance = await sol_transfer.get_solana_balance(
-                Pubkey.from_string(user.public_key)
-            )
-            user.last_balance_update = datetime.now()
-            user.sol_balance = balance
-            await sess.commit()
-
-        elif user.last_balance_update and (
-            datetime.now() - user.last_balance_update
-        ) < timedelta(seconds=10):
-            balance = user.sol_balance
-        else:
-            balance = await sol_transfer.get_solana_balance(
-                Pubkey.from_string(user.public_key)
+@machine.state("view_balance")
+async def handle_view_balance(ctx: UssdContext) -> Reply:
+    user = ctx.user
+    if not user:
+        return end(menus.SIGNUP_REQUIRED.render())
+
+    # A live subscription always has the current balance; otherwise serve from
+    # the shared balance cache, falling back to a fresh-enough DB value
+    balance = None
+    if balance_subscriptions is not None:
+        balance = balance_subscriptions.current(user.public_key)
+    if balance is None:
+        balance_cache.prime(user.public_key, user.sol_balance, user.last_balance_update)
+        try:
+            balance = await balance_cache.get(user.public_key)
+        except RpcUnavailableError:
+            logger.warning("No RPC endpoint for %s's balance", user.public_key)
+            if user.last_balance_update is None:
+                return end(menus.BALANCE_UNAVAILABLE.render())
+            return end(
+                menus.LAST_KNOWN_BALANCE.render(
+                    balance=user.sol_balance,
+                    updated_at=user.last_balance_update.strftime("%Y-%m-%d %H:%M UTC"),
+                )
             )
-            user.last_balance_update = datetime.now()
-            user.sol_balance = balance
-            await sess.commit()
-        delete_session(data.session_id)
+    lamports = round(balance * 1e9)
+    if lamports != user.balance_lamports:
+        user.balance_lamports = lamports
+        user.last_balance_update = datetime.now(tz=timezone.utc)
 
-    return f"END Your balance is: {balance} SOL"
+    return end(menus.BALANCE.render(balance=balance))
 
 
 # region send tokens
-async def handle_send_tokens(data: UssdRequest) -> str:
+@machine.state("send_tokens", transitions=("send_tokens_recipient",))
+async def handle_send_tokens(ctx: UssdContext) -> Reply:
     """Handles the initial stage of sending tokens, requesting the recipient."""
-    session_data = get_session_data(data.session_id)
-    user_id = session_data.get("user_id")
-    if not user_id:
-        return "END Please sign up first."
-
-    parts = data.text.split("*")
-    if len(parts) == 3:
-        recipient = parts[-1]
-        set_session(
-            data.session_id, {"state": "send_tokens_recipient", "recipient": recipient}
+    if not ctx.user:
+        return end(menus.SIGNUP_REQUIRED.render())
+
+    recipient = ctx.input.value.strip()
+    if recipient:
+        return con(
+            menus.AMOUNT_PROMPT.render(recipient=recipient),
+            "send_tokens_recipient",
+            recipient=recipient,
         )
-        return f"CON Enter amount to send to {recipient} (in SOL):"
     else:
-        return "END Invalid input. Please try again."
+        return end(menus.INVALID_INPUT.render())
 
 
 # region handle send tokens amount
-async def handle_send_tokens_amount(data: UssdRequest) -> str:
+def parse_amount(text: str) -> Optional[float]:
+    """An amount of SOL worth at least one lamport, or None if `text` isn't one"""
+    try:
+        amount = float(text)
+    except ValueError:
+        return None
+    # Rejects nan and inf too; lamports must fit a signed 64-bit column
+    if not math.isfinite(amount) or not 1 <= round(amount * 1e9) < 2**63:
+        return None
+    return amount
+
+
+@machine.state(
+    "send_tokens_recipient",
+    transitions=("send_tokens_recipient", "send_tokens_confirm"),
+)
+async def handle_send_tokens_amount(ctx: UssdContext) -> Reply:
     """Handles the stage of receiving the amount to send."""
-    session_data = get_session_data(data.session_id)
-    user_id = session_data.get("user_id")
-    recipient = session_data.get("recipient")
-    if not user_id or not recipient:
-        return "END An error occurred. Please try again."
-
-    parts = data.text.split("*")
+    recipient = ctx.session_data.get("recipient")
+    if not ctx.user or not recipient:
+        return end(menus.GENERIC_ERROR.render())
+
+    amount = parse_amount(ctx.input.value)
+    if amount is None:
+        logger.debug("Invalid amount entered")
+        return con(
+            menus.INVALID_AMOUNT.render(recipient=recipient), "send_tokens_recipient"
+        )
     try:
-        amount = float(parts[-1])
-        set_session(
-            data.session_id,
-            {"state": "send_tokens_confirm", "recipient": recipient, "amount": amount},
+        balance = await balance_cache.get(ctx.user.public_key)
+    except RpcUnavailableError:
+        # Can't tell; the transfer itself fails if the funds aren't there
+        balance = None
+    if balance is not None and amount > balance:
+        return con(
+            menus.INSUFFICIENT_BALANCE.render(balance=balance, recipient=recipient),
+            "send_tokens_recipient",
         )
-        return f"CON Confirm sending {amount} SOL to {recipient}? \n1. Yes\n2. No"
-    except Exception as e:
-        print(str(e))
-        return "END Invalid input. Please try again."
+    return con(
+        menus.CONFIRM_SEND.render(amount=amount, recipient=recipient),
+        "send_tokens_confirm",
+        amount=amount,
+    )
 
 
-async def handle_send_tokens_confirm(data: UssdRequest) -> str:
+@machine.state("send_tokens_confirm", transitions=("finalize_transaction",))
+async def handle_send_tokens_confirm(ctx: UssdContext) -> Reply:
     """Handles the stage of confirming the transaction."""
-    session_data = get_session_data(data.session_id)
-    user_id = session_data.get("user_id")
-    recipient = session_data.get("recipient")
-    amount = session_data.get("amount")
-    if not user_id or not recipient or not amount:
-        delete_session(data.session_id)
-        return "END An error occurred. Please try again."
-
-    parts = data.text.split("*")
-    print(f"Parts: {parts}")
-    if parts[-1] == "1":
-        set_session(data.session_id, {"state": "finalize_transaction"})
-        return "CON Enter transaction pin:"
-
-    elif parts[-1] == "2":
-        delete_session(data.session_id)
-        return "END Transaction canceled."
+    recipient = ctx.session_data.get("recipient")
+    amount = ctx.session_data.get("amount")
+    if not ctx.user or not recipient or not amount:
+        return end(menus.GENERIC_ERROR.render())
+
+    response = ctx.input.value
+    if response == "1":
+        return con(menus.PIN_PROMPT.render(), "finalize_transaction")
+    elif response == "2":
+        return end(menus.TRANSACTION_CANCELED.render())
     else:
-        delete_session(data.session_id)
-        return "END Invalid input. Please try again."
+        return end(menus.INVALID_INPUT.render())
 
 
-async def finalize_transaction(
-    data: UssdRequest, user_id: int, recipient_id: str, amount: float
-) -> str:
+@machine.state("finalize_transaction")
+async def finalize_transaction(ctx: UssdContext) -> Reply:
     """Finalizes the transaction by sending the tokens."""
-    session_id = data.session_id
-    sender = session_cache.get(session_id, {}).get("user")
-    parts = data.text.split("*")
-    pin = parts[-1]
-    if pin != sender.get("transaction_pin"):
-        return "END Invalid pin. Please try again."
+    sender = ctx.user
+    recipient_id = ctx.session_data.get("recipient")
+    amount = ctx.session_data.get("amount")
+    if not sender or not recipient_id or parse_amount(str(amount)) is None:
+        return end(menus.GENERIC_ERROR.render())
+
+    pin = ctx.input.value
+    # Not cached with the rest of the user, so possibly a query of its own
+    if pin != str(await sender.awaitable_attrs.transaction_pin):
+        return end(menus.INVALID_PIN.render())
     # Retrieve sender's keypair and recipient's public key and send the tokens
-    async with get_session() as sess:
-        user_service = UserService(sess)
-        recipient = await user_service.get_user(recipient_id)
-
+    recipient = await ctx.users.get_user(recipient_id)
     if not recipient:
-        return f"END User {recipient_id} not found"
-    sender_keypair = Pubkey.from_string(sender.get("public_key"))
-    recipient_pubkey = Pubkey.from_string(recipient.public_key)
-    try:
-        tx_signature = await sol_transfer.send_sol(
-            sender_keypair, Pubkey.from_string(recipient_pubkey), amount
-        )
-        set_session(data.session_id, {"state": "initial"})
-        async with get_session() as sess:
-            user_service = UserService(sess)
-            user = await user_service.get_user(user_id)
-            user.sol_balance -= amount
-            await sess.commit()
-        return "END Tokens sent successfully. Expect an sms"
-    except Exception as e:
-        set_session(data.session_id, {"state": "initial"})
-        return f"END Failed to send tokens: {str(e)}"
-
-
-# region initial state
-async def handle_initial_state(data: UssdRequest) -> str:
-    """Handle the initial state of the USSD session"""
-    if data.text == "":
-        async with get_session() as sess:
-            user_service = UserService(sess)
-            existing_user = await user_service.get_user_by_phone_number(
-                data.phone_number
-            )
-
-        if existing_user:
-            set_session(
-                data.session_id,
-                {"user_id": existing_user.id, "state": "existing_user"},
-            )
-            return f"CON Welcome back {existing_user.username}.\nCurrent balance: {existing_user.sol_balance} SOL.\n\n What would you like to do?\n1. Access wallet\n2. Quit\n3. View details"
-        else:
-            set_session(data.session_id, {"state": "initial"})
-        return "CON Welcome to YouSSD. What would you like to do?\n1. Sign up\n2. Access wallet"
-    elif data.text == "1":
-        set_session(data.session_id, {"state": "signup_username"})
-        return (
-            "CON Enter your desired username and full name\ne.g 'idris_cool, Ade Obi':"
-        )
-    elif data.text == "2":
-        user_id = get_session_data(data.session_id).get("user_id")
-        if not user_id:
-            delete_session(data.session_id)
-            return "END Please sign up first."
-        set_session(data.session_id, {"state": "wallet_access"})
-        return (
-            "CON Wallet Access:\n1. View Balance\n2. Send Tokens\n3. Back to Main Menu"
-        )
-    else:
-        delete_session(data.session_id)
-        return "END Invalid input. Please try again."
-
-
-async def handle_signup_username(data: UssdRequest) -> str:
-    """Handle the username input during signup"""
-    text = data.text.split("*")[-1]
-    if "," not in text:
-        return "END Expected format 'username, full name'\n\te.g 'idris_cool, Ade Obi'"
-    username, full_name = text.split(",")[:2]
-    if await validate_username(username):
-        async with get_session() as sess:
-            user_service = UserService(sess)
-            # create wallet for user
-            user_dict = {
-                "username": username.strip(),
-                "full_name": full_name.title().strip(),
-                "phone_number": data.phone_number,
-            }
-            user = await user_service.create_user(user_dict)
-        if isinstance(user, str):
-            return user
-        if user is None:
-            delete_session(data.session_id)
-            return "END An error occurred during signup. Please try again."
-
-        delete_session(data.session_id)
-        return f"END Thank you for signing up, {username}!\nYour account has been created.\nYour public key is: \n{user.public_key[:20]}\n{user.public_key[20:]}"
-    else:
-        return "CON Invalid username. Please try again."
+        return end(menus.RECIPIENT_NOT_FOUND.render(recipient=recipient_id))
+
+    # Queue the transfer and answer right away; TransferWorker sends and confirms
+    lamports = round(amount * 1e9)
+    await enqueue_transfer(
+        ctx.db,
+        idempotency_key(ctx.data.session_id, sender.id, recipient.id, lamports),
+        sender.id,
+        recipient.id,
+        lamports,
+    )
+    return end(menus.TRANSFER_QUEUED.render(amount=amount, recipient=recipient_id))
 
 
 async def validate_username(username: str) -> bool:
@@ -327,9 +442,4 @@ async def validate_username(username: str) -> bool:
     return len(username) >= 3 and username.isalnum()
 
 
-async def get_user_keypair(user_id: int):
-    pass
-
-
-async def get_user_public_key(user_id: int) -> str:
-    pass
+machine.validate()
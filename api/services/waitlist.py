@@ -0,0 +1,128 @@
+import codecs
+import csv
+from typing import AsyncIterable, AsyncIterator, Dict, List, Optional
+from uuid import uuid4
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.transfer import utcnow
+from models.user import Users
+from models.waitlist import Waitlist
+from services.database import upsert
+from services.phone import normalize_phone_number
+
+# Rows per INSERT; keeps statements well under SQLite's and asyncpg's
+# bound-parameter limits
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class WaitlistImporter:
+    """
+    Adds phone numbers to the waitlist in bulk.
+
+    Numbers are normalized and deduplicated in memory, then written in chunks
+    with one `INSERT ... ON CONFLICT (phone_number) DO NOTHING RETURNING` each,
+    so numbers that are already waitlisted cost nothing extra. Every input gets
+    a result: "added", "exists", "duplicate" (repeated in this import) or
+    "invalid".
+    """
+
+    def __init__(self, session: AsyncSession, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.session = session
+        self.chunk_size = chunk_size
+        self.results: List[Dict[str, Optional[str]]] = []
+        self._seen = set()
+        self._pending: Dict[str, Dict] = {}
+
+    async def add(self, raw: str):
+        phone_number = normalize_phone_number(raw)
+        result = {"input": raw, "phone_number": phone_number}
+        if phone_number is None:
+            result["status"] = "invalid"
+        elif phone_number in self._seen:
+            result["status"] = "duplicate"
+        else:
+            self._seen.add(phone_number)
+            self._pending[phone_number] = result
+            if len(self._pending) >= self.chunk_size:
+                await self.flush()
+        self.results.append(result)
+
+    async def add_all(self, numbers: AsyncIterable[str]):
+        async for raw in numbers:
+            await self.add(raw)
+        await self.flush()
+
+    async def flush(self):
+        """Write the pending chunk and commit it"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        numbers = list(pending)
+
+        result = await self.session.execute(
+            select(Users.phone_number, Users.id).where(Users.phone_number.in_(numbers))
+        )
+        user_ids = dict(result.all())
+
+        now = utcnow()
+        stmt = (
+            upsert(self.session, Waitlist)
+            .values(
+                [
+                    {
+                        "id": uuid4(),
+                        "phone_number": number,
+                        "user_id": user_ids.get(number),
+                        "created_at": now,
+                    }
+                    for number in numbers
+                ]
+            )
+            .on_conflict_do_nothing(index_elements=["phone_number"])
+            .returning(Waitlist.phone_number)
+        )
+        added = set((await self.session.execute(stmt)).scalars().all())
+        await self.session.commit()
+
+        for number, item in pending.items():
+            item["status"] = "added" if number in added else "exists"
+
+    def summary(self) -> Dict[str, int]:
+        counts = {"added": 0, "exists": 0, "duplicate": 0, "invalid": 0}
+        for result in self.results:
+            counts[result["status"]] += 1
+        return counts
+
+
+async def _lines(body: AsyncIterable[bytes], encoding: str) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    buffer = ""
+    async for chunk in body:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line
+    yield buffer + decoder.decode(b"", final=True)
+
+
+async def csv_phone_numbers(
+    body: AsyncIterable[bytes], encoding: str = "utf-8"
+) -> AsyncIterator[str]:
+    """
+    Yield the first column of each CSV row as the body streams in.
+
+    A first row without any digits is taken as a header and skipped.
+    """
+    first = True
+    async for line in _lines(body, encoding):
+        row = next(csv.reader([line]), None)
+        value = row[0].strip() if row else ""
+        if not value:
+            continue
+        if first and not any(char.isdigit() for char in value):
+            first = False
+            continue
+        first = False
+        yield value
@@ -0,0 +1,127 @@
+import asyncio
+import logging
+import random
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models.wallet_pool import WalletPool
+from services.database import get_session, run_as_leader
+from services.keys import KeyService
+from services.metrics import WALLET_POOL_DEPTH
+
+logger = logging.getLogger(__name__)
+
+# Candidates read per claim; picking one at random keeps concurrent signups
+# from all racing for the same row
+CLAIM_CANDIDATES = 8
+
+
+async def claim_wallet(session: AsyncSession) -> Optional[Tuple[str, str]]:
+    """
+    Take a pre-generated wallet out of the pool, inside the caller's transaction.
+
+    The row is deleted with a compare-and-set DELETE, so two signups can never
+    get the same wallet, and a rolled back signup puts it back.
+
+    Returns:
+        Optional[Tuple[str, str]]: The public key and sealed secret key, or None
+            if the pool is empty.
+    """
+    result = await session.execute(select(WalletPool.id).limit(CLAIM_CANDIDATES))
+    candidates = result.scalars().all()
+    random.shuffle(candidates)
+    for wallet_id in candidates:
+        result = await session.execute(
+            delete(WalletPool)
+            .where(WalletPool.id == wallet_id)
+            .returning(WalletPool.public_key, WalletPool.sealed_key)
+        )
+        row = result.first()
+        if row is not None:
+            return row.public_key, row.sealed_key
+    return None
+
+
+class WalletPoolRefiller:
+    """
+    Background task that keeps the `wallet_pool` table stocked.
+
+    Once the pool drops below `low` wallets it is topped back up to `high`, in
+    batches generated off the event loop by the key service. Checking the depth
+    is a single COUNT, so the interval can be short.
+
+    Every worker starts one, but only the holder of the `wallet_pool` advisory
+    lock checks and refills, so workers never each top the pool up past
+    `high`; the others take over if it goes away.
+    """
+
+    def __init__(
+        self,
+        key_service: KeyService,
+        low: int = 200,
+        high: int = 1000,
+        batch_size: int = 100,
+        interval: float = 5.0,
+    ):
+        """
+        Args:
+            key_service (KeyService): Generates and seals the keypairs.
+            low (int, optional): Depth that triggers a refill. Defaults to 200.
+            high (int, optional): Depth a refill stops at. Defaults to 1000.
+            batch_size (int, optional): Wallets inserted per commit. Defaults to 100.
+            interval (float, optional): Seconds between depth checks. Defaults to 5.
+        """
+        if low > high:
+            raise ValueError("The low watermark must not exceed the high watermark")
+        self.key_service = key_service
+        self.low = low
+        self.high = high
+        self.batch_size = batch_size
+        self.interval = interval
+        self._task = None
+
+    async def depth(self) -> int:
+        async with get_session() as sess:
+            result = await sess.execute(select(func.count()).select_from(WalletPool))
+            depth = result.scalar_one()
+        WALLET_POOL_DEPTH.set(depth)
+        return depth
+
+    async def refill(self) -> int:
+        """Top the pool up if it is below the low watermark; returns wallets added"""
+        depth = await self.depth()
+        if depth >= self.low:
+            return 0
+        added = 0
+        while depth + added < self.high:
+            count = min(self.batch_size, self.high - depth - added)
+            wallets = await asyncio.gather(
+                *(self.key_service.generate() for _ in range(count))
+            )
+            async with get_session() as sess:
+                # Flushed as one multi-row INSERT
+                sess.add_all([WalletPool(*wallet) for wallet in wallets])
+                await sess.commit()
+            added += count
+            WALLET_POOL_DEPTH.set(depth + added)
+        return added
+
+    async def run(self):
+        await run_as_leader("wallet_pool", self.check, self.interval)
+
+    async def check(self):
+        added = await self.refill()
+        if added:
+            logger.info("Wallet pool refilled with %d wallets", added)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,34 @@
+import os
+import tempfile
+
+# The engine is created when services.database is imported, so the test
+# database has to be configured before any test module imports it
+os.environ.update(
+    env="dev",
+    DATABASE_URL=f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/youssd_test.db",
+    SECRET_KEY="test-secret-key",
+    RPC_URL="http://127.0.0.1:1",
+    TRANSFER_WORKERS="0",
+)
+
+import pytest  # noqa: E402
+
+from services.database import engine, init_db  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def database():
+    """Empty tables for the test, created from the models"""
+    from models.base import Base
+
+    await init_db()
+    yield engine
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
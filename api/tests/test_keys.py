@@ -0,0 +1,12 @@
+import pytest
+
+from services.keys import load_kek
+
+
+def test_dev_kek_requires_a_secret(monkeypatch):
+    monkeypatch.delenv("KEY_ENCRYPTION_KEY", raising=False)
+    monkeypatch.delenv("SECRET_KEY")
+    with pytest.raises(ValueError):
+        load_kek()
+    monkeypatch.setenv("SECRET_KEY", "test-secret-key")
+    assert len(load_kek()) == 32
@@ -0,0 +1,70 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+from services import database
+from services.database import AdvisoryLock, run_as_leader
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeConnection:
+    """Answers until `drop` is called, then fails like a dead connection"""
+
+    def __init__(self):
+        self.alive = True
+
+    async def scalar(self, statement):
+        if not self.alive:
+            raise ConnectionResetError("connection dropped")
+        return 1
+
+    async def commit(self):
+        pass
+
+    def drop(self):
+        self.alive = False
+
+
+async def test_lock_is_lost_with_its_connection():
+    conn = FakeConnection()
+    lock = AdvisoryLock("job", True, conn)
+    assert await lock.held()
+
+    conn.drop()
+    assert not await lock.held()
+    assert not lock.locked
+
+
+async def test_lock_never_taken_is_not_held():
+    assert not await AdvisoryLock("job", False, FakeConnection()).held()
+
+
+async def test_leader_stops_stepping_once_its_connection_drops(monkeypatch):
+    conn = FakeConnection()
+    taken = []
+
+    @asynccontextmanager
+    async def advisory_lock(name):
+        # Only the first attempt gets the lock; later ones find it taken
+        taken.append(name)
+        yield AdvisoryLock(name, len(taken) == 1, conn)
+
+    monkeypatch.setattr(database, "advisory_lock", advisory_lock)
+    steps = []
+
+    async def step():
+        steps.append(len(taken))
+        if len(steps) == 3:
+            conn.drop()
+        if len(steps) == 2:
+            raise RuntimeError("a failed step is retried")
+
+    task = asyncio.create_task(run_as_leader("job", step, 0.01))
+    await asyncio.sleep(0.2)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+    assert steps == [1, 1, 1]
+    assert len(taken) > 2
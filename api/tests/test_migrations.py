@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from services.database import latest_revision
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+
+def _alembic(database: Path, *args: str):
+    subprocess.run(
+        [sys.executable, "-m", "alembic", *args],
+        cwd=API_DIR,
+        env={**os.environ, "DATABASE_URL": f"sqlite+aiosqlite:///{database}"},
+        check=True,
+        capture_output=True,
+    )
+
+
+def test_upgrade_adopts_a_database_created_before_migrations(tmp_path):
+    database = tmp_path / "legacy.db"
+    # What the create_all() boot path left behind: the tables, no revision
+    _alembic(database, "upgrade", "0001")
+    with sqlite3.connect(database) as conn:
+        conn.execute("DROP TABLE alembic_version")
+        conn.execute(
+            "INSERT INTO users (id, full_name, phone_number, public_key, "
+            "private_key, sol_balance, created_at) "
+            "VALUES ('a', 'Ada', '+2348000000001', 'pk', 'sk', 3, '2024-10-09')"
+        )
+
+    _alembic(database, "upgrade", "head")
+
+    with sqlite3.connect(database) as conn:
+        (revision,) = conn.execute("SELECT version_num FROM alembic_version").fetchone()
+        (lamports,) = conn.execute("SELECT balance_lamports FROM users").fetchone()
+    assert revision == latest_revision()
+    assert lamports == 3_000_000_000
+
+
+def test_upgrade_names_duplicate_usernames_instead_of_failing_on_the_index(
+    tmp_path,
+):
+    database = tmp_path / "duplicates.db"
+    _alembic(database, "upgrade", "0002")
+    with sqlite3.connect(database) as conn:
+        for user_id, phone_number, public_key in (
+            ("a", "+2348000000001", "pk1"),
+            ("b", "+2348000000002", "pk2"),
+        ):
+            conn.execute(
+                "INSERT INTO users (id, full_name, phone_number, username, "
+                "public_key, private_key, sol_balance, created_at) "
+                "VALUES (?, 'Ada', ?, 'ada', ?, 'sk', 0, '2024-10-09')",
+                (user_id, phone_number, public_key),
+            )
+
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        _alembic(database, "upgrade", "head")
+
+    assert "username='ada' (2 users)" in error.value.stderr.decode()
+    with sqlite3.connect(database) as conn:
+        (revision,) = conn.execute("SELECT version_num FROM alembic_version").fetchone()
+    assert revision == "0002"
@@ -0,0 +1,140 @@
+import asyncio
+import fnmatch
+
+import pytest
+
+from services import deadline
+from services.session_store import RedisSessionStore
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeRedis:
+    """
+    The slice of `redis.asyncio.Redis` the store uses, in memory.
+
+    Every call yields to the event loop first, as a network round trip would,
+    so concurrent callers interleave. Expiry follows `now`, advanced by hand.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        self.data = {}
+        self.closed = False
+
+    def _live(self, key):
+        value, expires_at = self.data.get(key, (None, None))
+        if expires_at is not None and expires_at <= self.now:
+            del self.data[key]
+            return None
+        return value
+
+    async def get(self, key):
+        await asyncio.sleep(0)
+        return self._live(key)
+
+    async def set(self, key, value, ex=None):
+        await asyncio.sleep(0)
+        self.data[key] = (
+            value.encode() if isinstance(value, str) else value,
+            None if ex is None else self.now + ex,
+        )
+        return True
+
+    async def delete(self, key):
+        await asyncio.sleep(0)
+        return int(self.data.pop(key, None) is not None)
+
+    async def scan_iter(self, match="*"):
+        for key in list(self.data):
+            if fnmatch.fnmatchcase(key, match) and self._live(key) is not None:
+                yield key
+
+    async def aclose(self):
+        self.closed = True
+
+
+@pytest.fixture
+def redis():
+    return FakeRedis()
+
+
+@pytest.fixture
+def store(redis):
+    return RedisSessionStore(redis, ttl=180)
+
+
+async def test_round_trip(store, redis):
+    await store.set("s1", {"state": "send_tokens", "history": [["initial", "CON"]]})
+
+    assert await store.get("s1") == {
+        "state": "send_tokens",
+        "history": [["initial", "CON"]],
+    }
+    assert await store.get("unknown") == {}
+    assert list(redis.data) == ["ussd:session:s1"]
+
+
+async def test_sessions_expire_after_the_ttl(store, redis):
+    await store.set("s1", {"state": "initial"})
+
+    redis.now += 179
+    assert await store.get("s1") == {"state": "initial"}
+    redis.now += 1
+    assert await store.get("s1") == {}
+    assert await store.size() == 0
+
+
+async def test_set_refreshes_the_ttl(store, redis):
+    await store.set("s1", {"state": "initial"})
+    redis.now += 170
+    await store.set("s1", {"state": "wallet_access"})
+
+    redis.now += 170
+    assert await store.get("s1") == {"state": "wallet_access"}
+
+
+async def test_concurrent_sessions_do_not_interfere(store):
+    async def hop(i):
+        await store.set(f"s{i}", {"state": "initial", "offset": i})
+        data = await store.get(f"s{i}")
+        data["offset"] += 1
+        await store.set(f"s{i}", data)
+
+    await asyncio.gather(*(hop(i) for i in range(100)))
+
+    assert await store.size() == 100
+    for i in range(100):
+        assert await store.get(f"s{i}") == {"state": "initial", "offset": i + 1}
+
+
+async def test_concurrent_writes_to_one_session_replace_it_whole(store):
+    writes = [{"state": f"state{i}", "offset": i} for i in range(20)]
+
+    await asyncio.gather(*(store.set("s1", data) for data in writes))
+
+    # Last writer wins, never a mix of two writes
+    assert await store.get("s1") in writes
+
+
+async def test_delete(store):
+    await store.set("s1", {"state": "initial"})
+    await store.delete("s1")
+    await store.delete("s1")
+
+    assert await store.get("s1") == {}
+
+
+async def test_round_trips_are_bounded_by_the_deadline(store, redis):
+    async def hang(key):
+        await asyncio.sleep(10)
+
+    redis.get = hang
+    with deadline.request_deadline(0.05):
+        with pytest.raises(deadline.DeadlineExceeded):
+            await store.get("s1")
+
+
+async def test_close(store, redis):
+    await store.close()
+    assert redis.closed
@@ -0,0 +1,66 @@
+import pytest
+from sqlalchemy import func, select
+
+from models.user import Users
+from models.ussd import UssdRequest
+from services import ussd
+from services.database import get_session
+from services.user import UsernameTakenError, UserService
+from services.user_cache import user_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    user_cache.clear()
+
+
+async def hop(phone_number: str, text: str) -> str:
+    return await ussd.process_request(
+        UssdRequest(
+            phone_number=phone_number,
+            service_code="*384#",
+            text=text,
+            session_id=f"signup-{phone_number}",
+            network_code="99999",
+        )
+    )
+
+
+async def test_taken_username_reprompts_instead_of_failing(database):
+    await hop("+2348000000001", "")
+    await hop("+2348000000001", "1")
+    assert "alice1" in await hop("+2348000000001", "1*alice1, Alice Doe")
+
+    await hop("+2348000000002", "")
+    await hop("+2348000000002", "1")
+    response = await hop("+2348000000002", "1*alice1, Alice Two")
+    assert response.startswith("CON Username alice1 is taken"), response
+
+    response = await hop("+2348000000002", "1*alice1, Alice Two*alice2, Alice Two")
+    assert response.startswith("END Thank you for signing up, alice2"), response
+
+
+async def test_lost_username_race_rolls_back(database, monkeypatch):
+    async with get_session() as sess:
+        users = UserService(sess)
+        await users.create_user(
+            {"username": "bob", "full_name": "Bob", "phone_number": "+2348000000003"}
+        )
+
+        # As if the other signup committed after this one's check
+        async def not_taken(username):
+            return False
+
+        monkeypatch.setattr(users, "username_taken", not_taken)
+        with pytest.raises(UsernameTakenError):
+            await users.create_user(
+                {
+                    "username": "bob",
+                    "full_name": "Bob",
+                    "phone_number": "+2348000000004",
+                }
+            )
+        count = await sess.execute(select(func.count()).select_from(Users))
+        assert count.scalar() == 1
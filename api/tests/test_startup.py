@@ -0,0 +1,43 @@
+import json
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.bench_startup import LAZY_MODULES
+
+API_DIR = Path(__file__).resolve().parent.parent
+
+# Same budget as `python -m benchmarks.bench_startup`, for the median of RUNS
+IMPORT_BUDGET = 1.5
+RUNS = 3
+
+CHILD = f"""
+import json, sys, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter() - start
+eager = [module for module in {LAZY_MODULES!r} if module in sys.modules]
+print(json.dumps({{"import": imported, "eager": eager}}))
+"""
+
+
+def _import_app() -> dict:
+    """Import the app in a fresh interpreter, as a new worker would"""
+    output = subprocess.run(
+        [sys.executable, "-c", CHILD],
+        cwd=API_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_import_stays_within_budget():
+    runs = [_import_app() for _ in range(RUNS)]
+
+    median = statistics.median(run["import"] for run in runs)
+    assert median < IMPORT_BUDGET, f"import app took {median * 1000:.0f}ms"
+    # Loaded on first use only, never at import
+    assert not {module for run in runs for module in run["eager"]}
@@ -0,0 +1,68 @@
+import pytest
+from sqlalchemy import event
+
+from models.ussd import UssdRequest
+from services import ussd
+from services.user_cache import user_cache
+
+pytestmark = pytest.mark.anyio
+
+PHONE_NUMBER = "+2348000000001"
+
+# (session id, cumulative text, most SQL statements the hop may issue), in
+# the order a gateway would send them
+FLOW = [
+    # Entry: one lookup, which also caches the unknown number
+    ("signup", "", 1),
+    ("signup", "1", 0),
+    # The username check, a pooled wallet, then the key and user inserts
+    ("signup", "1*alice1, Alice Doe", 4),
+    # Signing up invalidated the cached miss
+    ("send", "", 1),
+    ("send", "1", 0),
+    ("send", "1*2", 0),
+    ("send", "1*2*alice1", 0),
+    ("send", "1*2*alice1*0.5", 0),
+    ("send", "1*2*alice1*0.5*2", 0),
+    ("details", "", 0),
+    ("details", "3", 0),
+]
+
+
+@pytest.fixture
+def statements(database):
+    issued = []
+
+    def count(conn, cursor, statement, *_):
+        issued.append(statement)
+
+    event.listen(database.sync_engine, "before_cursor_execute", count)
+    yield issued
+    event.remove(database.sync_engine, "before_cursor_execute", count)
+
+
+@pytest.fixture(autouse=True)
+def no_rpc(monkeypatch):
+    async def get_solana_balance(public_key):
+        return 1.0
+
+    monkeypatch.setattr(ussd.sol_transfer, "get_solana_balance", get_solana_balance)
+    user_cache.clear()
+    ussd.balance_cache.cache.clear()
+
+
+async def test_statements_per_hop_stay_within_budget(statements):
+    for session_id, text, budget in FLOW:
+        statements.clear()
+        response = await ussd.process_request(
+            UssdRequest(
+                phone_number=PHONE_NUMBER,
+                service_code="*384#",
+                text=text,
+                session_id=session_id,
+                network_code="99999",
+            )
+        )
+        assert not response.startswith("END An error"), response
+        assert len(statements) <= budget, (text, statements)
+    assert "alice1" in response
@@ -0,0 +1,85 @@
+import base64
+from uuid import uuid4
+
+import pytest
+from solders.keypair import Keypair
+from solders.signature import Signature
+from sqlalchemy import select
+
+from models.transfer import TransferJob
+from models.user import Users
+from services.database import get_session
+from services.transfer_queue import TransferWorker
+
+pytestmark = pytest.mark.anyio
+
+
+class StubTransfer:
+    """Sends nothing; every transaction expires without landing"""
+
+    async def send_raw(self, raw):
+        return Signature.default()
+
+
+@pytest.fixture
+async def expiring_job(database):
+    async with get_session() as sess:
+        users = []
+        for i in range(2):
+            user = Users(
+                full_name="Ada",
+                phone_number=f"+234800000000{i}",
+                private_key=None,
+                public_key=str(Keypair().pubkey()),
+                username=f"ada{i}",
+            )
+            user.id = uuid4()
+            users.append(user)
+        job = TransferJob(uuid4().hex, users[0].id, users[1].id, 1000)
+        # Signed and sent before, then polled a few times until it expired
+        job.status = "submitted"
+        job.attempts = 4
+        job.signature = str(Signature.default())
+        job.raw_transaction = base64.b64encode(b"signed").decode()
+        sess.add_all([*users, job])
+        await sess.commit()
+
+
+async def expired(job, signature):
+    return None
+
+
+async def current_job() -> TransferJob:
+    async with get_session() as sess:
+        return (await sess.execute(select(TransferJob))).scalar_one()
+
+
+async def test_expired_transaction_is_signed_again_with_fresh_attempts(expiring_job):
+    worker = TransferWorker(StubTransfer(), max_attempts=3)
+    worker._confirm = expired
+
+    assert await worker.run_once()
+
+    job = await current_job()
+    assert (job.status, job.attempts, job.expiries) == ("pending", 0, 1)
+    assert job.signature is None and job.raw_transaction is None
+
+
+async def test_job_fails_once_it_expired_too_often(expiring_job):
+    worker = TransferWorker(StubTransfer(), max_expiries=2)
+    worker._confirm = expired
+
+    async def sign(sess, job, sender, recipient):
+        job.raw_transaction = base64.b64encode(b"signed again").decode()
+        job.signature = str(Signature.default())
+        job.status = "submitted"
+        await sess.commit()
+
+    worker._sign = sign
+    statuses = []
+    while await worker.run_once():
+        job = await current_job()
+        statuses.append((job.status, job.expiries))
+
+    assert statuses == [("pending", 1), ("pending", 2), ("failed", 3)]
+    assert job.error == "Transaction expired"
@@ -0,0 +1,172 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+
+from models.user import Users
+from services.user_cache import (
+    NOT_FOUND,
+    SECRET_COLUMNS,
+    UserCache,
+    UserCacheInvalidations,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeBroker:
+    """Redis pub/sub in memory: every subscriber of a channel gets each message"""
+
+    def __init__(self):
+        self.subscribers = {}
+        self.down = False
+
+    async def publish(self, channel, data):
+        await asyncio.sleep(0)
+        if self.down:
+            raise ConnectionError("broker down")
+        for queue in self.subscribers.get(channel, []):
+            queue.put_nowait({"type": "message", "channel": channel, "data": data})
+        return len(self.subscribers.get(channel, []))
+
+    def pubsub(self):
+        return FakePubSub(self)
+
+    async def aclose(self):
+        pass
+
+
+class FakePubSub:
+    def __init__(self, broker):
+        self.broker = broker
+        self.queue = asyncio.Queue()
+
+    async def subscribe(self, channel):
+        self.broker.subscribers.setdefault(channel, []).append(self.queue)
+        self.queue.put_nowait({"type": "subscribe", "channel": channel, "data": 1})
+
+    async def listen(self):
+        while True:
+            message = await self.queue.get()
+            if message is None:
+                raise ConnectionError("connection dropped")
+            yield message
+
+    async def aclose(self):
+        for queues in self.broker.subscribers.values():
+            if self.queue in queues:
+                queues.remove(self.queue)
+
+
+def make_user(phone_number="+2348000000001"):
+    user = Users(
+        full_name="Alice Doe",
+        phone_number=phone_number,
+        private_key="[1, 2, 3]",
+        public_key="11111111111111111111111111111111",
+        username="alice1",
+        password="hunter2",
+        transaction_pin=1234,
+    )
+    user.id = uuid4()
+    return user
+
+
+async def settle():
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_snapshots_leave_secrets_out():
+    cache = UserCache()
+    user = make_user()
+    cache.put(user)
+
+    snapshot = cache.get_by_id(user.id)
+    assert snapshot["username"] == "alice1"
+    assert not set(SECRET_COLUMNS) & set(snapshot)
+    assert cache.get_by_phone_number(user.phone_number) is snapshot
+
+
+@pytest.fixture
+async def workers():
+    broker = FakeBroker()
+    caches = [UserCache(), UserCache()]
+    buses = [UserCacheInvalidations(broker, cache) for cache in caches]
+    for bus in buses:
+        bus.start()
+    await settle()
+    yield broker, caches, buses
+    for bus in buses:
+        await bus.stop()
+
+
+async def test_invalidations_reach_the_other_workers(workers):
+    _, (a, b), _ = workers
+    user = make_user()
+    a.put(user)
+    b.put(user)
+    b.put_missing("+2348000000002")
+
+    a.invalidate_user(user)
+    a.invalidate(phone_number="+2348000000002")
+    await settle()
+
+    assert b.get_by_id(user.id) is None
+    assert b.get_by_phone_number(user.phone_number) is None
+    assert b.get_by_phone_number("+2348000000002") is None
+
+
+async def test_workers_ignore_their_own_invalidations(workers):
+    _, (a, _), (bus, _) = workers
+    user = make_user()
+    a.invalidate_user(user)
+    a.put(user)
+    await settle()
+
+    assert a.get_by_id(user.id) is not None
+    assert bus.published == 1
+    assert bus.received == 0
+
+
+async def test_cache_is_bypassed_while_unsubscribed(workers):
+    broker, (_, b), _ = workers
+    user = make_user()
+    b.put(user)
+    assert b.get_by_id(user.id) is not None
+
+    # Drop b's connection; invalidations published now would never reach it
+    broker.subscribers["user_cache"][1].put_nowait(None)
+    await settle()
+    assert b.bypass
+    assert b.get_by_id(user.id) is None
+    b.put_missing("+2348000000002")
+    assert b.get_by_phone_number("+2348000000002") is None
+
+    # Resubscribed after the backoff, starting from an empty cache
+    await asyncio.sleep(0.6)
+    await settle()
+    assert not b.bypass
+    assert b.get_by_id(user.id) is None
+    b.put(user)
+    assert b.get_by_id(user.id) is not None
+
+
+async def test_failed_publish_clears_the_local_cache(workers):
+    broker, (a, _), (bus, _) = workers
+    user, other = make_user(), make_user("+2348000000002")
+    a.put(other)
+
+    broker.down = True
+    a.invalidate_user(user)
+    await settle()
+
+    assert bus.published == 0
+    assert a.get_by_id(other.id) is None
+
+
+def test_not_found_is_cached_without_a_bus():
+    cache = UserCache()
+    cache.put_missing("+2348000000002")
+
+    assert cache.get_by_phone_number("+2348000000002") is NOT_FOUND